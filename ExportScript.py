@@ -1,8 +1,58 @@
 from pathlib import Path
+import json
 import os
+import subprocess
+import sys
 import maya.cmds as cmds
 import NCCA
-import maya.OpenMaya as OM1 
+import maya.OpenMaya as OM1
+from clutter_export import asset_name, export_to_database
+from export_farm import SCRIPTS, default_worker, worker_main
+
+
+class MayaBackend:
+    """
+    The Maya side of an export, used by clutter_export to write assets straight into a database.
+    """
+
+    group_name = "NCCA_Export_Group"
+
+    def __init__(self, interupter=None) -> None:
+        # optional OM1.MComputation so the user can stop a long export with escape
+        self.interupter = interupter
+
+    def prepare(self, child: str) -> None:
+        if cmds.objExists(self.group_name):
+            cmds.delete(self.group_name)
+        cmds.group(empty=True, world=True, name=self.group_name)
+        cmds.showHidden(self.group_name)
+        dup_name = cmds.duplicate(child, renameChildren=True)
+        cmds.parent(dup_name, self.group_name)
+        cmds.select(self.group_name)
+        NCCA.center_pivot_to_bounding_box(self.group_name)
+        NCCA.center_and_scale(self.group_name)
+
+    def save_screenshots(self, path: Path, width: int, height: int, base_name: str) -> None:
+        NCCA.save_screenshots(path, width, height, base_name)
+
+    def export_obj(self, path: Path) -> None:
+        cmds.file(f"{path}", force=True, type="OBJexport", exportSelected=True)
+
+    def cleanup(self) -> None:
+        cmds.delete(self.group_name)
+
+    def interrupted(self) -> bool:
+        return self.interupter is not None and self.interupter.isInterruptRequested()
+
+
+class BatchMayaBackend(MayaBackend):
+    """
+    MayaBackend for export farm workers, mayapy has no viewport to take screenshots from so none are saved,
+    export_farm.run_farm renders them from the stored meshes with renderViews.py once the workers are done.
+    """
+
+    def save_screenshots(self, path: Path, width: int, height: int, base_name: str) -> None:
+        pass
 
 
 def create_root_folder(root: str) -> Path:
@@ -23,22 +73,14 @@ def create_root_folder(root: str) -> Path:
 def export_mesh(child : str, export_dir : Path) -> None :
     # create a folder for export
     # child is in the format |group name | top level group name |
-    root_name = child.split("|")[2]
+    root_name = asset_name(child)
     export_path=export_dir/root_name
     export_path.mkdir(parents=True,exist_ok=True)
-    group_name ="NCCA_Export_Group"
-    if cmds.objExists(group_name) :
-        cmds.delete(group_name)
-    cmds.group(empty=True,world=True,name=group_name)
-    cmds.showHidden(group_name)
-    dup_name = cmds.duplicate(child,renameChildren=True)
-    cmds.parent(dup_name,group_name)
-    cmds.select(group_name)
-    NCCA.center_pivot_to_bounding_box(group_name)
-    NCCA.center_and_scale(group_name)
-    NCCA.save_screenshots(export_path,250,250,root_name)
-    cmds.file(f"{export_path}/{root_name}.obj",force=True,type="OBJexport",exportSelected=True)
-    cmds.delete(group_name)
+    backend = MayaBackend()
+    backend.prepare(child)
+    backend.save_screenshots(export_path,250,250,root_name)
+    backend.export_obj(export_path/f"{root_name}.obj")
+    backend.cleanup()
 
 
 def export_selected_meshes(export_dir: Path) -> None:
@@ -61,16 +103,95 @@ def export_selected_meshes(export_dir: Path) -> None:
     print("Export Complete")
 
 
+def export_selected_to_database(database: str, batch_size: int = 16) -> None:
+    """
+    Export the child groups of the selection straight into a clutter database, no files are left behind.
+
+    Args:
+        database (str): The database to add the meshes to, created if it doesn't exist.
+        batch_size (int): Number of assets written per transaction.
+    """
+    selected = cmds.ls(selection=True, long=True)
+    if selected:
+        child_groups = NCCA.get_child_groups(selected[0], depth=1)
+        cmds.hide(all=True)
+        interupter = OM1.MComputation()
+        interupter.beginComputation()
+        try:
+            count = export_to_database(database, child_groups, MayaBackend(interupter), batch_size)
+        finally:
+            interupter.endComputation()
+        print(f"Added {count} meshes to {database}")
+    else:
+        print("No Groups Selected")
+    cmds.showHidden(all=True)
+    cmds.select(clear=True)
+    print("Export Complete")
+
+
+def export_selected_with_farm(database: str, workers: int = 4) -> None:
+    """
+    Export the child groups of the selection into a clutter database with a farm of mayapy workers
+    (see scripts/export_farm.py) running in the background, so Maya is free again straight away.
+    The workers open the saved scene so save it first, progress is written to <database>.farm.log and the
+    groups to <database>.farm.json, both replaced by the next run.
+
+    Args:
+        database (str): The database to add the meshes to, created if it doesn't exist.
+        workers (int): Number of mayapy processes.
+    """
+    selected = cmds.ls(selection=True, long=True)
+    scene = cmds.file(query=True, sceneName=True)
+    if not selected:
+        print("No Groups Selected")
+        return
+    if not scene or cmds.file(query=True, modified=True):
+        print("Save the scene first, the export farm works from the saved file")
+        return
+    child_groups = NCCA.get_child_groups(selected[0], depth=1)
+    children = Path(f"{database}.farm.json")
+    children.write_text(json.dumps(child_groups))
+    command = [default_worker()[0], str(SCRIPTS / "export_farm.py"), "--scene", scene, "--children", str(children)]
+    command += ["--database", database, "--workers", str(workers)]
+    # the farm gets its own copy of the log handle, close ours so Maya doesn't keep the file open
+    with open(f"{database}.farm.log", "w") as log:
+        subprocess.Popen(command, stdout=log, stderr=subprocess.STDOUT, start_new_session=True)
+    print(f"Exporting {len(child_groups)} groups with {workers} workers, progress in {log.name}")
+
+
+def farm_worker() -> int:
+    """
+    Run as an export farm worker, started by export_farm.run_farm as mayapy ExportScript.py --farm-worker ...
+    """
+    import maya.standalone
+
+    maya.standalone.initialize(name="python")
+    try:
+        return worker_main(
+            BatchMayaBackend,
+            lambda scene: cmds.file(scene, open=True, force=True),
+            lambda group: NCCA.get_child_groups(group, depth=1),
+        )
+    finally:
+        maya.standalone.uninitialize()
+
+
 # recruse the groups and find each to level group
 
 # export the file as obj
 
 # export screenshots.
 
-if __name__ == "__main__":
-    try:
-        root_folder = os.environ["CLUTTER_ROOT"]
+if __name__ == "__main__" and "--farm-worker" in sys.argv:
+    sys.exit(farm_worker())
+elif __name__ == "__main__":
+    # set CLUTTER_DB to export straight into a database rather than to $CLUTTER_ROOT/ExportedMeshes
+    database = os.environ.get("CLUTTER_DB")
+    root_folder = os.environ.get("CLUTTER_ROOT")
+    if database:
+        export_selected_to_database(database)
+    elif root_folder:
         export_folder = create_root_folder(root_folder)
         export_selected_meshes(export_folder)
-    except KeyError:
-        print("CLUTTER_ROOT Not set")
+    else:
+        print("Set CLUTTER_DB or CLUTTER_ROOT")
@@ -1,19 +1,63 @@
 import sys
 from pathlib import Path
-from typing import Optional
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 
+from meshVersions import add_version, find_asset
 from qtpy.QtCore import QByteArray, Slot
-from qtpy.QtGui import QPixmap
+from qtpy.QtGui import QDragEnterEvent, QDropEvent, QPixmap
 from qtpy.QtSql import QSqlDatabase, QSqlQuery
 from qtpy.QtWidgets import QApplication, QDialog, QFileDialog, QWidget
-from qtpy.uic import loadUi
+from scripts.clutter_schema import IMAGE_COLUMNS
 
+from BatchLoader import BatchLoader, Normalization, find_assets, normalize_obj
 from sql_queries import QUERIES
+from UiLoader import load_ui
+
+
+class _QtCursor:
+    """The results of a query run through _QtConnection"""
+
+    def __init__(self, query: QSqlQuery) -> None:
+        self.query = query
+
+    def fetchone(self) -> Optional[Tuple]:
+        if not self.query.next():
+            return None
+        values = (self.query.value(column) for column in range(self.query.record().count()))
+        return tuple(bytes(value) if isinstance(value, QByteArray) else value for value in values)
+
+    def fetchall(self) -> List[Tuple]:
+        return list(iter(self.fetchone, None))
+
+
+class _QtConnection:
+    """
+    The part of sqlite3.Connection that meshVersions uses, run on the dialog's QSqlDatabase so versions are
+    stored in the same transaction as the rest of the insert.
+    """
+
+    def __init__(self, db: QSqlDatabase) -> None:
+        self.db = db
+
+    def execute(self, sql: str, parameters: Sequence[Any] = ()) -> _QtCursor:
+        query = QSqlQuery(self.db)
+        query.prepare(sql)
+        for value in parameters:
+            query.addBindValue(QByteArray(value) if isinstance(value, bytes) else value)
+        if not query.exec():
+            raise RuntimeError(f"Failed to execute query: {query.lastError().text()}")
+        return _QtCursor(query)
 
 
 class AddDialog(QDialog):
     """
     Dialog for adding a new item to the database, including images and mesh files as BLOBs.
+    Asset folders can also be dropped onto the dialog, every mesh found is paired with its
+    <name>Front/Side/Top/Persp.png screenshots, checked in the background and the whole batch
+    inserted in one transaction, each asset's files are only read as it is inserted. Obj meshes are
+    normalized to the unit box unless normalize_cb is unchecked.
+    An asset with the name and mesh type of one already in the library is stored as a new version of it
+    (see meshVersions.py) unless version_cb is unchecked.
 
     Attributes:
         db (QSqlDatabase): The database connection.
@@ -23,6 +67,7 @@ class AddDialog(QDialog):
         persp_image_blob (Optional[bytes]): Binary data for the perspective image.
         mesh_blob (Optional[bytes]): Binary data for the mesh file.
         _last_dir (str): Last directory used in QFileDialog for this dialog instance.
+        batch_loader (BatchLoader): Checks the files for dropped assets on a thread pool.
     """
 
     def __init__(self, db: QSqlDatabase, parent: Optional[QWidget] = None) -> None:
@@ -34,7 +79,7 @@ class AddDialog(QDialog):
             parent (Optional[QWidget]): The parent widget, if any.
         """
         super().__init__(parent)
-        loadUi("AddDialog.ui", self)
+        load_ui("AddDialog.ui", self)
         self.db: QSqlDatabase = db
         self.front_image_blob: Optional[bytes] = None
         self.side_image_blob: Optional[bytes] = None
@@ -52,6 +97,61 @@ class AddDialog(QDialog):
         self.insert.clicked.connect(self.insert_into_db)
         self.select_mesh.clicked.connect(self.add_mesh)
 
+        self.batch_loader: BatchLoader = BatchLoader(self)
+        self.batch_loader.progress.connect(self.batch_progress_changed)
+        self.batch_loader.asset_loaded.connect(self.batch_asset_loaded)
+        self.batch_loader.finished.connect(self.update_button_state)
+        self.setAcceptDrops(True)
+
+    def dragEnterEvent(self, event: QDragEnterEvent) -> None:
+        """
+        Accept drags containing local files or folders.
+
+        Args:
+            event (QDragEnterEvent): The drag event.
+        """
+        if event.mimeData().hasUrls():
+            event.acceptProposedAction()
+
+    def dropEvent(self, event: QDropEvent) -> None:
+        """
+        Find the assets in the dropped files and folders and start loading them.
+
+        Args:
+            event (QDropEvent): The drop event.
+        """
+        paths = [Path(url.toLocalFile()) for url in event.mimeData().urls() if url.isLocalFile()]
+        event.acceptProposedAction()
+        self.add_batch(paths)
+
+    def add_batch(self, paths: List[Path]) -> None:
+        """
+        Add the assets found under paths to the batch.
+
+        Args:
+            paths (List[Path]): Files and folders to search for assets.
+        """
+        first = len(self.batch_loader.assets)
+        self.batch_loader.normalize = self.normalize_cb.isChecked()
+        self.batch_loader.add(find_assets(paths))
+        for asset in self.batch_loader.assets[first:]:
+            missing = "" if asset.is_complete() else " (missing images)"
+            self.batch_list.addItem(f"{asset.name} [{asset.mesh_type}] loading{missing}")
+        self.update_button_state()
+
+    @Slot(int, int)
+    def batch_progress_changed(self, done: int, total: int) -> None:
+        self.batch_progress.setMaximum(max(total, 1))
+        self.batch_progress.setValue(done)
+
+    @Slot(int)
+    def batch_asset_loaded(self, row: int) -> None:
+        asset = self.batch_loader.assets[row]
+        item = self.batch_list.item(row)
+        if item is not None:
+            status = f"failed: {asset.error}" if asset.error else f"{len(asset.sizes)} files"
+            item.setText(f"{asset.name} [{asset.mesh_type}] {status}")
+
     @Slot()
     def add_mesh(self) -> None:
         """
@@ -72,26 +172,126 @@ class AddDialog(QDialog):
     def insert_into_db(self) -> None:
         """
         Insert the current item, including images and mesh, into the database.
+        If assets have been dropped onto the dialog the whole batch is inserted instead, in a single transaction.
         Raises:
             RuntimeError: If the query execution fails.
         Note Blob data must be a QByteArray else the query will fail.
         """
         if self.db:
-            query = QSqlQuery()
-            query.prepare(QUERIES["insert"])
-            query.addBindValue(self.item_name.text())
-            query.addBindValue(QByteArray(self.mesh_blob) if self.mesh_blob else None)
-            query.addBindValue(self.mesh_type.currentText())
-            query.addBindValue(QByteArray(self.top_image_blob) if self.top_image_blob else None)
-            query.addBindValue(QByteArray(self.side_image_blob) if self.side_image_blob else None)
-            query.addBindValue(QByteArray(self.front_image_blob) if self.front_image_blob else None)
-            query.addBindValue(QByteArray(self.persp_image_blob) if self.persp_image_blob else None)
-
-            if not query.exec():
-                raise RuntimeError(f"Failed to execute query: {query.lastError().text()}")
+            if self.batch_loader.assets:
+                self.insert_batch()
+            else:
+                mesh_blob = self.mesh_blob
+                normalization = None
+                if mesh_blob and self.normalize_cb.isChecked() and self.mesh_type.currentText() == "obj":
+                    mesh_blob, normalization = normalize_obj(mesh_blob)
+                images = {
+                    "top_image": self.top_image_blob,
+                    "side_image": self.side_image_blob,
+                    "front_image": self.front_image_blob,
+                    "persp_image": self.persp_image_blob,
+                }
+                if not self.db.transaction():
+                    raise RuntimeError(f"Failed to start transaction: {self.db.lastError().text()}")
+                try:
+                    mesh_id = self.store_asset(self.item_name.text(), mesh_blob, self.mesh_type.currentText(), images)
+                    if normalization is not None:
+                        self.record_normalization(mesh_id, normalization)
+                except RuntimeError:
+                    self.db.rollback()
+                    raise
+                if not self.db.commit():
+                    self.db.rollback()
+                    raise RuntimeError(f"Failed to commit: {self.db.lastError().text()}")
 
         self.accept()
 
+    def insert_batch(self) -> None:
+        """
+        Insert every loaded asset in the batch using one prepared query and one transaction,
+        assets that failed to load are skipped. The files are read one asset at a time as it is inserted.
+        Raises:
+            RuntimeError: If any file can't be read or insert fails, in which case nothing is inserted.
+        """
+        if not self.db.transaction():
+            raise RuntimeError(f"Failed to start transaction: {self.db.lastError().text()}")
+        for asset in self.batch_loader.assets:
+            if asset.error or "mesh_data" not in asset.sizes:
+                continue
+            try:
+                blobs = asset.read_blobs()
+            except (OSError, ValueError) as e:
+                self.db.rollback()
+                raise RuntimeError(f"Failed to read {asset.name}: {e}")
+            try:
+                mesh_id = self.store_asset(asset.name, blobs["mesh_data"], asset.mesh_type, blobs)
+                if asset.normalization is not None:
+                    self.record_normalization(mesh_id, asset.normalization)
+            except RuntimeError:
+                self.db.rollback()
+                raise
+        if not self.db.commit():
+            self.db.rollback()
+            raise RuntimeError(f"Failed to commit batch: {self.db.lastError().text()}")
+
+    def store_asset(
+        self, name: str, mesh_blob: Optional[bytes], mesh_type: str, images: Dict[str, Optional[bytes]]
+    ) -> int:
+        """
+        Insert an asset, or store it as a new version of the newest asset with the same name and mesh type when
+        version_cb is checked. A new version keeps the previous screenshots for any not given.
+
+        Args:
+            name (str): The asset name.
+            mesh_blob (Optional[bytes]): The mesh file.
+            mesh_type (str): The mesh type.
+            images (Dict[str, Optional[bytes]]): Screenshots keyed by column, missing or None if there isn't one.
+        Returns:
+            int: The id of the row the asset is stored in.
+        Raises:
+            RuntimeError: If a query fails.
+        """
+        connection = _QtConnection(self.db)
+        mesh_id = find_asset(connection, name, mesh_type) if self.version_cb.isChecked() and mesh_blob else None
+        if mesh_id is not None:
+            add_version(connection, mesh_id, mesh_blob)
+            given = {column: images[column] for column in IMAGE_COLUMNS if images.get(column)}
+            if given:
+                assignments = ", ".join(f"{column}=?" for column in given)
+                connection.execute(f"UPDATE Meshes SET {assignments} WHERE id=?", (*given.values(), mesh_id))
+            return mesh_id
+        query = QSqlQuery(self.db)
+        query.prepare(QUERIES["insert"])
+        query.addBindValue(name)
+        query.addBindValue(QByteArray(mesh_blob) if mesh_blob else None)
+        query.addBindValue(mesh_type)
+        for column in IMAGE_COLUMNS:
+            blob = images.get(column)
+            query.addBindValue(QByteArray(blob) if blob else None)
+        if not query.exec():
+            raise RuntimeError(f"Failed to execute query: {query.lastError().text()}")
+        return query.lastInsertId()
+
+    def record_normalization(self, mesh_id: int, normalization: Normalization) -> None:
+        """
+        Store the original bounds and scale of a normalized mesh in the MeshNormalization table.
+
+        Args:
+            mesh_id (int): The id of the inserted row.
+            normalization (Normalization): The bounds and scale applied to the mesh.
+        Raises:
+            RuntimeError: If the query execution fails.
+        """
+        query = QSqlQuery()
+        for name in ["create_normalization_table", "create_normalization_trigger"]:
+            if not query.exec(QUERIES[name]):
+                raise RuntimeError(f"Failed to execute query: {query.lastError().text()}")
+        query.prepare(QUERIES["insert_normalization"])
+        for value in normalization.as_row(mesh_id):
+            query.addBindValue(value)
+        if not query.exec():
+            raise RuntimeError(f"Failed to execute query: {query.lastError().text()}")
+
     @Slot()
     def add_image(self) -> None:
         """
@@ -131,8 +331,11 @@ class AddDialog(QDialog):
 
     def update_button_state(self) -> None:
         """
-        Enable the insert button only if all required fields are filled.
+        Enable the insert button only if all required fields are filled, or a dropped batch has finished loading.
         """
+        if self.batch_loader.assets:
+            self.insert.setEnabled(not self.batch_loader.is_running())
+            return
         name_filled: bool = bool(self.item_name.text().strip())
         self.insert.setEnabled(name_filled)
 
@@ -0,0 +1,209 @@
+import re
+from typing import Any, List, Optional, Tuple
+
+import numpy as np
+from qtpy.QtCore import QAbstractProxyModel, QModelIndex, QObject, Qt
+
+from AssetTableModel import AssetTableModel
+from MetadataIndex import COMPARISONS, NUMERIC_FIELDS
+
+# field<value style range filters, e.g. face_count>1000 or mesh_size<=5e6
+CONDITION = re.compile(r"(\w+)\s*(<=|>=|<|>|=)\s*([-+0-9.eE]+)")
+
+
+def parse_filter(text: str) -> Tuple[str, List[Tuple[str, str, float]]]:
+    """
+    Split the filter box text into a name substring and range conditions on the numeric fields.
+
+    :param text: For example "chair face_count>1000 mesh_size<5e6".
+    :return: The substring and the (field, comparison, value) conditions.
+    """
+    conditions = []
+    for match in CONDITION.finditer(text):
+        field, comparison, value = match.groups()
+        if field in NUMERIC_FIELDS and comparison in COMPARISONS:
+            try:
+                conditions.append((field, comparison, float(value)))
+            except ValueError:
+                continue
+            text = text.replace(match.group(0), " ", 1)
+    return " ".join(text.split()), conditions
+
+
+class AssetFilterModel(QAbstractProxyModel):
+    """
+    Sorts and filters an AssetTableModel using its MetadataIndex, so clicking a header or typing in the filter
+    box never runs a query. The proxy is just an array of source rows in display order.
+    Rows removed from the source are removed here without re-filtering, new or changed rows re-apply the filter.
+    """
+
+    def __init__(self, parent: Optional[QObject] = None) -> None:
+        """
+        Initialize the AssetFilterModel.
+
+        :param parent: The parent object, if any.
+        """
+        super().__init__(parent)
+        self.text: str = ""
+        self.conditions: List[Tuple[str, str, float]] = []
+        # filters picked in the FacetPanel, kept apart from the typed ones
+        self.facet_equals: List[Tuple[str, str]] = []
+        self.facet_conditions: List[Tuple[str, str, float]] = []
+        self.sort_field: Optional[str] = None
+        self.descending: bool = False
+        self._order: np.ndarray = np.zeros(0, dtype=np.int64)
+        self._position: np.ndarray = np.zeros(0, dtype=np.int64)
+
+    def setSourceModel(self, model: AssetTableModel) -> None:
+        self.beginResetModel()
+        super().setSourceModel(model)
+        model.modelAboutToBeReset.connect(self.beginResetModel)
+        model.modelReset.connect(self._reset_done)
+        model.rowsAboutToBeRemoved.connect(self._source_rows_about_to_be_removed)
+        model.rowsRemoved.connect(self._source_rows_removed)
+        model.rowsAboutToBeInserted.connect(self.beginResetModel)
+        model.rowsInserted.connect(self._reset_done)
+        model.dataChanged.connect(self._source_data_changed)
+        self._select()
+        self.endResetModel()
+
+    def set_filter(self, text: str) -> None:
+        """
+        Filter on the text typed in the filter box, see parse_filter.
+
+        :param text: The filter text.
+        """
+        text, conditions = parse_filter(text)
+        if (text, conditions) == (self.text, self.conditions):
+            return
+        self.text, self.conditions = text, conditions
+        self.beginResetModel()
+        self._select()
+        self.endResetModel()
+
+    def set_facets(self, equals: List[Tuple[str, str]], conditions: List[Tuple[str, str, float]]) -> None:
+        """
+        Filter on the facets picked in the FacetPanel, on top of the filter box.
+
+        :param equals: (field, value) exact matches, e.g. ("mesh_type", "obj").
+        :param conditions: (field, comparison, value) ranges, e.g. ("face_count", ">=", 1000).
+        """
+        if (equals, conditions) == (self.facet_equals, self.facet_conditions):
+            return
+        self.facet_equals, self.facet_conditions = equals, conditions
+        self.beginResetModel()
+        self._select()
+        self.endResetModel()
+
+    def sort(self, column: int, order: Qt.SortOrder = Qt.AscendingOrder) -> None:
+        """
+        Sort on a metadata column, the rows shown don't change so selections are kept.
+        """
+        source = self.sourceModel()
+        if source is None or column < 0 or column >= len(source.metadata_columns):
+            return
+        self.sort_field = source.columns[column]
+        self.descending = order == Qt.DescendingOrder
+        self.layoutAboutToBeChanged.emit()
+        persistent = self.persistentIndexList()
+        sources = [self.mapToSource(index) for index in persistent]
+        self._select()
+        self.changePersistentIndexList(persistent, [self.mapFromSource(index) for index in sources])
+        self.layoutChanged.emit()
+
+    def _select(self) -> None:
+        source = self.sourceModel()
+        if source is None:
+            self._set_order(np.zeros(0, dtype=np.int64), 0)
+            return
+        conditions = self.conditions + self.facet_conditions
+        rows = source.metadata.select(self.text, conditions, self.sort_field, self.descending, self.facet_equals)
+        self._set_order(rows, source.rowCount())
+
+    def _set_order(self, order: np.ndarray, source_rows: int) -> None:
+        self._order = order
+        self._position = np.full(source_rows, -1, dtype=np.int64)
+        self._position[order] = np.arange(len(order))
+
+    def _reset_done(self) -> None:
+        self._select()
+        self.endResetModel()
+
+    def _source_rows_about_to_be_removed(self, parent: QModelIndex, first: int, last: int) -> None:
+        # remove the proxy rows in runs, highest first, while the source rows still exist
+        positions = self._position[first : last + 1]
+        positions = np.sort(positions[positions >= 0])[::-1].tolist()
+        runs = []
+        for position in positions:
+            if runs and runs[-1][0] == position + 1:
+                runs[-1][0] = position
+            else:
+                runs.append([position, position])
+        for start, end in runs:
+            self.beginRemoveRows(QModelIndex(), start, end)
+            self._order = np.delete(self._order, np.s_[start : end + 1])
+            self.endRemoveRows()
+
+    def _source_rows_removed(self, parent: QModelIndex, first: int, last: int) -> None:
+        order = self._order.copy()
+        order[order > last] -= last - first + 1
+        self._set_order(order, self.sourceModel().rowCount())
+
+    def _source_data_changed(
+        self, top_left: QModelIndex, bottom_right: QModelIndex, roles: Optional[List[int]] = None
+    ) -> None:
+        if not roles or Qt.DisplayRole in roles:
+            # metadata changed so the row may no longer match or be in the right place
+            self.beginResetModel()
+            self._reset_done()
+            return
+        positions = self._position[top_left.row() : bottom_right.row() + 1]
+        positions = positions[positions >= 0]
+        if len(positions):
+            first, last = int(positions.min()), int(positions.max())
+            self.dataChanged.emit(self.index(first, top_left.column()), self.index(last, bottom_right.column()), roles)
+
+    def index(self, row: int, column: int, parent: QModelIndex = QModelIndex()) -> QModelIndex:
+        if parent.isValid() or row < 0 or row >= len(self._order) or column < 0 or column >= self.columnCount():
+            return QModelIndex()
+        return self.createIndex(row, column)
+
+    def parent(self, index: QModelIndex = QModelIndex()) -> QModelIndex:
+        return QModelIndex()
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._order)
+
+    def columnCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        source = self.sourceModel()
+        return 0 if parent.isValid() or source is None else source.columnCount()
+
+    def headerData(self, section: int, orientation: Qt.Orientation, role: int = Qt.DisplayRole) -> Any:
+        if orientation == Qt.Horizontal:
+            return self.sourceModel().headerData(section, orientation, role)
+        return section + 1 if role == Qt.DisplayRole else None
+
+    def mapToSource(self, index: QModelIndex) -> QModelIndex:
+        if not index.isValid() or index.row() >= len(self._order):
+            return QModelIndex()
+        return self.sourceModel().index(int(self._order[index.row()]), index.column())
+
+    def mapFromSource(self, index: QModelIndex) -> QModelIndex:
+        if not index.isValid() or index.row() >= len(self._position) or self._position[index.row()] < 0:
+            return QModelIndex()
+        return self.index(int(self._position[index.row()]), index.column())
+
+    def column_index(self, name: str) -> int:
+        return self.sourceModel().column_index(name)
+
+    def get_data_at_index(self, row: int, name: str) -> Optional[Any]:
+        """
+        Retrieve data from a specific row of the sorted and filtered view and a column name.
+
+        :param row: The row index in this model.
+        :param name: The column name.
+        :return: The data at the specified row and column.
+        """
+        if row < 0 or row >= len(self._order):
+            return None
+        return self.sourceModel().get_data_at_index(int(self._order[row]), name)
@@ -0,0 +1,193 @@
+from typing import Any, Iterable, Optional, Tuple
+
+import numpy as np
+from qtpy.QtCore import QAbstractTableModel, QByteArray, QModelIndex, QObject, QSize, Qt, QTimer
+from qtpy.QtSql import QSqlDatabase, QSqlQuery
+
+from ImageLoader import ImageLoader
+from MetadataIndex import FIELDS, NUMERIC_FIELDS, MetadataIndex, data_version, read_metadata
+from PixmapCache import DEFAULT_CACHE_BYTES
+from row_runs import contiguous_runs
+from sql_queries import QUERIES, image_columns
+
+
+class AssetTableModel(QAbstractTableModel):
+    """
+    Table model for browsing the Meshes table.
+    The metadata (id, name, mesh type, sizes and stats) for every row is loaded once into a MetadataIndex, the
+    image columns are projected on top of it and only read from the database when a visible cell asks for them.
+    Hiding a column in the view therefore costs nothing and showing one only loads the images for the rows
+    being drawn. Decoded images live in the ImageLoader cache so they survive columns being toggled.
+    Use an AssetFilterModel on top of it to sort and filter.
+    """
+
+    metadata_columns: Tuple[str, ...] = FIELDS
+
+    def __init__(
+        self,
+        image_size: QSize = QSize(250, 250),
+        cache_bytes: int = DEFAULT_CACHE_BYTES,
+        parent: Optional[QObject] = None,
+    ):
+        """
+        Initialize the AssetTableModel.
+
+        :param image_size: The maximum size of the images shown in the table.
+        :param cache_bytes: The most memory the decoded images may use.
+        :param parent: The parent object, if any.
+        """
+        super().__init__(parent)
+        self.columns: Tuple[str, ...] = self.metadata_columns + image_columns
+        self.image_size: QSize = image_size
+        self.loader: ImageLoader = ImageLoader(image_size, cache_bytes, self)
+        self.loader.image_ready.connect(self._image_ready)
+        self.metadata: MetadataIndex = MetadataIndex()
+        self._watch_timer: QTimer = QTimer(self)
+        self._watch_timer.timeout.connect(self.refresh)
+
+    def load(self) -> None:
+        """
+        Load the metadata for every row in the open database, no blob data is read.
+        """
+        self.beginResetModel()
+        self.loader.reset()
+        try:
+            self.metadata.load()
+        finally:
+            self.endResetModel()
+
+    def watch(self, interval_ms: int = 1000) -> None:
+        """
+        Check for writes by other processes every interval_ms and apply them with refresh.
+
+        :param interval_ms: The time between checks, each is a single PRAGMA.
+        """
+        self._watch_timer.start(interval_ms)
+
+    def refresh(self) -> bool:
+        """
+        Bring the model up to date if another connection has written to the database since it was loaded.
+        Only the removed, changed and new rows are updated so the views keep their place.
+        Writes made through this connection don't change data_version, those update the model directly.
+
+        :return: True if anything was re-read.
+        """
+        if not QSqlDatabase.database().isOpen():
+            return False
+        version = data_version()
+        if version == self.metadata.version:
+            return False
+        self.metadata.version = version
+        removed, changed, updates, added = self.metadata.diff(read_metadata())
+        self._remove_rows(removed)
+        if len(changed):
+            changed = self.metadata.update(updates)
+            for item_id in updates["id"].tolist():
+                # the images may have been re-rendered too
+                self.loader.forget(item_id, image_columns)
+            last_column = len(self.columns) - 1
+            self.dataChanged.emit(self.index(int(changed.min()), 0), self.index(int(changed.max()), last_column))
+        # insert the new ids where they belong, highest first so the earlier positions stay valid
+        positions = np.searchsorted(self.metadata.rows["id"], added["id"])
+        for position in np.unique(positions)[::-1].tolist():
+            records = added[positions == position]
+            self.beginInsertRows(QModelIndex(), position, position + len(records) - 1)
+            self.metadata.insert(position, records)
+            self.endInsertRows()
+        return True
+
+    def remove_ids(self, ids: Iterable[int]) -> None:
+        """
+        Remove the rows for deleted ids without reloading the rest of the model.
+        Rows are removed in contiguous runs from the bottom up so the views only shift once per run.
+
+        :param ids: The ids that have been deleted from the database.
+        """
+        ids = list(ids)
+        self._remove_rows(self.metadata.rows_of_ids(ids))
+        for item_id in ids:
+            self.loader.forget(item_id, image_columns)
+
+    def _remove_rows(self, rows: np.ndarray) -> None:
+        for first, last in contiguous_runs(sorted(rows.tolist(), reverse=True)):
+            self.beginRemoveRows(QModelIndex(), first, last)
+            self.metadata.remove(first, last)
+            self.endRemoveRows()
+
+    def column_index(self, name: str) -> int:
+        """
+        Return the column number for a column name.
+
+        :param name: The column name.
+        :return: The column number or -1 if the name is not a column.
+        """
+        return self.columns.index(name) if name in self.columns else -1
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.metadata)
+
+    def columnCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.columns)
+
+    def headerData(self, section: int, orientation: Qt.Orientation, role: int = Qt.DisplayRole) -> Any:
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.columns[section]
+        return super().headerData(section, orientation, role)
+
+    def _metadata_value(self, row: int, name: str) -> Any:
+        value = self.metadata.rows[name][row].item()
+        # unknown stats are stored as -1
+        return None if name in NUMERIC_FIELDS and value < 0 else value
+
+    def data(self, index: QModelIndex, role: int = Qt.DisplayRole) -> Any:
+        """
+        Retrieve data from the model, image columns are returned as a QPixmap for the decoration role
+        once loaded.
+
+        :param index: The index of the data to retrieve.
+        :param role: The role for which data is requested.
+        :return: The data at the specified index and role.
+        """
+        if not index.isValid():
+            return None
+        row, col = index.row(), index.column()
+        if col < len(self.metadata_columns):
+            if role in [Qt.DisplayRole, Qt.EditRole]:
+                return self._metadata_value(row, self.columns[col])
+            return None
+        if role == Qt.DecorationRole:
+            return self.loader.get(self._metadata_value(row, "id"), self.columns[col])
+        if role == Qt.SizeHintRole:
+            return self.image_size
+        return None
+
+    def get_data_at_index(self, row: int, name: str) -> Optional[Any]:
+        """
+        Retrieve data from a specific row and column name, image columns are read straight from the database.
+
+        :param row: The row index.
+        :param name: The column name.
+        :return: The data at the specified row and column.
+        """
+        if row < 0 or row >= len(self.metadata):
+            return None
+        if name in self.metadata_columns:
+            return self._metadata_value(row, name)
+        if name not in image_columns and name != "mesh_data":
+            return None
+        query = QSqlQuery()
+        query.prepare(QUERIES["select_blob"].format(column=name))
+        query.addBindValue(self._metadata_value(row, "id"))
+        if query.exec() and query.next() and query.value(0):
+            return query.value(0)
+        return QByteArray()
+
+    def _image_ready(self, item_id: int, column: str) -> None:
+        """
+        Repaint a cell once its image has been decoded.
+        """
+        row = self.metadata.row_of_id(item_id)
+        col = self.column_index(column)
+        if row is not None and col >= 0:
+            index = self.index(row, col)
+            self.dataChanged.emit(index, index, [Qt.DecorationRole])
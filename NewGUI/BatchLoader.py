@@ -0,0 +1,170 @@
+import io
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from normalizeMesh import Normalization, normalize_obj, rewrite_positions, scan_bounds
+from qtpy.QtCore import QObject, QRunnable, QThreadPool, Signal
+from scripts.clutter_schema import MESH_TYPES, VIEW_COLUMNS
+from transcodeImages import SCREENSHOT_SUFFIXES
+
+
+@dataclass
+class AssetFiles:
+    """The files that make up a single asset, paired by the <name>Front/Side/Top/Persp.png (or .jpg) convention"""
+
+    name: str
+    mesh: Path
+    mesh_type: str
+    images: Dict[str, Path] = field(default_factory=dict)
+    # column : size in bytes of the file, filled in once the files have been checked
+    sizes: Dict[str, int] = field(default_factory=dict)
+    normalization: Optional[Normalization] = None
+    error: Optional[str] = None
+
+    def is_complete(self) -> bool:
+        """True if there is a screenshot for every view"""
+        return all(column in self.images for column in VIEW_COLUMNS.values())
+
+    def read_blobs(self) -> Dict[str, bytes]:
+        """
+        Read the mesh and screenshots, the mesh is normalized if a normalization was found when it was checked.
+        Blobs are only read as the asset is inserted so a large batch doesn't sit in memory.
+
+        :return: column : file contents.
+        """
+        if self.normalization is not None:
+            output = io.BytesIO()
+            with open(self.mesh, "rb") as stream:
+                rewrite_positions(stream, output, self.normalization)
+            blobs = {"mesh_data": output.getvalue()}
+        else:
+            blobs = {"mesh_data": self.mesh.read_bytes()}
+        for column, path in self.images.items():
+            blobs[column] = path.read_bytes()
+        return blobs
+
+
+def _files_below(paths: Iterable[Path]) -> Iterable[Path]:
+    for path in paths:
+        if path.is_dir():
+            yield from (child for child in path.rglob("*") if child.is_file())
+        elif path.is_file():
+            yield path
+
+
+def find_assets(paths: Iterable[Path]) -> List[AssetFiles]:
+    """
+    Find the assets in a set of dropped files and folders.
+    Every mesh file found becomes an asset named after the file, the screenshots in the same folder
+    named <name>Front.png, <name>Side.png, <name>Top.png and <name>Persp.png (or .jpg) are paired with it.
+
+    :param paths: The dropped files and folders, folders are searched recursively.
+    :return: The assets found sorted by name.
+    """
+    by_folder: Dict[Path, List[Path]] = {}
+    for file in _files_below(paths):
+        by_folder.setdefault(file.parent, []).append(file)
+
+    assets: List[AssetFiles] = []
+    for files in by_folder.values():
+        screenshots = {file.name: file for file in files if file.suffix.lower() in SCREENSHOT_SUFFIXES}
+        for file in files:
+            mesh_type = file.suffix.lower().lstrip(".")
+            if mesh_type not in MESH_TYPES:
+                continue
+            asset = AssetFiles(file.stem, file, mesh_type)
+            for view, column in VIEW_COLUMNS.items():
+                found = [screenshots.get(f"{file.stem}{view}{suffix}") for suffix in SCREENSHOT_SUFFIXES]
+                found = [image for image in found if image is not None]
+                if found:
+                    asset.images[column] = found[0]
+            assets.append(asset)
+    return sorted(assets, key=lambda asset: asset.name)
+
+
+class _LoadSignals(QObject):
+    """
+    Signals for the load tasks, QRunnable is not a QObject so can't emit on its own.
+    """
+
+    loaded = Signal(int)
+
+
+class _LoadTask(QRunnable):
+    """
+    Check the mesh and screenshots for one asset can be read on a worker thread, and for obj meshes being
+    normalized make the bounding box pass. Nothing is kept in memory, see AssetFiles.read_blobs.
+    """
+
+    def __init__(self, row: int, asset: AssetFiles, signals: _LoadSignals, normalize: bool = False) -> None:
+        super().__init__()
+        self.row = row
+        self.asset = asset
+        self.signals = signals
+        self.normalize = normalize
+
+    def run(self) -> None:
+        try:
+            with open(self.asset.mesh, "rb") as stream:
+                if self.normalize and self.asset.mesh_type == "obj":
+                    self.asset.normalization = scan_bounds(stream)
+            self.asset.sizes["mesh_data"] = self.asset.mesh.stat().st_size
+            for column, path in self.asset.images.items():
+                with open(path, "rb"):
+                    self.asset.sizes[column] = path.stat().st_size
+        except (OSError, ValueError) as e:
+            self.asset.error = str(e)
+        self.signals.loaded.emit(self.row)
+
+
+class BatchLoader(QObject):
+    """
+    Check the files for a batch of assets on a thread pool so the dialog stays responsive.
+    progress is emitted as each asset finishes and finished once they all have.
+    If normalize is set obj meshes are centred and scaled to unit size when they are read for inserting.
+    """
+
+    progress = Signal(int, int)
+    asset_loaded = Signal(int)
+    finished = Signal()
+
+    def __init__(self, parent: Optional[QObject] = None) -> None:
+        """
+        Initialize the BatchLoader.
+
+        :param parent: The parent object, if any.
+        """
+        super().__init__(parent)
+        self.assets: List[AssetFiles] = []
+        self.normalize: bool = False
+        self._done: int = 0
+        self._pool: QThreadPool = QThreadPool.globalInstance()
+        self._signals = _LoadSignals()
+        self._signals.loaded.connect(self._asset_loaded)
+
+    def is_running(self) -> bool:
+        return self._done < len(self.assets)
+
+    def add(self, assets: List[AssetFiles]) -> None:
+        """
+        Add assets to the batch and start loading them, assets whose mesh is already in the batch are skipped.
+
+        :param assets: The assets to load.
+        """
+        known = {asset.mesh for asset in self.assets}
+        assets = [asset for asset in assets if asset.mesh not in known]
+        first = len(self.assets)
+        self.assets.extend(assets)
+        self.progress.emit(self._done, len(self.assets))
+        for row, asset in enumerate(assets, first):
+            self._pool.start(_LoadTask(row, asset, self._signals, self.normalize))
+        if not self.is_running():
+            self.finished.emit()
+
+    def _asset_loaded(self, row: int) -> None:
+        self._done += 1
+        self.asset_loaded.emit(row)
+        self.progress.emit(self._done, len(self.assets))
+        if self._done == len(self.assets):
+            self.finished.emit()
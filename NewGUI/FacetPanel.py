@@ -0,0 +1,164 @@
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from facetCounts import FACE_BUCKETS
+from qtpy.QtCore import QAbstractItemModel, QModelIndex, Qt, QTimer, Signal
+from qtpy.QtGui import QFont
+from qtpy.QtSql import QSqlDatabase, QSqlQuery
+from qtpy.QtWidgets import QTreeWidget, QTreeWidgetItem, QWidget
+
+from sql_queries import QUERIES
+
+# facets in the order they are shown, see facetCounts.py
+FACETS: Tuple[str, ...] = ("mesh_type", "category", "author", "face_count")
+# the (facet, value) of a value item
+FACET_ROLE = Qt.UserRole
+# compared with the roles sent by dataChanged as ints, comparing Qt enums is slow
+DISPLAY_ROLE = int(Qt.DisplayRole)
+
+
+def bucket_label(value: str) -> str:
+    """
+    The label for a face count bucket.
+
+    :param value: The lower bound of the bucket as stored in FacetCounts.
+    :return: For example "1000-9999" or "1000000+".
+    """
+    bound = int(value)
+    upper = [limit for limit in FACE_BUCKETS if limit > bound]
+    return f"{bound}-{upper[0] - 1}" if upper else f"{bound}+"
+
+
+class FacetPanel(QTreeWidget):
+    """
+    Shows the number of assets with each mesh type, category, author and face count bucket, read from the
+    FacetCounts table which triggers keep up to date (see facetCounts.py), so it is a read of a few rows rather
+    than a GROUP BY over Meshes. Clicking a value picks it as a filter for that facet, clicking it again clears
+    it. The picked filters are sent with filters_changed, ready for AssetFilterModel.set_facets.
+    """
+
+    # (field, value) exact matches and (field, comparison, value) ranges
+    filters_changed = Signal(list, list)
+
+    def __init__(self, parent: Optional[QWidget] = None) -> None:
+        """
+        Initialize the FacetPanel.
+
+        :param parent: The parent widget, if any.
+        """
+        super().__init__(parent)
+        self.setHeaderLabels(["facet", "count"])
+        self.setRootIsDecorated(True)
+        self.selected: Dict[str, str] = {}
+        self.itemClicked.connect(self._item_clicked)
+        # several model signals arrive together after a refresh so re-read once they are done
+        self._reload_timer: QTimer = QTimer(self)
+        self._reload_timer.setSingleShot(True)
+        self._reload_timer.setInterval(0)
+        self._reload_timer.timeout.connect(self.load)
+
+    def watch(self, model: QAbstractItemModel) -> None:
+        """
+        Re-read the counts whenever the rows or displayed values of a model of the assets change, not for
+        thumbnails arriving from the image loader.
+
+        :param model: Usually the AssetTableModel.
+        """
+        for signal in (model.modelReset, model.rowsInserted, model.rowsRemoved):
+            signal.connect(self._reload_timer.start)
+        model.dataChanged.connect(self._data_changed)
+
+    def _data_changed(self, top_left: QModelIndex, bottom_right: QModelIndex, roles: Sequence[int] = ()) -> None:
+        # no roles means everything changed
+        if not roles or DISPLAY_ROLE in [int(role) for role in roles]:
+            self._reload_timer.start()
+
+    def read_counts(self) -> Dict[str, List[Tuple[str, int]]]:
+        """
+        Read the facet counts from the open database.
+
+        :return: {facet: [(value, count)]} most common value first and face count buckets in order,
+        empty if the database has no FacetCounts table.
+        """
+        if "FacetCounts" not in QSqlDatabase.database().tables():
+            return {}
+        query = QSqlQuery()
+        query.setForwardOnly(True)
+        if not query.exec(QUERIES["select_facets"]):
+            raise RuntimeError(f"Failed to execute query: {query.lastError().text()}")
+        counts: Dict[str, List[Tuple[str, int]]] = {facet: [] for facet in FACETS}
+        while query.next():
+            facet, value, count = query.value(0), query.value(1), int(query.value(2))
+            counts.setdefault(facet, []).append((value, count))
+        for facet, values in counts.items():
+            if facet == "face_count":
+                values.sort(key=lambda item: int(item[0]))
+            else:
+                values.sort(key=lambda item: (-item[1], item[0]))
+        return counts
+
+    def load(self) -> None:
+        """
+        Show the counts for the open database, picked values that no longer exist are dropped.
+        """
+        counts = self.read_counts() if QSqlDatabase.database().isOpen() else {}
+        tops = [self.topLevelItem(row) for row in range(self.topLevelItemCount())]
+        expanded = {item.text(0) for item in tops if item.isExpanded()}
+        self.clear()
+        selected = {}
+        for facet, values in counts.items():
+            parent = QTreeWidgetItem(self, [facet, f"{sum(count for _, count in values):,}"])
+            for value, count in values:
+                label = bucket_label(value) if facet == "face_count" else value or "(none)"
+                item = QTreeWidgetItem(parent, [label, f"{count:,}"])
+                item.setData(0, FACET_ROLE, (facet, value))
+                if self.selected.get(facet) == value:
+                    selected[facet] = value
+                    self._mark(item, True)
+            parent.setExpanded(facet in expanded or not expanded)
+        self.resizeColumnToContents(0)
+        if selected != self.selected:
+            self.selected = selected
+            self._emit_filters()
+
+    def filters(self) -> Tuple[List[Tuple[str, str]], List[Tuple[str, str, float]]]:
+        """
+        The picked values as filters for AssetFilterModel.set_facets.
+
+        :return: The exact matches and the ranges.
+        """
+        equals, conditions = [], []
+        for facet, value in self.selected.items():
+            if facet != "face_count":
+                equals.append((facet, value))
+                continue
+            bound = int(value)
+            conditions.append((facet, ">=", float(bound)))
+            upper = [limit for limit in FACE_BUCKETS if limit > bound]
+            if upper:
+                conditions.append((facet, "<", float(upper[0])))
+        return equals, conditions
+
+    def _item_clicked(self, item: QTreeWidgetItem, column: int) -> None:
+        data = item.data(0, FACET_ROLE)
+        if data is None:
+            return
+        facet, value = data
+        if self.selected.get(facet) == value:
+            del self.selected[facet]
+        else:
+            self.selected[facet] = value
+        parent = item.parent()
+        for row in range(parent.childCount()):
+            child = parent.child(row)
+            self._mark(child, self.selected.get(facet) == child.data(0, FACET_ROLE)[1])
+        self._emit_filters()
+
+    @staticmethod
+    def _mark(item: QTreeWidgetItem, picked: bool) -> None:
+        font = QFont(item.font(0))
+        font.setBold(picked)
+        item.setFont(0, font)
+        item.setFont(1, font)
+
+    def _emit_filters(self) -> None:
+        self.filters_changed.emit(*self.filters())
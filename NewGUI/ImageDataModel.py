@@ -1,4 +1,5 @@
-from typing import Any, Optional
+import time
+from typing import Any, Dict, List, Optional
 
 from qtpy.QtCore import QByteArray, QModelIndex, Qt
 from qtpy.QtGui import QPixmap
@@ -6,6 +7,41 @@ from qtpy.QtSql import QSqlQueryModel
 from qtpy.QtWidgets import QWidget
 
 
+class DecodeStats:
+    """
+    Accumulates how many bytes of each image column were decoded and how long it took, so the size
+    saved by transcoding the screenshots (see transcodeImages.py) can be weighed against decode time.
+    """
+
+    def __init__(self) -> None:
+        self._totals: Dict[str, List[float]] = {}
+
+    def record(self, column: str, size: int, seconds: float) -> None:
+        """
+        Record a single decode.
+
+        :param column: The image column (or format) the data came from.
+        :param size: The encoded size in bytes.
+        :param seconds: The time taken to decode.
+        """
+        totals = self._totals.setdefault(column, [0, 0, 0.0])
+        totals[0] += 1
+        totals[1] += size
+        totals[2] += seconds
+
+    def report(self) -> str:
+        """
+        Return a summary of the average encoded size and decode time for each column.
+        """
+        lines = []
+        for column, (count, size, seconds) in sorted(self._totals.items()):
+            lines.append(f"{column}: {count} images, {size / count / 1024:.1f} KiB avg, {1000 * seconds / count:.2f} ms decode avg")
+        return "\n".join(lines)
+
+    def __bool__(self) -> bool:
+        return bool(self._totals)
+
+
 class ImageDataModel(QSqlQueryModel):
     """
     A custom data model for handling image data stored in a database.
@@ -21,6 +57,7 @@ class ImageDataModel(QSqlQueryModel):
         super().__init__(parent)
         self._image_columns_checked: bool = False
         self._image_columns: set[int] = set()
+        self.decode_stats: DecodeStats = DecodeStats()
 
     def _detect_image_columns(self) -> None:
         """
@@ -57,7 +94,10 @@ class ImageDataModel(QSqlQueryModel):
             if role == Qt.DecorationRole:
                 if isinstance(value, QByteArray):
                     pixmap = QPixmap()
-                    if pixmap.loadFromData(bytes(value)):
+                    start = time.perf_counter()
+                    loaded = pixmap.loadFromData(bytes(value))
+                    self.decode_stats.record(self.headerData(col, Qt.Horizontal), value.size(), time.perf_counter() - start)
+                    if loaded:
                         return pixmap
         return super().data(index, role)
 
@@ -0,0 +1,215 @@
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+from qtpy.QtCore import QObject, QRunnable, QSize, Qt, QThreadPool, QTimer, Signal
+from qtpy.QtGui import QImage, QPixmap
+from qtpy.QtSql import QSqlDatabase
+
+from ImageDataModel import DecodeStats
+from PixmapCache import DEFAULT_CACHE_BYTES, PixmapCache
+from scripts.clutter_schema import connect_read_only
+from sql_queries import select_images
+
+# image fetches are split into batches, small enough to spread over the pool threads and stay under SQLite's
+# limit on bound parameters
+FETCH_BATCH_SIZE = 64
+# ids with no image (or one that didn't decode) are asked for again after this long, the image may have been added
+MISSING_RETRY_SECONDS = 30.0
+# size passed with a null image when the blob couldn't be read, so the id is retried rather than marked missing
+READ_FAILED = -1
+
+# pool threads each keep their own read only connection, sqlite connections can't be shared between threads
+_thread_connections = threading.local()
+
+
+def _read_connection(database: str) -> sqlite3.Connection:
+    connections = getattr(_thread_connections, "connections", None)
+    if connections is None:
+        connections = _thread_connections.connections = {}
+    connection = connections.get(database)
+    if connection is None:
+        connection = connect_read_only(database, timeout=5)
+        connections[database] = connection
+    return connection
+
+
+class _DecodeSignals(QObject):
+    """
+    Signals for the fetch tasks, QRunnable is not a QObject so can't emit on its own.
+    """
+
+    decoded = Signal(int, int, str, QImage, int, float)
+
+
+class _FetchTask(QRunnable):
+    """
+    Read a batch of image blobs and decode (and optionally scale) them off the GUI thread.
+    The blobs are read with a read only sqlite3 connection owned by the pool thread, QImage is safe to use
+    in worker threads and the QPixmap conversion happens back in the GUI thread.
+    """
+
+    def __init__(
+        self,
+        generation: int,
+        database: str,
+        column: str,
+        ids: List[int],
+        size: Optional[QSize],
+        signals: _DecodeSignals,
+    ) -> None:
+        super().__init__()
+        self.generation = generation
+        self.database = database
+        self.column = column
+        self.ids = ids
+        self.size = size
+        self.signals = signals
+
+    def run(self) -> None:
+        try:
+            rows = _read_connection(self.database).execute(select_images(self.column, len(self.ids)), self.ids)
+            blobs = dict(rows.fetchall())
+        except sqlite3.Error as e:
+            print(f"Failed to fetch images: {e}")
+            for item_id in self.ids:
+                self.signals.decoded.emit(self.generation, item_id, self.column, QImage(), READ_FAILED, 0.0)
+            return
+        for item_id in self.ids:
+            data = blobs.get(item_id)
+            image = QImage()
+            start = time.perf_counter()
+            loaded = bool(data) and image.loadFromData(data)
+            elapsed = time.perf_counter() - start
+            if loaded and self.size is not None:
+                image = image.scaled(self.size, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+            self.signals.decoded.emit(self.generation, item_id, self.column, image, len(data or b""), elapsed)
+
+
+class ImageLoader(QObject):
+    """
+    Loads image blobs on demand for models that only hold the lightweight metadata.
+    Requests made while painting are collected on the next event loop pass and handed to a thread pool in
+    batches, each batch is read with one query and decoded off the GUI thread, then stored in a PixmapCache
+    keyed by (id, column). Ids without an image are asked for again after MISSING_RETRY_SECONDS.
+    """
+
+    image_ready = Signal(int, str)
+
+    def __init__(
+        self, size: Optional[QSize] = None, cache_bytes: int = DEFAULT_CACHE_BYTES, parent: Optional[QObject] = None
+    ) -> None:
+        """
+        Initialize the ImageLoader.
+
+        :param size: The size images are scaled to once decoded, None keeps the original size.
+        :param cache_bytes: The most memory the decoded images may use.
+        :param parent: The parent object, if any.
+        """
+        super().__init__(parent)
+        self.size: Optional[QSize] = size
+        self.cache: PixmapCache = PixmapCache(cache_bytes)
+        self.decode_stats: DecodeStats = DecodeStats()
+        self._wanted: Dict[str, Set[int]] = {}
+        self._pending: Set[Tuple[int, str]] = set()
+        # (id, column) : when it was found to have no image
+        self._missing: Dict[Tuple[int, str], float] = {}
+        self._generation: int = 0
+        self._pool: QThreadPool = QThreadPool.globalInstance()
+        self._signals = _DecodeSignals()
+        self._signals.decoded.connect(self._image_decoded)
+        self._flush_timer: QTimer = QTimer(self)
+        self._flush_timer.setSingleShot(True)
+        self._flush_timer.timeout.connect(self._fetch_wanted)
+
+    def reset(self) -> None:
+        """
+        Forget everything, used when the underlying database changes.
+        Decodes still in flight are ignored when they arrive.
+        """
+        self._generation += 1
+        self.cache.clear()
+        self._wanted.clear()
+        self._pending.clear()
+        self._missing.clear()
+
+    def forget(self, item_id: int, columns) -> None:
+        """
+        Drop any cached images for a single id, for example once it has been deleted.
+
+        :param item_id: The id of the item.
+        :param columns: The image columns to drop.
+        """
+        for column in columns:
+            key = (item_id, column)
+            self.cache.discard(key)
+            self._missing.pop(key, None)
+
+    def get(self, item_id: int, column: str) -> Optional[QPixmap]:
+        """
+        Return the decoded image if it is ready, otherwise queue it and return None.
+        image_ready is emitted once a queued image has been decoded.
+
+        :param item_id: The id of the item.
+        :param column: The image column to load.
+        :return: The pixmap or None if not loaded yet (or there is no image).
+        """
+        pixmap = self.cache.get((item_id, column))
+        if pixmap is None:
+            self.request(item_id, column)
+        return pixmap
+
+    def request(self, item_id: int, column: str) -> None:
+        """
+        Queue an image to be loaded if it isn't already cached or on its way.
+
+        :param item_id: The id of the item.
+        :param column: The image column to load.
+        """
+        key = (item_id, column)
+        if key in self.cache or key in self._pending:
+            return
+        missing = self._missing.get(key)
+        if missing is not None:
+            if time.monotonic() - missing < MISSING_RETRY_SECONDS:
+                return
+            del self._missing[key]
+        self._wanted.setdefault(column, set()).add(item_id)
+        if not self._flush_timer.isActive():
+            self._flush_timer.start(0)
+
+    def _fetch_wanted(self) -> None:
+        """
+        Hand the queued images to the pool in batches, the blobs are read and decoded in the pool threads.
+        """
+        wanted = self._wanted
+        self._wanted = {}
+        database = QSqlDatabase.database().databaseName()
+        if not database:
+            return
+        for column, ids in wanted.items():
+            ids = sorted(ids)
+            self._pending.update((item_id, column) for item_id in ids)
+            for start in range(0, len(ids), FETCH_BATCH_SIZE):
+                batch = ids[start : start + FETCH_BATCH_SIZE]
+                self._pool.start(_FetchTask(self._generation, database, column, batch, self.size, self._signals))
+
+    def _image_decoded(
+        self, generation: int, item_id: int, column: str, image: QImage, size: int, seconds: float
+    ) -> None:
+        """
+        Store a decoded image and tell the owner it is ready.
+        """
+        if size > 0:
+            self.decode_stats.record(column, size, seconds)
+        if generation != self._generation:
+            return
+        key = (item_id, column)
+        self._pending.discard(key)
+        if image.isNull():
+            if size != READ_FAILED:
+                self._missing[key] = time.monotonic()
+            return
+        self.cache.put(key, QPixmap.fromImage(image))
+        self.image_ready.emit(item_id, column)
@@ -0,0 +1,86 @@
+from typing import Optional
+
+from qtpy.QtCore import QObject, QTimer
+from qtpy.QtSql import QSqlQuery
+
+from sql_queries import QUERIES
+
+# value of PRAGMA auto_vacuum for INCREMENTAL mode
+AUTO_VACUUM_INCREMENTAL = 2
+
+
+class IncrementalVacuum(QObject):
+    """
+    Give free pages back to the file system in small steps from the event loop.
+    Deleting rows with large blobs leaves their pages on the free list, a full VACUUM rewrites the whole
+    file and blocks the GUI, so instead we run PRAGMA incremental_vacuum a few pages at a time until the
+    free list is empty. This only works on databases created with auto_vacuum=INCREMENTAL, older databases
+    can be switched over once with convert.
+    """
+
+    def __init__(self, pages_per_step: int = 64, interval_ms: int = 20, parent: Optional[QObject] = None) -> None:
+        """
+        Initialize the IncrementalVacuum.
+
+        :param pages_per_step: The number of pages to free on each timer tick.
+        :param interval_ms: The time between steps so the GUI stays responsive.
+        :param parent: The parent object, if any.
+        """
+        super().__init__(parent)
+        self.pages_per_step: int = pages_per_step
+        self._timer: QTimer = QTimer(self)
+        self._timer.setInterval(interval_ms)
+        self._timer.timeout.connect(self._step)
+
+    @staticmethod
+    def _pragma_value(pragma: str) -> int:
+        query = QSqlQuery()
+        if query.exec(pragma) and query.next():
+            return int(query.value(0))
+        return 0
+
+    def is_supported(self) -> bool:
+        """
+        Check the open database was created with auto_vacuum=INCREMENTAL.
+        """
+        return self._pragma_value(QUERIES["auto_vacuum"]) == AUTO_VACUUM_INCREMENTAL
+
+    def convert(self) -> None:
+        """
+        Switch the open database to auto_vacuum=INCREMENTAL. The mode only changes when the file is rebuilt, so
+        this runs a full VACUUM which blocks until the whole file has been rewritten, it only needs doing once.
+        """
+        self.stop()
+        query = QSqlQuery()
+        for sql in [QUERIES["auto_vacuum_incremental"], QUERIES["vacuum"]]:
+            if not query.exec(sql):
+                raise RuntimeError(f"Failed to execute query: {query.lastError().text()}")
+
+    def start(self) -> None:
+        """
+        Start reclaiming free pages in the background if the database supports it.
+        """
+        if not self._timer.isActive() and self.is_supported():
+            self._timer.start()
+
+    def stop(self) -> None:
+        """
+        Stop reclaiming, for example before the database is closed.
+        """
+        self._timer.stop()
+
+    def _step(self) -> None:
+        """
+        Free the next batch of pages, stopping once the free list is empty.
+        """
+        if self._pragma_value(QUERIES["freelist_count"]) == 0:
+            self._timer.stop()
+            return
+        query = QSqlQuery()
+        if not query.exec(QUERIES["incremental_vacuum"].format(pages=self.pages_per_step)):
+            print(f"incremental vacuum failed: {query.lastError().text()}")
+            self._timer.stop()
+            return
+        # each step of the pragma frees a page so it has to be run to completion
+        while query.next():
+            pass
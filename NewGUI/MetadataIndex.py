@@ -0,0 +1,236 @@
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+from qtpy.QtSql import QSqlDatabase, QSqlQuery
+
+from sql_queries import QUERIES, select_metadata_query
+
+# the metadata kept for every asset, the stats come from the MeshStats table and are -1 when unknown,
+# category and author come from the MeshInfo table (see facetCounts.py) and are "" when unknown
+FIELDS: Tuple[str, ...] = (
+    "id",
+    "name",
+    "mesh_type",
+    "mesh_size",
+    "image_size",
+    "vertex_count",
+    "face_count",
+    "category",
+    "author",
+)
+NUMERIC_FIELDS: Tuple[str, ...] = ("id", "mesh_size", "image_size", "vertex_count", "face_count")
+# free text fields stored at the width of their longest value
+TEXT_FIELDS: Tuple[str, ...] = ("name", "category", "author")
+COMPARISONS = {
+    "<": np.less,
+    "<=": np.less_equal,
+    ">": np.greater,
+    ">=": np.greater_equal,
+    "=": np.equal,
+}
+
+
+def metadata_dtype(name_length: int, category_length: int = 1, author_length: int = 1) -> np.dtype:
+    """
+    The structured array type for the index, the text fields are stored as fixed width strings.
+
+    :param name_length: The length of the longest name.
+    :param category_length: The length of the longest category.
+    :param author_length: The length of the longest author.
+    :return: The dtype.
+    """
+    return np.dtype(
+        [
+            ("id", np.int64),
+            ("name", f"U{max(name_length, 1)}"),
+            ("mesh_type", "U8"),
+            ("mesh_size", np.int64),
+            ("image_size", np.int64),
+            ("vertex_count", np.int64),
+            ("face_count", np.int64),
+            ("category", f"U{max(category_length, 1)}"),
+            ("author", f"U{max(author_length, 1)}"),
+        ]
+    )
+
+
+def data_version() -> int:
+    """
+    PRAGMA data_version for the open connection, it changes whenever another connection commits to the database.
+
+    :return: The version or -1 if it couldn't be read.
+    """
+    query = QSqlQuery()
+    if query.exec(QUERIES["data_version"]) and query.next():
+        return int(query.value(0))
+    return -1
+
+
+def read_metadata() -> np.ndarray:
+    """
+    Read the metadata for every asset in the open database, ordered by id. No blob data is read.
+
+    :return: A structured array with the FIELDS columns.
+    """
+    tables = QSqlDatabase.database().tables()
+    query = QSqlQuery()
+    query.setForwardOnly(True)
+    if not query.exec(select_metadata_query("MeshStats" in tables, "MeshInfo" in tables)):
+        raise RuntimeError(f"Failed to execute query: {query.lastError().text()}")
+    records = []
+    while query.next():
+        records.append(tuple(query.value(column) for column in range(len(FIELDS))))
+    lengths = [max((len(record[FIELDS.index(field)]) for record in records), default=1) for field in TEXT_FIELDS]
+    return np.array(records, dtype=metadata_dtype(*lengths))
+
+
+class MetadataIndex:
+    """
+    The lightweight metadata of every asset held in a NumPy structured array, one row per asset ordered by id.
+    Sorting and filtering are done on the arrays so they never touch SQLite, and refresh only re-reads the
+    metadata when PRAGMA data_version says another process has written to the database.
+    """
+
+    def __init__(self) -> None:
+        """
+        Initialize an empty MetadataIndex.
+        """
+        self.rows: np.ndarray = np.zeros(0, dtype=metadata_dtype(1))
+        self.version: int = -1
+        self._lower_names: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def load(self) -> None:
+        """
+        Read the metadata for the open database.
+        """
+        # taken first so a write during the read is picked up by the next refresh
+        self.version = data_version()
+        self.set_rows(read_metadata())
+
+    def set_rows(self, rows: np.ndarray) -> None:
+        self.rows = rows
+        self._lower_names = None
+
+    @property
+    def lower_names(self) -> np.ndarray:
+        """
+        The names in lower case for case insensitive filtering and sorting, built the first time they are needed.
+        """
+        if self._lower_names is None:
+            names = [name.lower() for name in self.rows["name"].tolist()]
+            self._lower_names = np.array(names, dtype=self.rows.dtype["name"])
+        return self._lower_names
+
+    def row_of_id(self, item_id: int) -> Optional[int]:
+        """
+        Find the row for an id.
+
+        :param item_id: The asset id.
+        :return: The row number, None if the id isn't in the index.
+        """
+        row = int(np.searchsorted(self.rows["id"], item_id))
+        if row < len(self.rows) and self.rows["id"][row] == item_id:
+            return row
+        return None
+
+    def rows_of_ids(self, ids: Iterable[int]) -> np.ndarray:
+        """
+        Find the rows for several ids, ids that aren't in the index are skipped.
+
+        :param ids: The asset ids.
+        :return: The row numbers.
+        """
+        ids = np.fromiter(ids, dtype=np.int64)
+        rows = np.searchsorted(self.rows["id"], ids)
+        found = rows < len(self.rows)
+        rows, ids = rows[found], ids[found]
+        return rows[self.rows["id"][rows] == ids]
+
+    def remove(self, first: int, last: int) -> None:
+        """
+        Remove the rows first to last inclusive.
+        """
+        self.set_rows(np.delete(self.rows, np.s_[first : last + 1]))
+
+    def insert(self, row: int, records: np.ndarray) -> None:
+        """
+        Insert records before row, the ids must keep the index ordered.
+        """
+        self.widen(records.dtype)
+        self.set_rows(np.insert(self.rows, row, records.astype(self.rows.dtype)))
+
+    def update(self, records: np.ndarray) -> np.ndarray:
+        """
+        Replace the rows with the same ids as records.
+
+        :param records: New records for ids in the index.
+        :return: The rows that were replaced.
+        """
+        self.widen(records.dtype)
+        rows = self.rows_of_ids(records["id"])
+        self.rows[rows] = records.astype(self.rows.dtype)
+        self._lower_names = None
+        return rows
+
+    def widen(self, dtype: np.dtype) -> None:
+        """
+        Make sure text as long as that in dtype fits in the index.
+        """
+        lengths = [max(dtype[field].itemsize, self.rows.dtype[field].itemsize) // 4 for field in TEXT_FIELDS]
+        wide = metadata_dtype(*lengths)
+        if wide != self.rows.dtype:
+            self.set_rows(self.rows.astype(wide))
+
+    def diff(self, fresh: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Compare the index with newly read metadata.
+
+        :param fresh: The result of read_metadata.
+        :return: The rows that have been removed, the rows that have changed with their new records,
+        and the records for new ids, ordered by id.
+        """
+        in_fresh = np.isin(self.rows["id"], fresh["id"], assume_unique=True)
+        in_index = np.isin(fresh["id"], self.rows["id"], assume_unique=True)
+        kept = np.flatnonzero(in_fresh)
+        updates = fresh[in_index]
+        changed = np.zeros(len(kept), dtype=bool)
+        for field in FIELDS:
+            changed |= self.rows[field][kept] != updates[field]
+        return np.flatnonzero(~in_fresh), kept[changed], updates[changed], fresh[~in_index]
+
+    def select(
+        self,
+        text: str = "",
+        conditions: Optional[List[Tuple[str, str, float]]] = None,
+        sort_field: Optional[str] = None,
+        descending: bool = False,
+        equals: Optional[List[Tuple[str, str]]] = None,
+    ) -> np.ndarray:
+        """
+        Filter and sort the index.
+
+        :param text: Only keep names containing this, ignoring case.
+        :param conditions: (field, comparison, value) range filters on the numeric fields,
+        e.g. ("face_count", ">", 1000). Unknown stats never match.
+        :param equals: (field, value) exact matches on the text fields, e.g. ("mesh_type", "obj").
+        :param sort_field: The field to sort on, None keeps id order.
+        :param descending: Sort highest first.
+        :return: The matching row numbers in display order.
+        """
+        mask = np.ones(len(self.rows), dtype=bool)
+        if text:
+            mask &= np.char.find(self.lower_names, text.lower()) >= 0
+        for field, comparison, value in conditions or []:
+            values = self.rows[field]
+            mask &= (values >= 0) & COMPARISONS[comparison](values, value)
+        for field, value in equals or []:
+            mask &= self.rows[field] == value
+        rows = np.flatnonzero(mask)
+        if sort_field is not None:
+            keys = self.lower_names[rows] if sort_field == "name" else self.rows[sort_field][rows]
+            order = np.argsort(keys, kind="stable")
+            rows = rows[order[::-1] if descending else order]
+        return rows
@@ -1,25 +1,37 @@
+import tempfile
+from pathlib import Path
+from typing import Optional
+
 from qtpy.Qt3DCore import QEntity, QTransform
 from qtpy.Qt3DExtras import QFirstPersonCameraController, QMetalRoughMaterial, Qt3DWindow
 from qtpy.Qt3DRender import QMesh
 from qtpy.QtCore import Qt, QUrl
 from qtpy.QtGui import QVector3D
-from qtpy.QtWidgets import QVBoxLayout, QWidget
+from qtpy.QtWidgets import QLabel, QVBoxLayout, QWidget
 
 
 class ModelViewer(QWidget):
-    def __init__(self, parent=None):
-        super().__init__()
+    """
+    Qt3D view of a single asset's mesh, empty until show_mesh is called.
+    QMesh can only load from a file so the mesh is written to a temporary folder owned by the viewer.
+    """
+
+    def __init__(self, parent: Optional[QWidget] = None) -> None:
+        super().__init__(parent)
         layout = QVBoxLayout(self)
+        self.temp_dir = tempfile.TemporaryDirectory(prefix="clutter_viewer_")
+        self.loaded = 0
+        self.label = QLabel("Select an asset to view it")
+        layout.addWidget(self.label)
 
         # Create the 3D window
         self.view = Qt3DWindow()
-        self.view.defaultFrameGraph().setClearColor(Qt.gray)  # Set background to black
+        self.view.defaultFrameGraph().setClearColor(Qt.gray)
 
-        # Root entity
-        root_entity = QEntity()
+        # Root entity, kept so Python doesn't delete the scene (and the mesh with it)
+        self.root_entity = root_entity = QEntity()
 
-        mesh = QMesh()
-        mesh.setSource(QUrl.fromLocalFile("Helix.obj"))
+        self.mesh = QMesh(root_entity)
 
         material = QMetalRoughMaterial()
         transform = QTransform()
@@ -27,7 +39,7 @@ class ModelViewer(QWidget):
         transform.setTranslation(QVector3D(0, 0, 0))
         mesh_entity = QEntity(root_entity)
 
-        mesh_entity.addComponent(mesh)
+        mesh_entity.addComponent(self.mesh)
         mesh_entity.addComponent(material)
         mesh_entity.addComponent(transform)
 
@@ -51,7 +63,24 @@ class ModelViewer(QWidget):
         layout.addWidget(container)
         self.resize(800, 600)
 
-        # Debugging
-        print("Qt3DWindow created:", self.view)
-        print("Container size:", container.size())
-        print("Container focus policy:", container.focusPolicy())
+    def show_mesh(self, name: str, data: bytes, mesh_type: str) -> None:
+        """
+        Show a mesh from the database.
+
+        :param name: The asset name, shown above the view.
+        :param data: The mesh_data blob.
+        :param mesh_type: The mesh_type of the asset, used as the file suffix so QMesh picks the right loader.
+        """
+        # QMesh only reloads when the source changes so every mesh gets its own file
+        for old in Path(self.temp_dir.name).iterdir():
+            old.unlink()
+        self.loaded += 1
+        path = Path(self.temp_dir.name) / f"mesh{self.loaded}.{mesh_type}"
+        path.write_bytes(data)
+        self.mesh.setSource(QUrl.fromLocalFile(str(path)))
+        self.label.setText(f"{name} ({mesh_type})")
+
+    def clear(self) -> None:
+        """Show nothing"""
+        self.mesh.setSource(QUrl())
+        self.label.setText("Select an asset to view it")
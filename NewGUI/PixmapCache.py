@@ -0,0 +1,85 @@
+from collections import OrderedDict
+from typing import Hashable, Optional
+
+from qtpy.QtGui import QPixmap
+
+# the default budget for decoded pixmaps, about 1000 128x128 thumbnails or 250 250x250 images
+DEFAULT_CACHE_BYTES = 64 << 20
+
+
+def pixmap_bytes(pixmap: QPixmap) -> int:
+    """
+    The memory a decoded pixmap takes up.
+
+    :param pixmap: The pixmap.
+    :return: Its size in bytes.
+    """
+    return pixmap.width() * pixmap.height() * max(1, pixmap.depth()) // 8
+
+
+class PixmapCache:
+    """
+    A small least recently used cache of decoded pixmaps.
+    Views only hold on to the images they have recently drawn, older entries are dropped
+    (and their memory recycled) once the pixmaps held add up to more than max_bytes.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_CACHE_BYTES) -> None:
+        """
+        Initialize the PixmapCache.
+
+        :param max_bytes: The most memory the decoded pixmaps may use.
+        """
+        self.max_bytes: int = max_bytes
+        self.size_bytes: int = 0
+        self._items: OrderedDict[Hashable, QPixmap] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._items
+
+    def get(self, key: Hashable) -> Optional[QPixmap]:
+        """
+        Return the pixmap for key marking it as recently used.
+
+        :param key: The cache key.
+        :return: The cached pixmap or None if not present.
+        """
+        pixmap = self._items.get(key)
+        if pixmap is not None:
+            self._items.move_to_end(key)
+        return pixmap
+
+    def put(self, key: Hashable, pixmap: QPixmap) -> None:
+        """
+        Add a pixmap to the cache evicting the least recently used entries if full.
+
+        :param key: The cache key.
+        :param pixmap: The decoded pixmap.
+        """
+        self.discard(key)
+        self._items[key] = pixmap
+        self.size_bytes += pixmap_bytes(pixmap)
+        # always keep the newest pixmap, even if it is bigger than the whole budget
+        while self.size_bytes > self.max_bytes and len(self._items) > 1:
+            _, dropped = self._items.popitem(last=False)
+            self.size_bytes -= pixmap_bytes(dropped)
+
+    def discard(self, key: Hashable) -> None:
+        """
+        Remove a single entry if present.
+
+        :param key: The cache key.
+        """
+        pixmap = self._items.pop(key, None)
+        if pixmap is not None:
+            self.size_bytes -= pixmap_bytes(pixmap)
+
+    def clear(self) -> None:
+        """
+        Remove all entries.
+        """
+        self._items.clear()
+        self.size_bytes = 0
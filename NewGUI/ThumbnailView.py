@@ -0,0 +1,194 @@
+from typing import Any, Dict, Iterable, List, Optional
+
+from qtpy.QtCore import QAbstractListModel, QModelIndex, QObject, QSize, Qt
+from qtpy.QtGui import QColor, QPixmap
+from qtpy.QtSql import QSqlQuery
+from qtpy.QtWidgets import QListView, QWidget
+
+from ImageLoader import ImageLoader
+from PixmapCache import DEFAULT_CACHE_BYTES
+from row_runs import contiguous_runs
+from sql_queries import QUERIES
+
+# data() is called for several roles of every visible item on each frame, comparing plain ints is much cheaper
+# than comparing Qt enums
+DISPLAY_ROLES = frozenset((int(Qt.DisplayRole), int(Qt.ToolTipRole)))
+DECORATION_ROLE = int(Qt.DecorationRole)
+ID_ROLE = int(Qt.UserRole)
+
+
+class ThumbnailModel(QAbstractListModel):
+    """
+    A list model of every asset in the database where only the id and name are loaded up front.
+    Thumbnails are fetched through an ImageLoader when the view asks for them, so memory use is
+    independent of the size of the library.
+    """
+
+    def __init__(
+        self,
+        image_column: str = "persp_image",
+        thumbnail_size: QSize = QSize(128, 128),
+        cache_bytes: int = DEFAULT_CACHE_BYTES,
+        parent: Optional[QObject] = None,
+    ) -> None:
+        """
+        Initialize the ThumbnailModel.
+
+        :param image_column: Which image column to use for the thumbnails.
+        :param thumbnail_size: The size images are scaled to once decoded.
+        :param cache_bytes: The most memory the decoded thumbnails may use.
+        :param parent: The parent object, if any.
+        """
+        super().__init__(parent)
+        self.image_column: str = image_column
+        self.thumbnail_size: QSize = thumbnail_size
+        self.loader: ImageLoader = ImageLoader(thumbnail_size, cache_bytes, self)
+        self.loader.image_ready.connect(self._image_ready)
+        self._ids: List[int] = []
+        self._names: List[str] = []
+        self._rows: Dict[int, int] = {}
+        self._placeholder: QPixmap = QPixmap(thumbnail_size)
+        self._placeholder.fill(QColor(Qt.darkGray))
+
+    def load(self) -> None:
+        """
+        Load the ids and names of all the assets in the open database, no image data is read here.
+        """
+        self.beginResetModel()
+        self.loader.reset()
+        self._ids = []
+        self._names = []
+        query = QSqlQuery()
+        query.setForwardOnly(True)
+        if not query.exec(QUERIES["thumbnail_rows"]):
+            self.endResetModel()
+            raise RuntimeError(f"Failed to execute query: {query.lastError().text()}")
+        while query.next():
+            self._ids.append(query.value(0))
+            self._names.append(query.value(1))
+        self._rows = {item_id: row for row, item_id in enumerate(self._ids)}
+        self.endResetModel()
+
+    def remove_ids(self, ids: Iterable[int]) -> None:
+        """
+        Remove the items for deleted ids without reloading the model.
+
+        :param ids: The ids that have been deleted from the database.
+        """
+        ids = list(ids)
+        rows = sorted((self._rows[item_id] for item_id in ids if item_id in self._rows), reverse=True)
+        for first, last in contiguous_runs(rows):
+            self.beginRemoveRows(QModelIndex(), first, last)
+            del self._ids[first : last + 1]
+            del self._names[first : last + 1]
+            self.endRemoveRows()
+        for item_id in ids:
+            self.loader.forget(item_id, [self.image_column])
+        self._rows = {item_id: row for row, item_id in enumerate(self._ids)}
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._ids)
+
+    def data(self, index: QModelIndex, role: int = Qt.DisplayRole) -> Any:
+        """
+        Return the name for the display role and the thumbnail for the decoration role.
+        If the thumbnail isn't decoded yet a placeholder is returned and the image is queued.
+
+        :param index: The index of the data to retrieve.
+        :param role: The role for which data is requested.
+        :return: The data at the specified index and role.
+        """
+        role = int(role)
+        if role in DISPLAY_ROLES:
+            return self._names[index.row()] if index.isValid() else None
+        if role == DECORATION_ROLE:
+            if not index.isValid():
+                return None
+            pixmap = self.loader.get(self._ids[index.row()], self.image_column)
+            return pixmap if pixmap is not None else self._placeholder
+        if role == ID_ROLE:
+            return self._ids[index.row()] if index.isValid() else None
+        return None
+
+    def prefetch(self, first: int, last: int) -> None:
+        """
+        Queue the thumbnails for a range of rows so they are ready before they scroll into view.
+
+        :param first: The first row to fetch.
+        :param last: The last row to fetch (inclusive).
+        """
+        first = max(0, first)
+        last = min(len(self._ids) - 1, last)
+        for row in range(first, last + 1):
+            self.loader.request(self._ids[row], self.image_column)
+
+    def _image_ready(self, item_id: int, column: str) -> None:
+        """
+        Tell the view to repaint an item once its thumbnail has been decoded.
+        """
+        row = self._rows.get(item_id)
+        if row is not None and column == self.image_column:
+            index = self.index(row)
+            self.dataChanged.emit(index, index, [Qt.DecorationRole])
+
+
+class ThumbnailView(QListView):
+    """
+    Icon mode grid for browsing large libraries.
+    All items have the same size so Qt can lay the grid out without measuring every item and only the
+    visible items (plus a margin of rows either side) have their thumbnails requested.
+    """
+
+    def __init__(self, parent: Optional[QWidget] = None, margin_rows: int = 2) -> None:
+        """
+        Initialize the ThumbnailView.
+
+        :param parent: The parent widget, if any.
+        :param margin_rows: The number of rows above and below the viewport to prefetch.
+        """
+        super().__init__(parent)
+        self.margin_rows: int = margin_rows
+        self.setViewMode(QListView.IconMode)
+        self.setUniformItemSizes(True)
+        self.setLayoutMode(QListView.Batched)
+        self.setBatchSize(512)
+        self.setMovement(QListView.Static)
+        self.setResizeMode(QListView.Adjust)
+        self.setWrapping(True)
+        self.setSelectionMode(QListView.ExtendedSelection)
+        # the grid rows are a fixed height so the scroll position in pixels gives the first visible row
+        self.setVerticalScrollMode(QListView.ScrollPerPixel)
+        self.verticalScrollBar().valueChanged.connect(self._prefetch_visible)
+
+    def setModel(self, model: ThumbnailModel) -> None:
+        """
+        Set the model and size the grid to the model's thumbnails.
+
+        :param model: The thumbnail model to display.
+        """
+        super().setModel(model)
+        size = model.thumbnail_size
+        self.setIconSize(size)
+        self.setGridSize(QSize(size.width() + 16, size.height() + 24))
+        self.doItemsLayout()
+        self._prefetch_visible()
+
+    def resizeEvent(self, event) -> None:
+        super().resizeEvent(event)
+        self._prefetch_visible()
+
+    def _prefetch_visible(self) -> None:
+        """
+        Work out the rows in the viewport and ask the model for them plus the margin.
+        """
+        model = self.model()
+        if model is None or model.rowCount() == 0:
+            return
+        grid = self.gridSize()
+        viewport = self.viewport().rect()
+        per_row = max(1, viewport.width() // max(1, grid.width()))
+        # indexAt misses in the gaps between items, so count grid rows from the scroll position instead
+        first = self.verticalScrollBar().value() // max(1, grid.height()) * per_row
+        visible_rows = viewport.height() // max(1, grid.height()) + 2
+        margin = self.margin_rows * per_row
+        model.prefetch(first - margin, first + visible_rows * per_row + margin)
@@ -0,0 +1,88 @@
+import importlib
+import os
+from pathlib import Path
+from typing import Callable, Optional
+
+from qtpy.QtWidgets import QLabel, QVBoxLayout, QWidget
+
+UI_DIR = Path(__file__).resolve().parent
+# set CLUTTER_LOADUI=1 to always parse the .ui files, e.g. to compare startup times
+FORCE_LOADUI = os.environ.get("CLUTTER_LOADUI") == "1"
+
+
+def compiled_module_name(ui_file: str) -> str:
+    """
+    The module pyside6-uic (and pyside6-project build) writes for a .ui file, ClutterUI.ui -> ui_ClutterUI.
+
+    :param ui_file: The .ui file name.
+    :return: The module name.
+    """
+    return f"ui_{Path(ui_file).stem}"
+
+
+def _compiled_ui(ui_file: str):
+    """
+    Find the Ui_ class compiled from a .ui file, None if it hasn't been built or is older than the .ui file.
+    """
+    source = UI_DIR / ui_file
+    compiled = UI_DIR / f"{compiled_module_name(ui_file)}.py"
+    if FORCE_LOADUI or not compiled.is_file():
+        return None
+    if source.is_file() and source.stat().st_mtime > compiled.stat().st_mtime:
+        # the .ui has been edited since the last build, use it directly during development
+        return None
+    module = importlib.import_module(compiled.stem)
+    classes = [value for name, value in vars(module).items() if name.startswith("Ui_")]
+    return classes[0] if len(classes) == 1 else None
+
+
+def load_ui(ui_file: str, widget: QWidget) -> QWidget:
+    """
+    Build a .ui file into widget. The module compiled at build time by buildUi.py is used if it is up to date,
+    otherwise the .ui is parsed with loadUi. Either way the child widgets become attributes of widget.
+
+    :param ui_file: The .ui file name, relative to the NewGUI folder.
+    :param widget: The widget to set up.
+    :return: The widget.
+    """
+    ui_class = _compiled_ui(ui_file)
+    if ui_class is None:
+        from qtpy.uic import loadUi
+
+        loadUi(str(UI_DIR / ui_file), widget)
+        return widget
+    ui = ui_class()
+    ui.setupUi(widget)
+    for name, value in vars(ui).items():
+        setattr(widget, name, value)
+    return widget
+
+
+class DeferredTab(QWidget):
+    """
+    A tab whose contents (and the modules they need) are only created the first time it is shown,
+    used for rarely opened tabs such as the Qt3D ModelViewer so they don't slow down startup.
+    """
+
+    def __init__(self, factory: Callable[[], QWidget], parent: Optional[QWidget] = None) -> None:
+        """
+        Initialize the DeferredTab.
+
+        :param factory: Called once to create the contents, does any imports it needs itself.
+        :param parent: The parent widget, if any.
+        """
+        super().__init__(parent)
+        self.factory = factory
+        self.content: Optional[QWidget] = None
+        self.setLayout(QVBoxLayout())
+        self.layout().setContentsMargins(0, 0, 0, 0)
+
+    def showEvent(self, event) -> None:
+        if self.content is None:
+            try:
+                self.content = self.factory()
+            except Exception as e:
+                # a missing module or one that fails to start (e.g. Qt3D without OpenGL) shouldn't take the app down
+                self.content = QLabel(f"Not available : {e}")
+            self.layout().addWidget(self.content)
+        super().showEvent(event)
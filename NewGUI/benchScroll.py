@@ -0,0 +1,98 @@
+#!/usr/bin/env -S uv run --script
+
+import argparse
+import json
+import statistics
+import sys
+import time
+from typing import Dict, List
+
+from qtpy.QtCore import QSize
+from qtpy.QtSql import QSqlDatabase
+from qtpy.QtWidgets import QApplication
+
+from ThumbnailView import ThumbnailModel, ThumbnailView
+
+"""
+Scrolling benchmark for the thumbnail grid. Opens a database in a ThumbnailView and scrolls it a fixed number of
+pixels per frame, each frame is painted straight away and then the event loop is run so decoded thumbnails
+arriving from the pool are handled too, which is all the GUI thread work a real frame does. The frame times
+are reported with the frames per second they allow, 60 fps needs every frame under 16.7 ms. The view wraps back
+to the top at the end, use a database with many more assets than fit on screen (e.g. one made with
+createDatabase.sh) and QT_QPA_PLATFORM=offscreen to run it without a display.
+"""
+
+FRAME_BUDGET_MS = 1000.0 / 60.0
+
+
+def scroll_frames(view: ThumbnailView, frames: int, step: int) -> List[float]:
+    """
+    Scroll the view and time each frame.
+
+    :param view: A shown ThumbnailView with its model loaded.
+    :param frames: The number of frames to time.
+    :param step: Pixels scrolled per frame.
+    :return: The milliseconds taken by each frame.
+    """
+    app = QApplication.instance()
+    scroll_bar = view.verticalScrollBar()
+    times: List[float] = []
+    for _ in range(frames):
+        start = time.perf_counter()
+        value = scroll_bar.value() + step
+        scroll_bar.setValue(value if value <= scroll_bar.maximum() else 0)
+        view.viewport().repaint()
+        app.processEvents()
+        times.append((time.perf_counter() - start) * 1000.0)
+    return times
+
+
+def summarize(times: List[float]) -> Dict[str, float]:
+    """
+    Summarize frame times.
+
+    :param times: Milliseconds per frame.
+    :return: median, p99 and worst frame in milliseconds, the fps of the p99 frame and the share of frames
+    over the 60 fps budget.
+    """
+    ordered = sorted(times)
+    p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+    return {
+        "median_ms": statistics.median(ordered),
+        "p99_ms": p99,
+        "worst_ms": ordered[-1],
+        "p99_fps": 1000.0 / p99 if p99 > 0 else float("inf"),
+        "over_budget": sum(frame > FRAME_BUDGET_MS for frame in ordered) / len(ordered),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="time scrolling the thumbnail grid")
+    parser.add_argument("--database", "-db", help="Which DB to scroll", required=True)
+    parser.add_argument("--frames", "-f", help="Number of frames to time", type=int, default=600)
+    parser.add_argument("--step", "-s", help="Pixels scrolled per frame", type=int, default=40)
+    parser.add_argument("--size", help="Thumbnail size in pixels", type=int, default=128)
+    parser.add_argument("--output", "-o", help="Append the results to this json lines file")
+    args = parser.parse_args()
+
+    app = QApplication(sys.argv)
+    db = QSqlDatabase.addDatabase("QSQLITE")
+    db.setDatabaseName(args.database)
+    if not db.open():
+        sys.exit(f"Failed to open {args.database}: {db.lastError().text()}")
+    model = ThumbnailModel(thumbnail_size=QSize(args.size, args.size))
+    model.load()
+    view = ThumbnailView()
+    view.resize(1280, 800)
+    view.setModel(model)
+    view.show()
+    app.processEvents()
+
+    results = summarize(scroll_frames(view, args.frames, args.step))
+    print(f"{model.rowCount():,} assets, {args.frames} frames of {args.step} px")
+    for name, value in results.items():
+        print(f"{name:>12} {value:8.2f}")
+    if args.output:
+        record = {"time": time.time(), "assets": model.rowCount(), "frames": args.frames, "step": args.step, **results}
+        with open(args.output, "a") as stream:
+            stream.write(json.dumps(record) + "\n")
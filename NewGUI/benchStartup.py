@@ -0,0 +1,86 @@
+#!/usr/bin/env -S uv run --script
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+"""
+Startup benchmark for the GUI. Runs main.py --startup-benchmark several times, each run prints the time from
+process start to a few marks (imports done, UI built, database loaded, first paint) and quits once the
+dialog has painted. The median of each mark is reported, and can be appended to a json lines file to
+track startup time over time. Use --loadui to time the uncompiled .ui path for comparison.
+"""
+
+GUI_DIR = Path(__file__).resolve().parent
+# a launch that hasn't painted by now is stuck, e.g. on the error box shown when test.db can't be opened
+RUN_TIMEOUT = 60.0
+
+
+def run_once(loadui: bool) -> Dict[str, float]:
+    """
+    Launch the GUI once and collect its startup marks.
+
+    :param loadui: Force loadUi rather than the compiled ui modules.
+    :return: mark name : milliseconds since process start, plus wall for the whole process.
+    """
+    env = dict(os.environ)
+    if loadui:
+        env["CLUTTER_LOADUI"] = "1"
+    start = time.perf_counter()
+    try:
+        result = subprocess.run(
+            [sys.executable, "main.py", "--startup-benchmark"],
+            cwd=GUI_DIR,
+            env=env,
+            capture_output=True,
+            text=True,
+            timeout=RUN_TIMEOUT,
+        )
+    except subprocess.TimeoutExpired:
+        raise RuntimeError(f"main.py did not paint within {RUN_TIMEOUT:.0f}s, is test.db there and valid?") from None
+    wall = (time.perf_counter() - start) * 1000.0
+    marks: Dict[str, float] = {}
+    for line in result.stdout.splitlines():
+        parts = line.split()
+        if len(parts) == 4 and parts[0] == "startup":
+            marks[parts[1]] = float(parts[2])
+    if "first_paint" not in marks:
+        raise RuntimeError(f"main.py did not report a first paint\n{result.stderr}")
+    marks["wall"] = wall
+    return marks
+
+
+def benchmark(runs: int, loadui: bool) -> Dict[str, float]:
+    """
+    Run the GUI several times and take the median of every mark.
+
+    :param runs: Number of launches, the first is discarded as a warm up.
+    :param loadui: Force loadUi rather than the compiled ui modules.
+    :return: mark name : median milliseconds.
+    """
+    results: List[Dict[str, float]] = [run_once(loadui) for _ in range(runs + 1)][1:]
+    return {name: statistics.median(result[name] for result in results) for name in results[0]}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="time GUI startup to first paint")
+    parser.add_argument("--runs", "-r", help="Number of launches", type=int, default=5)
+    parser.add_argument(
+        "--loadui", "-l", help="Parse the .ui files rather than use the compiled ones", action="store_true"
+    )
+    parser.add_argument("--output", "-o", help="Append the results to this json lines file")
+    args = parser.parse_args()
+
+    medians = benchmark(args.runs, args.loadui)
+    for name, value in medians.items():
+        print(f"{name:>16} {value:8.1f} ms")
+    if args.output:
+        record = {"time": time.time(), "loadui": args.loadui, "runs": args.runs, **medians}
+        with open(args.output, "a") as stream:
+            stream.write(json.dumps(record) + "\n")
@@ -0,0 +1,55 @@
+#!/usr/bin/env -S uv run --script
+
+import argparse
+import subprocess
+import sys
+from pathlib import Path
+
+from UiLoader import UI_DIR, compiled_module_name
+
+"""
+Compile every .ui file in NewGUI to a python module with pyside6-uic so the GUI doesn't have to parse the
+XML on every launch. UiLoader.load_ui uses the compiled modules when they are newer than the .ui files and
+falls back to loadUi otherwise, so this only needs running before a release (pyside6-project build writes
+the same ui_*.py files). The generated files are not committed.
+"""
+
+
+def build(force: bool = False) -> int:
+    """
+    Compile the out of date .ui files.
+
+    :param force: Rebuild everything.
+    :return: The number of files compiled.
+    """
+    built = 0
+    for ui_file in sorted(UI_DIR.glob("*.ui")):
+        output = UI_DIR / f"{compiled_module_name(ui_file.name)}.py"
+        if not force and output.is_file() and output.stat().st_mtime >= ui_file.stat().st_mtime:
+            continue
+        print(f"{ui_file.name} -> {output.name}")
+        subprocess.run(["pyside6-uic", str(ui_file), "-o", str(output)], check=True)
+        built += 1
+    return built
+
+
+def clean() -> None:
+    """
+    Remove the compiled modules so loadUi is used.
+    """
+    for ui_file in UI_DIR.glob("*.ui"):
+        Path(UI_DIR / f"{compiled_module_name(ui_file.name)}.py").unlink(missing_ok=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="compile the NewGUI .ui files to python")
+    parser.add_argument("--force", "-f", help="Rebuild every file", action="store_true")
+    parser.add_argument("--clean", "-c", help="Remove the compiled files", action="store_true")
+    args = parser.parse_args()
+    if args.clean:
+        clean()
+    else:
+        try:
+            print(f"compiled {build(args.force)} files")
+        except (OSError, subprocess.CalledProcessError) as e:
+            sys.exit(f"pyside6-uic failed: {e}")
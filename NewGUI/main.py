@@ -1,18 +1,40 @@
 #!/usr/bin/env -S uv run --script
 
+import time
+
+# taken before any Qt import so the startup benchmark includes them
+STARTED = time.perf_counter()
+
 import sys
-from typing import List, Optional, Tuple
+from typing import List, Optional, Set, Tuple
 
-# from ModelViewer import ModelViewer
 from PySide6.QtGui import QCloseEvent
+from qtpy.QtCore import QEvent, QObject, Qt
 from qtpy.QtGui import QPixmap
 from qtpy.QtSql import QSqlDatabase, QSqlQuery
-from qtpy.QtWidgets import QApplication, QDialog, QFileDialog, QLabel, QMessageBox, QTableView, QWidget
-from qtpy.uic import loadUi
-
-from AddDialog import AddDialog
+from qtpy.QtWidgets import (
+    QApplication,
+    QCheckBox,
+    QDialog,
+    QFileDialog,
+    QHeaderView,
+    QLabel,
+    QLineEdit,
+    QMessageBox,
+    QSplitter,
+    QTableView,
+    QWidget,
+)
+
+from AssetFilterModel import AssetFilterModel
+from AssetTableModel import AssetTableModel
+from federatedDB import alias_for
+from FacetPanel import FacetPanel
 from ImageDataModel import ImageDataModel
-from sql_queries import QUERIES
+from IncrementalVacuum import IncrementalVacuum
+from sql_queries import QUERIES, federated_view, new_db_facets
+from ThumbnailView import ThumbnailModel, ThumbnailView
+from UiLoader import DeferredTab, load_ui
 
 
 class ClutterDialog(QDialog):
@@ -27,10 +49,16 @@ class ClutterDialog(QDialog):
         :param parent: The parent widget, if any.
         """
         super(ClutterDialog, self).__init__()
-        loadUi("ClutterUI.ui", self)
+        load_ui("ClutterUI.ui", self)
         self.db: QSqlDatabase = QSqlDatabase.addDatabase("QSQLITE")
         self.database_view: QTableView = QTableView(self.db_view)
-        self.db_layout.addWidget(self.database_view)
+        # facet counts beside the table, clicking one filters it
+        self.facet_panel: FacetPanel = FacetPanel()
+        self.db_splitter: QSplitter = QSplitter(Qt.Horizontal)
+        self.db_splitter.addWidget(self.facet_panel)
+        self.db_splitter.addWidget(self.database_view)
+        self.db_splitter.setStretchFactor(1, 1)
+        self.db_layout.addWidget(self.db_splitter)
         self.view_widget: QWidget = QWidget()
 
         self.view_tab_layout.addWidget(self.view_widget)
@@ -44,18 +72,45 @@ class ClutterDialog(QDialog):
         self.query_text.returnPressed.connect(lambda: self.run_query(self.query_text.text()))
         self.db_view.currentChanged.connect(self.tab_view_changed)
         self.new_db.clicked.connect(self.new_db_clicked)
+        self.attach_db.clicked.connect(self.attach_db_clicked)
         self.delete_from_db.clicked.connect(self.delete_selected_row)
         self.insert_to_db.clicked.connect(self.add_item)
         self.query = ImageDataModel()
+        # single model for the Meshes table, the display checkboxes project columns on top of it
+        self.asset_model: AssetTableModel = AssetTableModel()
+        # sorting and filtering run on the model's in memory metadata index, not SQL
+        self.asset_filter: AssetFilterModel = AssetFilterModel(self)
+        self.asset_filter.setSourceModel(self.asset_model)
+        self.filter_text: QLineEdit = QLineEdit()
+        self.filter_text.setPlaceholderText("filter : name text and ranges such as face_count>1000 mesh_size<5e6")
+        self.filter_text.textChanged.connect(self.asset_filter.set_filter)
+        self.db_layout.insertWidget(0, self.filter_text)
+        self.facet_panel.filters_changed.connect(self.asset_filter.set_facets)
+        self.facet_panel.watch(self.asset_model)
+        # pick up assets written by other processes, e.g. the ingest daemon
+        self.asset_model.watch()
+        self.vacuum: IncrementalVacuum = IncrementalVacuum(parent=self)
+        # databases the user chose not to convert to incremental vacuum, so they are only asked once
+        self.vacuum_declined: Set[str] = set()
 
         # setup 2nd view widget
-        loadUi("ViewWidget.ui", self.view_widget)
+        load_ui("ViewWidget.ui", self.view_widget)
         self.view_widget.previous_record.clicked.connect(self.update_record)
         self.view_widget.next_record.clicked.connect(self.update_record)
 
-        # self.model_viewer = ModelViewer()
-        # self.db_view.addTab(self.model_viewer, "3D View")
+        # thumbnail grid, only the visible thumbnails are loaded so this scales to large libraries
+        self.thumbnail_model: ThumbnailModel = ThumbnailModel()
+        self.thumbnail_view: ThumbnailView = ThumbnailView()
+        self.thumbnail_view.setModel(self.thumbnail_model)
+        self.db_view.addTab(self.thumbnail_view, "Thumbnails")
+
+        # Qt3D is only imported the first time the 3D View tab is opened, it shows the asset selected in the tab
+        # that was open before it
+        self.model_viewer: DeferredTab = DeferredTab(create_model_viewer)
+        self.db_view.addTab(self.model_viewer, "3D View")
+        self.asset_tab: QWidget = self.db_view.currentWidget()
         self.current_view_index: int = 0
+        self.attached: List[str] = []
 
     def closeEvent(self, event: QCloseEvent) -> None:
         """
@@ -63,23 +118,69 @@ class ClutterDialog(QDialog):
 
         :param event: The close event.
         """
+        self.vacuum.stop()
+        # report the image decode cost, useful when comparing transcoded image formats
+        decode_stats = [("table", self.asset_model.loader.decode_stats), ("thumbnails", self.thumbnail_model.loader.decode_stats)]
+        if isinstance(self.query, ImageDataModel):
+            decode_stats.append(("query", self.query.decode_stats))
+        for name, stats in decode_stats:
+            if stats:
+                print(f"image decode report ({name})\n{stats.report()}")
         self.db.close()
 
     def new_db_clicked(self):
         file_name = QFileDialog.getSaveFileName(self, "Choose new db name", "./", "Clutter Base Files (*.db)")
         if file_name[0] != "":
-            self.db.setDatabaseName(file_name[0])
-            self.db.open()
-            if not self.db.open():
-                raise RuntimeError(f"Failed to create or open database: {self.db.lastError().text()}")
-            # need to run base query here to create a new table.
+            if not self.open_and_validate(file_name[0], validate=False):
+                return
             query = QSqlQuery()
-            if not query.exec(QUERIES["drop_table"]):
+            # an existing file is emptied, every table and view goes so nothing of the old library is left
+            if not query.exec(QUERIES["select_schema_objects"]):
                 raise RuntimeError(f"Failed to execute query: {query.lastError().text()}")
+            objects = []
+            while query.next():
+                objects.append(QUERIES["drop_object"].format(kind=query.value(0).upper(), name=query.value(1)))
+            # incremental auto vacuum lets deletes give space back without a blocking full VACUUM, on an existing
+            # file it takes effect with the VACUUM once the tables are gone
+            statements = [QUERIES["auto_vacuum_incremental"], *objects, QUERIES["vacuum"], QUERIES["new_db"]]
+            for sql in [*statements, *new_db_facets]:
+                if not query.exec(sql):
+                    raise RuntimeError(f"Failed to execute query: {query.lastError().text()}")
+            self.show_assets()
+            self.thumbnail_model.load()
+
+    def attach_db_clicked(self) -> None:
+        """
+        Attach another library to the open database and rebuild the AllMeshes view so every library
+        can be searched at once, for example SELECT * FROM AllMeshes WHERE name LIKE '%chair%'.
+        """
+        if not self.db.isOpen():
+            QMessageBox.critical(self, "Critical Error", "Database not open", QMessageBox.StandardButton.Abort)
+            return
+        file_name = QFileDialog.getOpenFileName(self, "Attach DB", "./", "Clutter Base Files (*.db)")[0]
+        if file_name != "":
+            self.attach_library(file_name)
+            self.query_text.setText(QUERIES["select_federated"])
+            self.run_query(QUERIES["select_federated"])
+
+    def attach_library(self, file_name: str) -> str:
+        """
+        Attach a library database and add it to the AllMeshes view.
 
-            if not query.exec(QUERIES["new_db"]):
+        :param file_name: The path to the database file.
+        :return: The schema name the library was attached as.
+        """
+        alias = alias_for(file_name, self.attached)
+        query = QSqlQuery()
+        query.prepare(QUERIES["attach_db"].format(alias=alias))
+        query.addBindValue(file_name)
+        if not query.exec():
+            raise RuntimeError(f"Failed to attach {file_name}: {query.lastError().text()}")
+        self.attached.append(alias)
+        for sql in [QUERIES["drop_federated_view"], federated_view(self.attached)]:
+            if not query.exec(sql):
                 raise RuntimeError(f"Failed to execute query: {query.lastError().text()}")
-            self.query = ImageDataModel()
+        return alias
 
     def tab_view_changed(self, index: int) -> None:
         """
@@ -89,6 +190,49 @@ class ClutterDialog(QDialog):
         """
         if index == 1 and self.db.isOpen():
             self.set_record()
+        if self.db_view.widget(index) is self.model_viewer:
+            self.show_selected_model()
+        else:
+            self.asset_tab = self.db_view.widget(index)
+
+    def show_selected_model(self) -> None:
+        """
+        Show the first selected asset in the 3D View, nothing if no asset is selected.
+        """
+        viewer = self.model_viewer.content
+        if not hasattr(viewer, "show_mesh"):
+            # Qt3D isn't available, the tab is showing why
+            return
+        selected = self.selected_assets() if self.db.isOpen() else []
+        if not selected:
+            viewer.clear()
+            return
+        source, item_id = selected[0]
+        query = QSqlQuery(self.db)
+        query.prepare(QUERIES["select_mesh"].format(source=source))
+        query.addBindValue(item_id)
+        if not query.exec() or not query.next():
+            viewer.clear()
+            return
+        name, data, mesh_type = query.value(0), bytes(query.value(1)), query.value(2) or "obj"
+        if not data:
+            data = self.evicted_mesh(source, item_id)
+        viewer.show_mesh(name, data, mesh_type)
+
+    def evicted_mesh(self, source: str, item_id: int) -> bytes:
+        """
+        Decode a mesh evicted by meshCodec.py encode --evict, b"" if there is no encoding.
+        """
+        query = QSqlQuery(self.db)
+        # fails if the library has never been encoded
+        if not query.prepare(QUERIES["select_encoded_mesh"].format(source=source)):
+            return b""
+        query.addBindValue(item_id)
+        if not query.exec() or not query.next():
+            return b""
+        from meshCodec import decode_obj
+
+        return decode_obj(bytes(query.value(0)))
 
     def update_record(self):
         if self.sender().objectName() == "previous_record":
@@ -122,24 +266,51 @@ class ClutterDialog(QDialog):
     def update_db_view(self) -> None:
         """
         Update the database view based on the selected checkboxes.
+        Columns are hidden or shown on the loaded model rather than re-running the query, images for newly
+        shown columns are loaded as the visible rows are painted.
         """
         if not self.db.isOpen():
             QMessageBox.critical(self, "Critical Error", "Database not open", QMessageBox.StandardButton.Abort)
-        else:
-            columns: List[str] = ["name", "mesh_type"]
-            checkbox_column_map: List[Tuple[QCheckBox, str]] = [
-                (self.display_front, "front_image"),
-                (self.display_side, "side_image"),
-                (self.display_persp, "persp_image"),
-                (self.display_top, "top_image"),
-            ]
+            return
+        if self.database_view.model() is not self.asset_filter:
+            self.show_assets(reload=False)
+        self.apply_column_visibility()
 
-            for checkbox, column in checkbox_column_map:
-                if checkbox.isChecked():
-                    columns.append(column)
+    def apply_column_visibility(self) -> None:
+        """
+        Hide the image columns whose display checkbox is unchecked.
+        """
+        checkbox_column_map: List[Tuple[QCheckBox, str]] = [
+            (self.display_front, "front_image"),
+            (self.display_side, "side_image"),
+            (self.display_persp, "persp_image"),
+            (self.display_top, "top_image"),
+        ]
+        any_images = False
+        for checkbox, column in checkbox_column_map:
+            self.database_view.setColumnHidden(self.asset_model.column_index(column), not checkbox.isChecked())
+            any_images = any_images or checkbox.isChecked()
+        # rows all have the same height so the view never needs to measure every row
+        header = self.database_view.verticalHeader()
+        header.setSectionResizeMode(QHeaderView.Fixed)
+        header.setDefaultSectionSize(self.asset_model.image_size.height() if any_images else header.minimumSectionSize())
+
+    def show_assets(self, reload: bool = True) -> None:
+        """
+        Show the Meshes table in the database view using the projection model, sorted and filtered by the
+        filter model.
 
-            query_str = f"SELECT {', '.join(columns)} FROM Meshes;"
-            self.run_query(query_str)
+        :param reload: Re-read the metadata from the database before showing it.
+        """
+        if reload or self.asset_model.rowCount() == 0:
+            self.asset_model.load()
+        self.query = self.asset_filter
+        self.database_view.setModel(self.asset_filter)
+        if not self.database_view.isSortingEnabled():
+            self.database_view.horizontalHeader().setSortIndicator(0, Qt.AscendingOrder)
+            self.database_view.setSortingEnabled(True)
+        self.apply_column_visibility()
+        self.database_view.resizeColumnsToContents()
 
     def load_db_pressed(self) -> None:
         """
@@ -150,14 +321,29 @@ class ClutterDialog(QDialog):
             self.load_database(file_name[0])
         self.query_text.setFocus()
 
-    def open_and_validate(self, file_name: str, validate: bool = True) -> None:
+    def open_and_validate(self, file_name: str, validate: bool = True) -> bool:
+        """
+        Open a database file in place of the current one.
+
+        :param file_name: The path to the database file.
+        :param validate: Check it is a clutter database, with a Meshes table.
+        :return: False (after telling the user) if it couldn't be opened or isn't a clutter database.
+        """
+        self.vacuum.stop()
+        # attached libraries belong to the connection so are dropped when it closes
+        self.attached = []
         if self.db.isOpen():
             self.db.close()
         self.db.setDatabaseName(file_name)
-        self.db.open()
+        if not self.db.open():
+            QMessageBox.critical(self, "Critical Error", f"Failed to open {file_name}: {self.db.lastError().text()}")
+            return False
 
         if validate and "Meshes" not in self.db.tables():
             QMessageBox.critical(self, "Critical Error", " Not a valid DB file", QMessageBox.StandardButton.Abort)
+            self.db.close()
+            return False
+        return True
 
     def load_database(self, file_name: str) -> None:
         """
@@ -165,8 +351,10 @@ class ClutterDialog(QDialog):
 
         :param file_name: The path to the database file.
         """
-        self.open_and_validate(file_name)
-        self.run_query(QUERIES["select_all"])
+        if not self.open_and_validate(file_name):
+            return
+        self.show_assets()
+        self.thumbnail_model.load()
         self.current_view_index = 0
 
     def run_query(self, query_str: str) -> None:
@@ -179,46 +367,156 @@ class ClutterDialog(QDialog):
             try:
                 self.query = ImageDataModel()
                 self.query.setQuery(query_str)
+                self.database_view.setSortingEnabled(False)
                 self.database_view.setModel(self.query)
+                for column in range(self.query.columnCount()):
+                    self.database_view.setColumnHidden(column, False)
+                self.database_view.verticalHeader().setSectionResizeMode(QHeaderView.Interactive)
                 self.database_view.resizeRowsToContents()
                 self.database_view.resizeColumnsToContents()
             except RuntimeError as e:
                 print(f"error running query {query_str}: {e}")
 
     def add_item(self):
+        # imported here as the batch loader and mesh normalizer are only needed when adding assets
+        from AddDialog import AddDialog
+
         dialog = AddDialog(self.db, self)
         if dialog.exec():
-            print(QUERIES["select_all"])
-            self.run_query(QUERIES["select_all"])
+            self.show_assets()
+            self.thumbnail_model.load()
+
+    def selected_assets(self) -> List[Tuple[str, int]]:
+        """
+        Get the ids of the selected items in the current tab (the one before it when the 3D View is open).
+        Rows of the AllMeshes view (or any query with a source column) can come from an attached library, so
+        each id is paired with the schema it belongs to, main for the open database.
+
+        :return: (schema, id) of all selected rows, empty if nothing is selected.
+        """
+        if self.asset_tab is self.thumbnail_view:
+            indexes = self.thumbnail_view.selectionModel().selectedIndexes()
+            return [("main", item_id) for item_id in sorted({index.data(Qt.UserRole) for index in indexes})]
+        rows = {index.row() for index in self.database_view.selectionModel().selectedIndexes()}
+        with_source = isinstance(self.query, ImageDataModel) and self.query.record().indexOf("source") >= 0
+        selected = []
+        for row in sorted(rows):
+            item_id = self.query.get_data_at_index(row, "id")
+            if item_id is not None and item_id != "":
+                source = self.query.get_data_at_index(row, "source") if with_source else "main"
+                selected.append((source, item_id))
+        return selected
 
     def delete_selected_row(self) -> None:
         """
-        Delete the selected row from the database and refresh the table view.
-        Assumes the model is a QSqlTableModel and the primary key column is 'id'.
+        Delete all the selected rows from the database in a single transaction, rows of the AllMeshes view are
+        deleted from the library they came from.
+        Only the deleted rows are removed from the models rather than re-running the query, the free pages
+        are then handed back to the file system in the background.
         """
-        selected_indexes = self.database_view.selectionModel().selectedRows()
-        if not selected_indexes:
-            print("No row selected.")
+        selected = self.selected_assets()
+        if not selected:
+            print("No row selected (the query must include the id column).")
+            return
+        unknown = {source for source, _ in selected if source not in ("main", *self.attached)}
+        if unknown:
+            print(f"Delete failed: {', '.join(map(str, unknown))} is not the open or an attached database.")
             return
 
-        row = selected_indexes[0].row()
-        model = self.query
-        id_column = 0  # Replace with the actual column number for 'id'
-        id_index = model.index(row, id_column)
-        item_id = model.data(id_index)
-
+        if not self.db.transaction():
+            print("Delete failed:", self.db.lastError().text())
+            return
         query = QSqlQuery()
-        query.prepare(QUERIES["delete_row"])
-        query.addBindValue(item_id)
-        if not query.exec():
-            print("Delete failed:", query.lastError().text())
-        else:
-            self.run_query(QUERIES["select_all"])
+        for source, item_id in selected:
+            query.prepare(QUERIES["delete_row"].format(source=source))
+            query.addBindValue(item_id)
+            if not query.exec():
+                print("Delete failed:", query.lastError().text())
+                self.db.rollback()
+                return
+        if not self.db.commit():
+            print("Delete failed:", self.db.lastError().text())
+            self.db.rollback()
+            return
+
+        # the asset table and thumbnails only show the open database
+        ids = [item_id for source, item_id in selected if source == "main"]
+        self.asset_model.remove_ids(ids)
+        self.thumbnail_model.remove_ids(ids)
+        if self.query is not self.asset_filter:
+            # a custom query model can't remove rows, so re-run it
+            self.run_query(self.query.query().lastQuery())
+        self.current_view_index = max(0, min(self.current_view_index, self.query.rowCount() - 1))
+        if ids:
+            self.reclaim_space()
+
+    def reclaim_space(self) -> None:
+        """
+        Give the pages freed by a delete back to the file system in the background.
+        Databases made before auto_vacuum=INCREMENTAL was the default can't do that, so offer to convert them
+        with a one-time full VACUUM.
+        """
+        if not self.vacuum.is_supported():
+            file_name = self.db.databaseName()
+            if file_name in self.vacuum_declined:
+                return
+            answer = QMessageBox.question(
+                self,
+                "Reclaim space",
+                "This database can't give the space used by deleted assets back in the background.\n"
+                "Convert it now? This rewrites the whole file once, which can take a while for a large library.",
+            )
+            if answer != QMessageBox.StandardButton.Yes:
+                self.vacuum_declined.add(file_name)
+                return
+            try:
+                self.vacuum.convert()
+            except RuntimeError as e:
+                QMessageBox.critical(self, "Critical Error", f"Failed to convert the database: {e}")
+                return
+        self.vacuum.start()
+
+
+def create_model_viewer() -> QWidget:
+    from ModelViewer import ModelViewer
+
+    return ModelViewer()
+
+
+class FirstPaintTimer(QObject):
+    """
+    Startup benchmark, reports the time from process start to the first paint of a widget and quits.
+    Use with benchStartup.py to track startup time.
+    """
+
+    def __init__(self, widget: QWidget, marks: List[Tuple[str, float]]) -> None:
+        """
+        :param widget: The widget to watch.
+        :param marks: (name, perf_counter) pairs taken during startup, reported relative to STARTED.
+        """
+        super().__init__(widget)
+        self.marks = marks
+        widget.installEventFilter(self)
+
+    def eventFilter(self, watched: QObject, event: QEvent) -> bool:
+        if event.type() == QEvent.Paint:
+            watched.removeEventFilter(self)
+            for name, mark in [*self.marks, ("first_paint", time.perf_counter())]:
+                print(f"startup {name} {(mark - STARTED) * 1000.0:.1f} ms")
+            QApplication.instance().quit()
+        return False
+
 
 if __name__ == "__main__":
+    benchmark = "--startup-benchmark" in sys.argv
+    marks: List[Tuple[str, float]] = [("imports", time.perf_counter())]
     app = QApplication(sys.argv)
     dialog = ClutterDialog()
+    marks.append(("ui_built", time.perf_counter()))
     # dialog.load_database("../ClutterTest.db")
     dialog.load_database("test.db")
+    marks.append(("database_loaded", time.perf_counter()))
+    if benchmark:
+        FirstPaintTimer(dialog, marks)
     dialog.show()
     sys.exit(app.exec_())
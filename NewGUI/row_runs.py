@@ -0,0 +1,20 @@
+from typing import Iterator, List, Tuple
+
+
+def contiguous_runs(rows: List[int]) -> Iterator[Tuple[int, int]]:
+    """
+    Group row numbers sorted in descending order into (first, last) runs of adjacent rows.
+
+    :param rows: Row numbers sorted highest first.
+    :return: The runs, highest first, so removing one doesn't move the rows of the next.
+    """
+    if not rows:
+        return
+    last = first = rows[0]
+    for row in rows[1:]:
+        if row == first - 1:
+            first = row
+        else:
+            yield first, last
+            last = first = row
+    yield first, last
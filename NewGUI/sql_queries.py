@@ -2,28 +2,89 @@
 Easy lookup for SQL tables.
 """
 
-query_cols = "id,name,mesh_type,front_image,side_image,top_image,persp_image"
-drop_table = "DROP TABLE IF EXISTS Meshes;"
-new_db_sql = """Create table Meshes (
-id integer PRIMARY KEY AUTOINCREMENT,
-name text NOT NULL,
-mesh_data BLOB NOT NULL,
-mesh_type TEXT CHECK(mesh_type IN('obj','usd','usdc','usdz','usda','fbx')),
-top_image BLOB,
-side_image BLOB,
-front_image BLOB,
-persp_image BLOB
-);"""
-
-delete_row = """DELETE FROM Meshes WHERE id=?"""
+from facetCounts import facet_schema
+from federatedDB import union_view_sql
+from normalizeMesh import create_normalization_table, create_normalization_trigger, insert_normalization
+from scripts.clutter_schema import VIEW_COLUMNS, auto_vacuum_incremental, create_meshes_table
+
+# the image columns in the order the views are shown
+image_columns = tuple(VIEW_COLUMNS.values())
+query_cols = ",".join(("id", "name", "mesh_type", *image_columns))
+# a new database is made by dropping everything in the file, so no side table (MeshStats, EncodedMeshes...)
+# keeps rows for the old meshes, views first as they may name the tables
+select_schema_objects = """SELECT type, name FROM sqlite_master
+WHERE type IN ('table', 'view') AND name NOT LIKE 'sqlite_%' ORDER BY type DESC;"""
+drop_object = 'DROP {kind} IF EXISTS "{name}";'
+new_db_sql = create_meshes_table
+# the facet tables and triggers (see facetCounts.py) run after new_db so the facet panel works straight away
+new_db_facets = facet_schema()
+
+select_mesh = """SELECT name, mesh_data, mesh_type FROM "{source}".Meshes WHERE id=?"""
+# meshes evicted by meshCodec.py encode --evict have an empty mesh_data, the encoding is the only copy
+select_encoded_mesh = """SELECT data FROM "{source}".EncodedMeshes WHERE mesh_id=?"""
+delete_row = """DELETE FROM "{source}".Meshes WHERE id=?"""
 insert_new_item = """INSERT INTO Meshes (name, mesh_data, mesh_type, top_image, side_image, front_image, persp_image) VALUES (?, ?, ?, ?, ?, ?, ?)"""
 
+thumbnail_rows = """SELECT id, name FROM Meshes ORDER BY id;"""
+# length() of a blob comes from the record header so no blob data is read, stats are -1 when unknown
+select_metadata = """SELECT Meshes.id, name, ifnull(mesh_type, ''), length(mesh_data),
+ifnull(length(top_image), 0) + ifnull(length(side_image), 0) + ifnull(length(front_image), 0)
++ ifnull(length(persp_image), 0),
+{stats}, {info} FROM Meshes {join} ORDER BY Meshes.id;"""
+select_blob = """SELECT {column} FROM Meshes WHERE id=?"""
+
+
+def select_images(column: str, count: int) -> str:
+    """Build a query fetching one image column for count ids, column must be one of image_columns."""
+    if column not in image_columns:
+        raise ValueError(f"{column} is not an image column")
+    return f"SELECT id, {column} FROM Meshes WHERE id IN ({', '.join('?' * count)});"
+
+
+def select_metadata_query(with_stats: bool, with_info: bool = False) -> str:
+    """Build the query for the metadata index, joining the MeshStats table (see clutterLibrary.py) and the
+    MeshInfo table (see facetCounts.py) if there are ones."""
+    stats, info, joins = "-1, -1", "'', ''", []
+    if with_stats:
+        stats = "ifnull(vertex_count, -1), ifnull(face_count, -1)"
+        joins.append("LEFT JOIN MeshStats ON MeshStats.mesh_id = Meshes.id")
+    if with_info:
+        info = "ifnull(category, ''), ifnull(author, '')"
+        joins.append("LEFT JOIN MeshInfo ON MeshInfo.mesh_id = Meshes.id")
+    return select_metadata.format(stats=stats, info=info, join=" ".join(joins))
+
+
+def federated_view(aliases: list[str]) -> str:
+    """Build the AllMeshes TEMP view over the Meshes table of the main and every attached database, with a source
+    column, the same view federatedDB.py builds."""
+    return union_view_sql(["main", *aliases], query_cols.split(","))
+
+
 """This dictionary is used to map table names to their respective SQL queries."""
 
 QUERIES = {
     "select_all": f"select {query_cols} from Meshes;",
-    "drop_table": drop_table,
+    "select_schema_objects": select_schema_objects,
+    "drop_object": drop_object,
     "new_db": new_db_sql,
     "insert": insert_new_item,
     "delete_row": delete_row,
+    "select_mesh": select_mesh,
+    "select_encoded_mesh": select_encoded_mesh,
+    "create_normalization_table": create_normalization_table,
+    "create_normalization_trigger": create_normalization_trigger,
+    "insert_normalization": insert_normalization,
+    "auto_vacuum_incremental": auto_vacuum_incremental,
+    "auto_vacuum": "PRAGMA auto_vacuum;",
+    "freelist_count": "PRAGMA freelist_count;",
+    "incremental_vacuum": "PRAGMA incremental_vacuum({pages});",
+    "vacuum": "VACUUM;",
+    "attach_db": 'ATTACH DATABASE ? AS "{alias}";',
+    "drop_federated_view": "DROP VIEW IF EXISTS temp.AllMeshes;",
+    "select_federated": "SELECT * FROM AllMeshes;",
+    "thumbnail_rows": thumbnail_rows,
+    "select_metadata": select_metadata,
+    "select_blob": select_blob,
+    "data_version": "PRAGMA data_version;",
+    "select_facets": "SELECT facet, value, count FROM FacetCounts;",
 }
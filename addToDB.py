@@ -6,7 +6,10 @@ from sqlite3 import Error
 import logging
 from pathlib import Path
 from dataclasses import dataclass
+from typing import Optional
 
+from meshVersions import add_version, find_asset
+from transcodeImages import IMAGE_COLUMNS, TranscodeSettings, ensure_formats_table, store_image
 
 """
 Here I'm going to make the different elements a data class (think structure) it will make the code more
@@ -33,15 +36,31 @@ class Connection:
     Class to manage database connections and operations for the clutter base
     """
 
-    def __init__(self, name: str):
+    def __init__(
+        self,
+        name: str,
+        image_settings: Optional[TranscodeSettings] = None,
+        normalize: bool = False,
+        new_row: bool = False,
+    ):
         """Initialize the connection object note we don't connect here as we want to
         require the context manager to open and close the connection
         Parameters :
             name : str
                 The name of the database file to connect to
+            image_settings : TranscodeSettings
+                If set the screenshots are transcoded (see transcodeImages.py) before being stored
+            normalize : bool
+                If set obj meshes are centred and scaled to unit size (see normalizeMesh.py) before being stored
+            new_row : bool
+                Always add a new row, by default an item with the name and mesh type of an existing asset is
+                stored as a new version of it (see meshVersions.py)
         """
         self.name = name
         self.connection = None
+        self.image_settings = image_settings
+        self.normalize = normalize
+        self.new_row = new_row
 
     def _open(self):
         """
@@ -70,7 +89,7 @@ class Connection:
         self,
         item: ClutterItem,
     ) -> None:
-        """Add an item to the database
+        """Add an item to the database, or a new version of the asset with the same name and mesh type
         Parameters :
             item : ClutterItem
             elements to add
@@ -78,18 +97,39 @@ class Connection:
         try:
             logging.info(f"Adding item '{item.name}' to the database.")
             cursor = self.connection.cursor()
+            mesh_data = self._load_blob(item.mesh)
+            normalization = None
+            if self.normalize and item.mesh_type == "obj" and mesh_data:
+                from normalizeMesh import normalize_obj, record_normalization
+
+                mesh_data, normalization = normalize_obj(mesh_data)
             query = """INSERT INTO Meshes (name, mesh_data, mesh_type, top_image, side_image, front_image, persp_image)
                         VALUES (?, ?, ?, ?, ?, ?, ?)"""
             query_data = (
                 item.name,
-                self._load_blob(item.mesh),
+                mesh_data,
                 item.mesh_type,
                 self._load_blob(item.top_image),
                 self._load_blob(item.side_image),
                 self._load_blob(item.front_image),
                 self._load_blob(item.persp_image),
             )
-            cursor.execute(query, query_data)
+            mesh_id = None if self.new_row else find_asset(self.connection, item.name, item.mesh_type)
+            if mesh_id is None:
+                cursor.execute(query, query_data)
+                mesh_id = cursor.lastrowid
+            else:
+                version = add_version(self.connection, mesh_id, mesh_data)
+                logging.info(f"Stored as version {version} of asset {mesh_id}.")
+                # screenshots not given keep the ones of the previous version
+                images = {column: data for column, data in zip(IMAGE_COLUMNS, query_data[3:]) if data}
+                if images:
+                    assignments = ", ".join(f"{column}=?" for column in images)
+                    cursor.execute(f"UPDATE Meshes SET {assignments} WHERE id=?", (*images.values(), mesh_id))
+            if normalization is not None:
+                record_normalization(self.connection, mesh_id, normalization)
+            if self.image_settings is not None:
+                self._transcode_images(mesh_id, query_data[3:])
             self.connection.commit()
             logging.info(f"Item '{item.name}' added successfully.")
         except Exception as e:
@@ -98,6 +138,25 @@ class Connection:
         finally:
             cursor.close()
 
+    def _transcode_images(self, mesh_id: int, images: tuple) -> None:
+        """Transcode the images of a newly inserted row, done after the insert as the
+        ImageFormats records need the row id. Runs in the same transaction as the insert.
+        Parameters :
+            mesh_id : int
+                id of the new row
+            images : tuple
+                top, side, front and persp image data
+        """
+        ensure_formats_table(self.connection)
+        updates = {}
+        for column, data in zip(IMAGE_COLUMNS, images):
+            encoded = store_image(self.connection, mesh_id, column, data, self.image_settings)
+            if encoded is not data:
+                updates[column] = encoded
+        if updates:
+            assignments = ", ".join(f"{column}=?" for column in updates)
+            self.connection.execute(f"UPDATE Meshes SET {assignments} WHERE id=?", (*updates.values(), mesh_id))
+
     def _load_blob(self, file_path: str) -> bytes:
         """Load the file as binary and return as the blob
         Parameters :
@@ -116,7 +175,13 @@ class Connection:
         return path.read_bytes()
 
 
-def add_mesh(database: str, item: ClutterItem) -> None:
+def add_mesh(
+    database: str,
+    item: ClutterItem,
+    image_settings: Optional[TranscodeSettings] = None,
+    normalize: bool = False,
+    new_row: bool = False,
+) -> None:
     """Helper function to add a mesh to the database
 
     Parameters :
@@ -124,8 +189,14 @@ def add_mesh(database: str, item: ClutterItem) -> None:
             name of database to connect to.
         item : ClutterItem
             Elements to add
+        image_settings : TranscodeSettings
+            optional format to transcode the screenshots to
+        normalize : bool
+            centre and scale obj meshes to unit size
+        new_row : bool
+            add a new row even if there is already an asset with the name and mesh type
     """
-    with Connection(database) as connection:
+    with Connection(database, image_settings, normalize, new_row) as connection:
         connection.add_item(item)
 
 
@@ -141,12 +212,18 @@ if __name__ == "__main__":
         ("--side", "-s", "Side Image", False),
         ("--front", "-f", "Front Image", False),
         ("--persp", "-p", "Perspective Image", False),
+        ("--image-format", "-i", "Transcode images to webp, jpeg, png8 or png", False),
+        ("--quality", "-q", "Quality for lossy image formats (0-100)", False),
     ]
     # create parser and add arguments
     parser = argparse.ArgumentParser(description="add mesh to database")
 
     for long_arg, short_arg, help_text, required in parser_args:
         parser.add_argument(long_arg, short_arg, help=help_text, required=required)
+    parser.add_argument("--normalize", "-N", help="Centre and scale obj meshes to unit size", action="store_true")
+    parser.add_argument(
+        "--new-row", help="Add a new row rather than a new version of an asset with the same name", action="store_true"
+    )
 
     args = parser.parse_args()
     item = ClutterItem(
@@ -159,4 +236,8 @@ if __name__ == "__main__":
         args.persp,
     )
 
-    add_mesh(args.database, item)
+    image_settings = None
+    if args.image_format:
+        image_settings = TranscodeSettings(args.image_format, int(args.quality or 80))
+
+    add_mesh(args.database, item, image_settings, args.normalize, args.new_row)
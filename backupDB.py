@@ -0,0 +1,417 @@
+#!/usr/bin/env -S uv run --script
+
+import argparse
+import os
+import re
+import sqlite3
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from scripts.clutter_schema import connect_read_only
+
+"""
+Back up and replicate a clutter database while it is in use.
+
+backup uses SQLite's online backup API to copy the database a few pages at a time, sleeping between steps
+so the GUI, addToDB.py and the ingest daemon can keep reading and writing. If another connection writes
+while the copy is running SQLite restarts it so the backup is always consistent, in WAL mode readers and
+writers are never blocked at all. A database that is written to constantly can keep restarting a stepped
+copy, use --pages -1 to copy in one step (which in WAL mode still doesn't block writers). The copy is
+written next to the destination and renamed into place so a half finished backup never replaces a good one.
+
+replicate keeps a second copy (for example on a file server) up to date by only copying what has changed.
+The first run installs triggers on the source tables that record each inserted, updated or deleted row
+(and for updates which columns changed) in a ReplicationLog table, then makes a full backup. Later runs
+read the log from where the replica got to and copy just those rows, and of those only the changed
+columns, so re-rendering one image doesn't resend the mesh. The log is pruned once every registered
+replica has applied it, unregister a replica that is no longer synced so it doesn't hold the log back.
+
+Tables created WITHOUT ROWID (e.g. FacetCounts from facetCounts.py) have no rowid to log, they are small
+tables kept up to date by triggers and are copied whole on every sync. The replica has no triggers of its
+own, everything in it is written by replicate, so the source's triggers can't fire a second time there.
+"""
+
+PAGES_PER_STEP = 256
+STEP_SLEEP = 0.05
+LOG_TABLES = ("ReplicationLog", "Replicas", "ReplicaState")
+CREATE_TABLE = re.compile(r"^\s*CREATE\s+TABLE\s+(IF\s+NOT\s+EXISTS\s+)?", re.IGNORECASE)
+# the table options come after the closing bracket of the column definitions
+WITHOUT_ROWID = re.compile(r"\bWITHOUT\s+ROWID\b[^)]*$", re.IGNORECASE)
+
+create_log_table = """CREATE TABLE IF NOT EXISTS ReplicationLog (
+seq INTEGER PRIMARY KEY AUTOINCREMENT,
+table_name TEXT NOT NULL,
+row_id INTEGER NOT NULL,
+op TEXT NOT NULL CHECK(op IN('I','U','D')),
+columns TEXT
+);"""
+
+# the source keeps track of its replicas so the log can be pruned
+create_replicas_table = """CREATE TABLE IF NOT EXISTS Replicas (
+path TEXT PRIMARY KEY,
+last_seq INTEGER NOT NULL,
+synced_at REAL NOT NULL
+);"""
+
+# the replica records how far through the log it is, this is what the next sync starts from
+create_state_table = """CREATE TABLE IF NOT EXISTS replica.ReplicaState (
+id INTEGER PRIMARY KEY CHECK(id = 1),
+source TEXT NOT NULL,
+last_seq INTEGER NOT NULL,
+synced_at REAL NOT NULL
+);"""
+
+last_log_seq = "SELECT ifnull((SELECT seq FROM sqlite_sequence WHERE name='ReplicationLog'), 0)"
+select_triggers = """SELECT name, sql FROM {schema}.sqlite_master WHERE type='trigger' AND name LIKE 'replicate_%'"""
+select_all_triggers = """SELECT name FROM {schema}.sqlite_master WHERE type='trigger'"""
+log_trigger = """CREATE TRIGGER "replicate_{table}_{event}" AFTER {event} ON "{table}"
+BEGIN
+INSERT INTO ReplicationLog (table_name, row_id, op, columns) VALUES ('{table}', {row}.rowid, '{op}', {columns});
+END;"""
+
+
+def backup(
+    source: str,
+    destination: str,
+    pages_per_step: int = PAGES_PER_STEP,
+    sleep: float = STEP_SLEEP,
+    progress: Optional[Callable[[int, int], None]] = None,
+) -> None:
+    """Copy a live database with the online backup API
+    Parameters :
+        source : str
+            the database to back up
+        destination : str
+            where to write the copy, replaced only once the copy is complete
+        pages_per_step : int
+            pages copied before the source is released again
+        sleep : float
+            seconds to wait between steps so other connections get a turn
+        progress : Callable[[int, int], None]
+            called after each step with the pages remaining and the total
+    """
+    temporary = f"{destination}.partial"
+    Path(temporary).unlink(missing_ok=True)
+    source_connection = connect_read_only(source)
+    target = sqlite3.connect(temporary)
+    try:
+        source_connection.backup(
+            target,
+            pages=pages_per_step,
+            progress=None if progress is None else lambda status, remaining, total: progress(remaining, total),
+            sleep=sleep,
+        )
+    finally:
+        target.close()
+        source_connection.close()
+    os.replace(temporary, destination)
+
+
+def _columns(connection: sqlite3.Connection, table: str, schema: str = "main") -> List[str]:
+    return [row[1] for row in connection.execute(f'PRAGMA "{schema}".table_info("{table}")')]
+
+
+def _tables(connection: sqlite3.Connection, schema: str = "main", rowid: Optional[bool] = None) -> List[str]:
+    """The replicated tables, only those with (True) or without (False) a rowid if rowid is given"""
+    query = f"""SELECT name, sql FROM "{schema}".sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%'"""
+    return [
+        name
+        for name, sql in connection.execute(query)
+        if name not in LOG_TABLES and (rowid is None or rowid != bool(WITHOUT_ROWID.search(sql)))
+    ]
+
+
+def _trigger_sql(table: str, event: str, columns: List[str]) -> str:
+    if event == "UPDATE":
+        # a list of the columns that changed, blobs are compared in place so nothing is copied
+        changed = " || ".join(
+            f"""CASE WHEN OLD."{column}" IS NOT NEW."{column}" THEN '{column},' ELSE '' END""" for column in columns
+        )
+        return log_trigger.format(table=table, event=event, row="NEW", op="U", columns=changed)
+    row = "OLD" if event == "DELETE" else "NEW"
+    return log_trigger.format(table=table, event=event, row=row, op=event[0], columns="NULL")
+
+
+def enable_replication(connection: sqlite3.Connection) -> None:
+    """Create the ReplicationLog and keep its triggers in step with the tables, call inside a transaction.
+    Triggers are recreated if a table's columns have changed, added for any new tables and dropped for tables
+    that have gone or have no rowid.
+    Parameters :
+        connection : sqlite3.Connection
+            the source database
+    """
+    connection.execute(create_log_table)
+    connection.execute(create_replicas_table)
+    existing = dict(connection.execute(select_triggers.format(schema="main")))
+    for table in _tables(connection, rowid=True):
+        columns = _columns(connection, table)
+        for event in ("INSERT", "UPDATE", "DELETE"):
+            name = f"replicate_{table}_{event}"
+            sql = _trigger_sql(table, event, columns)
+            if existing.pop(name, None) == sql.rstrip(";"):
+                continue
+            connection.execute(f'DROP TRIGGER IF EXISTS "{name}"')
+            connection.execute(sql)
+    for name in existing:
+        connection.execute(f'DROP TRIGGER IF EXISTS "{name}"')
+
+
+def _copy_table(connection: sqlite3.Connection, table: str) -> None:
+    """Replace a whole table in the replica, used for new tables or ones whose columns have changed"""
+    sql = connection.execute("SELECT sql FROM main.sqlite_master WHERE type='table' AND name=?", (table,)).fetchone()[0]
+    connection.execute(f'DROP TABLE IF EXISTS replica."{table}"')
+    connection.execute(CREATE_TABLE.sub("CREATE TABLE replica.", sql, count=1))
+    names = ", ".join(f'"{column}"' for column in _columns(connection, table))
+    if WITHOUT_ROWID.search(sql):
+        connection.execute(f'INSERT INTO replica."{table}" ({names}) SELECT {names} FROM main."{table}"')
+    else:
+        connection.execute(
+            f'INSERT INTO replica."{table}" (rowid, {names}) SELECT rowid, {names} FROM main."{table}"'
+        )
+
+
+def _pending(connection: sqlite3.Connection, last_seq: int) -> Tuple[int, Dict[Tuple[str, int], Optional[Set[str]]]]:
+    """Collapse the log after last_seq to one entry per row, None means copy the whole row"""
+    changes: Dict[Tuple[str, int], Optional[Set[str]]] = {}
+    seq = last_seq
+    query = "SELECT seq, table_name, row_id, op, columns FROM ReplicationLog WHERE seq > ? ORDER BY seq"
+    for seq, table, row_id, op, columns in connection.execute(query, (last_seq,)):
+        key = (table, row_id)
+        if op != "U":
+            changes[key] = None
+        elif key not in changes or changes[key] is not None:
+            changes.setdefault(key, set()).update(column for column in columns.split(",") if column)
+    return seq, changes
+
+
+def replicate(
+    source: str,
+    replica: str,
+    batch_size: int = 256,
+    sleep: float = STEP_SLEEP,
+    progress: Optional[Callable[[int, int], None]] = None,
+) -> Tuple[int, int]:
+    """Bring a replica up to date, making it with a full backup the first time. Returns (rows, bytes) copied.
+    A replica the source no longer keeps the log for (it was unregistered, or the entries it needs have been
+    pruned) is made again with a full backup too.
+    Parameters :
+        source : str
+            the database being replicated
+        replica : str
+            the copy to update
+        batch_size : int
+            rows written to the replica per transaction
+        sleep : float
+            seconds to wait between batches
+        progress : Callable[[int, int], None]
+            called after each batch with the rows done and the total
+    """
+    replica = str(Path(replica).resolve())
+    connection = sqlite3.connect(source, isolation_level=None)
+    try:
+        connection.execute("BEGIN IMMEDIATE")
+        enable_replication(connection)
+        connection.execute("COMMIT")
+        fresh = not Path(replica).is_file()
+        if not fresh:
+            connection.execute("ATTACH DATABASE ? AS replica", (replica,))
+            is_replica = "SELECT count(*) FROM replica.sqlite_master WHERE type='table' AND name='ReplicaState'"
+            if not connection.execute(is_replica).fetchone()[0]:
+                raise ValueError(f"{replica} exists but is not a replica, remove it or choose another path")
+            if _out_of_date(connection, replica):
+                connection.execute("DETACH DATABASE replica")
+                fresh = True
+        if fresh:
+            # anything logged after this is applied again on the next sync, which is harmless. The last seq handed
+            # out rather than max(seq), the log may have been pruned empty
+            start_seq = connection.execute(last_log_seq).fetchone()[0]
+            backup(source, replica, sleep=sleep)
+            connection.execute("ATTACH DATABASE ? AS replica", (replica,))
+            connection.execute("BEGIN")
+            # the copy has the source's log and triggers, the replica is only written by this function
+            for table in LOG_TABLES:
+                connection.execute(f'DROP TABLE IF EXISTS replica."{table}"')
+            connection.execute(create_state_table)
+            state = (str(Path(source).resolve()), start_seq, time.time())
+            connection.execute("INSERT INTO replica.ReplicaState VALUES (1, ?, ?, ?)", state)
+            # registered straight away so another replica's sync can't prune the entries this one needs
+            connection.execute("INSERT OR REPLACE INTO Replicas VALUES (?, ?, ?)", (replica, start_seq, time.time()))
+            connection.execute("COMMIT")
+
+        last_seq = connection.execute("SELECT last_seq FROM replica.ReplicaState").fetchone()[0]
+        connection.execute("BEGIN")
+        # the source's triggers (its own and those copied by the first backup) would run again as rows are
+        # applied, e.g. FacetCounts would count every insert twice
+        for (name,) in connection.execute(select_all_triggers.format(schema="replica")).fetchall():
+            connection.execute(f'DROP TRIGGER replica."{name}"')
+        for table in _tables(connection, rowid=True):
+            if _columns(connection, table) != _columns(connection, table, "replica"):
+                _copy_table(connection, table)
+        for table in _tables(connection, rowid=False):
+            _copy_table(connection, table)
+        connection.execute("COMMIT")
+
+        end_seq, changes = _pending(connection, last_seq)
+        rows = copied = 0
+        items = list(changes.items())
+        for start in range(0, len(items), batch_size):
+            connection.execute("BEGIN")
+            for (table, row_id), columns in items[start : start + batch_size]:
+                copied += _apply(connection, table, row_id, columns)
+                rows += 1
+            connection.execute("COMMIT")
+            if progress is not None:
+                progress(rows, len(items))
+            if start + batch_size < len(items):
+                time.sleep(sleep)
+
+        connection.execute("BEGIN")
+        connection.execute("UPDATE replica.ReplicaState SET last_seq=?, synced_at=?", (end_seq, time.time()))
+        connection.execute("COMMIT")
+        connection.execute("DETACH DATABASE replica")
+        connection.execute("BEGIN IMMEDIATE")
+        connection.execute("INSERT OR REPLACE INTO Replicas VALUES (?, ?, ?)", (replica, end_seq, time.time()))
+        connection.execute("DELETE FROM ReplicationLog WHERE seq <= (SELECT min(last_seq) FROM Replicas)")
+        connection.execute("COMMIT")
+        return rows, copied
+    except BaseException:
+        if connection.in_transaction:
+            connection.execute("ROLLBACK")
+        raise
+    finally:
+        connection.close()
+
+
+def _out_of_date(connection: sqlite3.Connection, replica: str) -> bool:
+    """True if the attached replica can't be brought up to date from the log, because it isn't registered (so
+    the log may have been pruned past it) or the entries after its last_seq are gone"""
+    if connection.execute("SELECT 1 FROM Replicas WHERE path=?", (replica,)).fetchone() is None:
+        return True
+    last_seq = connection.execute("SELECT last_seq FROM replica.ReplicaState").fetchone()[0]
+    oldest = connection.execute("SELECT min(seq) FROM ReplicationLog").fetchone()[0]
+    return oldest is not None and last_seq < oldest - 1
+
+
+def unregister(source: str, replica: str) -> bool:
+    """Stop keeping the log for a replica that is no longer synced, returns False if it wasn't registered.
+    The log entries only it was waiting for are pruned, syncing it again later makes a fresh copy.
+    Parameters :
+        source : str
+            the database being replicated
+        replica : str
+            the replica's path as given to replicate
+    """
+    replica = str(Path(replica).resolve())
+    connection = sqlite3.connect(source, isolation_level=None)
+    try:
+        connection.execute("BEGIN IMMEDIATE")
+        connection.execute(create_log_table)
+        connection.execute(create_replicas_table)
+        removed = connection.execute("DELETE FROM Replicas WHERE path=?", (replica,)).rowcount > 0
+        # with no replicas left nothing needs the log
+        connection.execute("DELETE FROM ReplicationLog WHERE seq <= ifnull((SELECT min(last_seq) FROM Replicas), seq)")
+        connection.execute("COMMIT")
+        return removed
+    except BaseException:
+        if connection.in_transaction:
+            connection.execute("ROLLBACK")
+        raise
+    finally:
+        connection.close()
+
+
+def replicas(source: str) -> List[Tuple[str, int, float]]:
+    """(path, last seq applied, synced at) of every registered replica
+    Parameters :
+        source : str
+            the database being replicated
+    """
+    connection = connect_read_only(source)
+    try:
+        table = connection.execute("SELECT 1 FROM sqlite_master WHERE name='Replicas'").fetchone()
+        return connection.execute("SELECT * FROM Replicas ORDER BY path").fetchall() if table else []
+    finally:
+        connection.close()
+
+
+def _apply(connection: sqlite3.Connection, table: str, row_id: int, columns: Optional[Set[str]]) -> int:
+    """Copy one row (or some of its columns) from the source to the replica, returns the bytes copied"""
+    source_columns = _columns(connection, table)
+    if not connection.execute(f'SELECT 1 FROM main."{table}" WHERE rowid=?', (row_id,)).fetchone():
+        connection.execute(f'DELETE FROM replica."{table}" WHERE rowid=?', (row_id,))
+        return 0
+    in_replica = connection.execute(f'SELECT 1 FROM replica."{table}" WHERE rowid=?', (row_id,)).fetchone()
+    if columns is None or not in_replica:
+        columns = set(source_columns)
+        names = ", ".join(f'"{column}"' for column in source_columns)
+        copy = f'INSERT OR REPLACE INTO replica."{table}" (rowid, {names}) SELECT rowid, {names} FROM main."{table}"'
+        connection.execute(f"{copy} WHERE rowid=?", (row_id,))
+    else:
+        columns = {column for column in columns if column in source_columns}
+        if not columns:
+            return 0
+        assignments = ", ".join(
+            f'"{column}"=(SELECT "{column}" FROM main."{table}" WHERE rowid=:row)' for column in columns
+        )
+        connection.execute(f'UPDATE replica."{table}" SET {assignments} WHERE rowid=:row', {"row": row_id})
+    sizes = " + ".join(f'ifnull(length("{column}"), 0)' for column in columns)
+    return connection.execute(f'SELECT {sizes} FROM replica."{table}" WHERE rowid=?', (row_id,)).fetchone()[0]
+
+
+def _report(label: str) -> Callable[[int, int], None]:
+    def report(done: int, total: int) -> None:
+        print(f"\r{label} {done}/{total}", end="", file=sys.stderr, flush=True)
+
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="online backup and incremental replication of a clutter database")
+    commands = parser.add_subparsers(dest="command", required=True)
+    backup_command = commands.add_parser("backup", help="copy the database while it is in use")
+    backup_command.add_argument("database")
+    backup_command.add_argument("output")
+    backup_command.add_argument(
+        "--pages", "-p", help="Pages copied per step, -1 copies in one step", type=int, default=PAGES_PER_STEP
+    )
+    backup_command.add_argument("--sleep", "-s", help="Seconds to pause between steps", type=float, default=STEP_SLEEP)
+    replicate_command = commands.add_parser("replicate", help="bring a replica up to date, copying only changes")
+    replicate_command.add_argument("database")
+    replicate_command.add_argument("replica")
+    replicate_command.add_argument("--batch-size", "-b", help="Rows per replica transaction", type=int, default=256)
+    replicate_command.add_argument(
+        "--sleep", "-s", help="Seconds to pause between batches", type=float, default=STEP_SLEEP
+    )
+    unregister_command = commands.add_parser(
+        "unregister", help="stop keeping the replication log for a replica, with no replica lists them"
+    )
+    unregister_command.add_argument("database")
+    unregister_command.add_argument("replica", nargs="?")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.command == "backup":
+        report = _report("pages")
+
+        def pages_done(remaining: int, total: int) -> None:
+            report(total - remaining, total)
+
+        backup(args.database, args.output, args.pages, args.sleep, pages_done)
+        print(f"\nbacked up {args.database} to {args.output} in {time.perf_counter() - start:.1f}s")
+    elif args.command == "unregister":
+        if args.replica is None:
+            for path, last_seq, synced_at in replicas(args.database):
+                print(f"{path}\tlog {last_seq}\tsynced {time.ctime(synced_at)}")
+        elif unregister(args.database, args.replica):
+            print(f"unregistered {args.replica}")
+        else:
+            sys.exit(f"{args.replica} is not a registered replica of {args.database}")
+    else:
+        try:
+            rows, copied = replicate(args.database, args.replica, args.batch_size, args.sleep, _report("rows"))
+        except (ValueError, sqlite3.Error) as e:
+            sys.exit(f"replication failed: {e}")
+        elapsed = time.perf_counter() - start
+        print(f"\nreplicated {rows} changed rows ({copied / 1e6:.2f} MB) to {args.replica} in {elapsed:.1f}s")
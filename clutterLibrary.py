@@ -0,0 +1,391 @@
+#!/usr/bin/env -S uv run --script
+
+import argparse
+import sqlite3
+from functools import lru_cache
+from pathlib import Path
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+from scripts.clutter_schema import BLOB_COLUMNS, MESH_TYPES, connect_read_only
+
+"""
+A Python API over a clutter database so pipeline scripts don't need to write SQL, for example
+
+    with ClutterLibrary("ClutterTest.db") as library:
+        for asset in library.find(mesh_type="obj", face_range=(0, 5000)):
+            print(asset.name, len(asset.mesh))
+            asset.persp_image.save(f"{asset.name}.png")
+
+find builds a parameterized query from the filters given. The same filters always build the same SQL
+text (cached here), so sqlite3's prepared statement cache reuses the compiled statement rather than
+parsing it again. Rows are streamed from the cursor and only the metadata and blob sizes are read, the
+mesh and image fields are BlobHandles that read the data on demand with incremental blob I/O, so
+iterating over a whole library runs in constant memory.
+
+Face counts live in the MeshStats table, update_stats fills it in for meshes that don't have one yet.
+Meshes archived with meshCodec.py encode --evict are read back from their encoding (see ArchivedMesh).
+"""
+
+ORDER_COLUMNS = ("id", "name", "mesh_type", "face_count")
+READ_SIZE = 1 << 16
+
+create_stats_table = """CREATE TABLE IF NOT EXISTS MeshStats (
+mesh_id INTEGER PRIMARY KEY,
+vertex_count INTEGER NOT NULL,
+face_count INTEGER NOT NULL
+);"""
+
+create_stats_trigger = """CREATE TRIGGER IF NOT EXISTS MeshStats_delete AFTER DELETE ON Meshes
+BEGIN
+DELETE FROM MeshStats WHERE mesh_id = OLD.id;
+END;"""
+
+# a mesh rewritten in place needs counting again, update_stats (or jobRunner.py stats) picks it back up.
+# meshCodec.py encode --evict empties mesh_data but the mesh is the same so its counts are kept
+create_stats_update_trigger = """CREATE TRIGGER IF NOT EXISTS MeshStats_update AFTER UPDATE OF mesh_data ON Meshes
+WHEN length(NEW.mesh_data) > 0
+BEGIN
+DELETE FROM MeshStats WHERE mesh_id = OLD.id;
+END;"""
+
+insert_stats = "INSERT OR REPLACE INTO MeshStats (mesh_id, vertex_count, face_count) VALUES (?, ?, ?)"
+insert_item = """INSERT INTO Meshes (name, mesh_data, mesh_type, top_image, side_image, front_image, persp_image)
+VALUES (?, ?, ?, ?, ?, ?, ?)"""
+
+
+class BlobHandle:
+    """
+    A mesh or image stored in the database, nothing is read until asked for.
+    len() is the size in bytes, bool() is False for NULL or empty columns.
+    """
+
+    __slots__ = ("_connection", "mesh_id", "column", "size")
+
+    def __init__(self, connection: sqlite3.Connection, mesh_id: int, column: str, size: Optional[int]):
+        self._connection = connection
+        self.mesh_id = mesh_id
+        self.column = column
+        self.size = size
+
+    def __len__(self) -> int:
+        return self.size or 0
+
+    def __bool__(self) -> bool:
+        return bool(self.size)
+
+    def __repr__(self) -> str:
+        return f"BlobHandle({self.column} of {self.mesh_id}, {self.size} bytes)"
+
+    def open(self) -> sqlite3.Blob:
+        """Open the blob for incremental reads (read, seek, slicing), use as a context manager"""
+        return self._connection.blobopen("Meshes", self.column, self.mesh_id, readonly=True)
+
+    def read(self) -> bytes:
+        """Read the whole blob, b"" if the column is NULL"""
+        if not self.size:
+            return b""
+        with self.open() as blob:
+            return blob.read()
+
+    def chunks(self, chunk_size: int = READ_SIZE) -> Iterator[bytes]:
+        """Read the blob a piece at a time
+        Parameters :
+            chunk_size : int
+                bytes per piece
+        """
+        if not self.size:
+            return
+        with self.open() as blob:
+            while data := blob.read(chunk_size):
+                yield data
+
+    def save(self, path: str) -> None:
+        """Write the blob to a file without holding it all in memory
+        Parameters :
+            path : str
+                the file to write
+        """
+        with open(path, "wb") as stream:
+            for data in self.chunks():
+                stream.write(data)
+
+
+class ArchivedMesh(BlobHandle):
+    """
+    The mesh of an asset evicted by meshCodec.py encode --evict, whose mesh_data is empty. read and chunks
+    decode it from EncodedMeshes (which needs NumPy), len() is the size of the original obj.
+    """
+
+    __slots__ = ()
+
+    def __repr__(self) -> str:
+        return f"ArchivedMesh({self.mesh_id}, {self.size} bytes)"
+
+    def open(self) -> sqlite3.Blob:
+        raise ValueError(f"mesh {self.mesh_id} is only stored encoded, use read or chunks")
+
+    def read(self) -> bytes:
+        """Decode the mesh, the values are within the error bounds stored with the encoding"""
+        from meshCodec import decode_obj, select_encoded
+
+        (data,) = self._connection.execute(select_encoded, (self.mesh_id,)).fetchone()
+        return decode_obj(bytes(data))
+
+    def chunks(self, chunk_size: int = READ_SIZE) -> Iterator[bytes]:
+        data = self.read()
+        for start in range(0, len(data), chunk_size):
+            yield data[start : start + chunk_size]
+
+
+class Asset:
+    """
+    A row of the Meshes table, the mesh and images are BlobHandles. face_count is None until
+    ClutterLibrary.update_stats has been run.
+    """
+
+    __slots__ = ("id", "name", "mesh_type", "face_count", "mesh", "top_image", "side_image", "front_image", "persp_image")
+
+    def __init__(self, connection: sqlite3.Connection, row: Tuple):
+        self.id, self.name, self.mesh_type, self.face_count = row[:4]
+        self.mesh, self.top_image, self.side_image, self.front_image, self.persp_image = (
+            BlobHandle(connection, self.id, column, size) for column, size in zip(BLOB_COLUMNS, row[4:9])
+        )
+        # the size of the original obj when the mesh has been evicted
+        if row[9] is not None:
+            self.mesh = ArchivedMesh(connection, self.id, "mesh_data", row[9])
+
+    def __repr__(self) -> str:
+        return f"Asset({self.id}, {self.name!r}, {self.mesh_type}, {len(self.mesh)} bytes)"
+
+
+@lru_cache(maxsize=None)
+def _find_sql(
+    filters: Tuple[str, ...], order_by: str, limited: bool, with_stats: bool = True, with_encoded: bool = False
+) -> str:
+    """Build the SELECT for a set of filter names, cached so the same filters always give the same SQL"""
+    sizes = ", ".join(f"length(Meshes.{column})" for column in BLOB_COLUMNS)
+    clauses = {
+        "name": "Meshes.name = ?",
+        "name_like": "Meshes.name LIKE ?",
+        "mesh_type": "Meshes.mesh_type = ?",
+        "min_faces": "MeshStats.face_count >= ?",
+        "max_faces": "MeshStats.face_count <= ?",
+        "id": "Meshes.id = ?",
+    }
+    # a read only database that has never had stats, face_count is always None
+    face_count, joins = "NULL", ""
+    if with_stats:
+        face_count = "MeshStats.face_count"
+        joins += " LEFT JOIN MeshStats ON MeshStats.mesh_id = Meshes.id"
+    archived = "NULL"
+    if with_encoded:
+        archived = "EncodedMeshes.size"
+        joins += " LEFT JOIN EncodedMeshes ON EncodedMeshes.mesh_id = Meshes.id AND length(Meshes.mesh_data) = 0"
+    sql = f"SELECT Meshes.id, Meshes.name, Meshes.mesh_type, {face_count}, {sizes}, {archived}\nFROM Meshes{joins}"
+    if filters:
+        sql += " WHERE " + " AND ".join(clauses[name] for name in filters)
+    # ORDER_COLUMNS are the first four result columns
+    sql += f" ORDER BY {ORDER_COLUMNS.index(order_by) + 1}, Meshes.id"
+    if limited:
+        sql += " LIMIT ?"
+    return sql
+
+
+def count_obj(chunks: Iterator[bytes]) -> Tuple[int, int]:
+    """Count the v and f records of an obj read in pieces, returns (vertices, faces)
+    Parameters :
+        chunks : Iterator[bytes]
+            the obj
+    """
+    vertices = faces = 0
+    # the text after the last newline of a chunk may be the start of a record so it is carried into the
+    # next chunk, a newline is put before the first chunk so a record on the first line is counted
+    pending = b"\n"
+    for data in chunks:
+        text = pending + data
+        cut = text.rindex(b"\n")
+        vertices += text.count(b"\nv ", 0, cut)
+        faces += text.count(b"\nf ", 0, cut)
+        pending = text[cut:]
+    vertices += pending.count(b"\nv ")
+    faces += pending.count(b"\nf ")
+    return vertices, faces
+
+
+class ClutterLibrary:
+    """
+    Query a clutter database without writing SQL, use as a context manager.
+    """
+
+    def __init__(self, database: str, read_only: bool = False, cached_statements: int = 128):
+        """
+        Parameters :
+            database : str
+                name of database
+            read_only : bool
+                open the database read only, safe to use while other processes write to it
+            cached_statements : int
+                size of sqlite3's prepared statement cache
+        """
+        self.database = database
+        self.read_only = read_only
+        self.cached_statements = cached_statements
+        self.connection: Optional[sqlite3.Connection] = None
+        self.has_stats = False
+        self.has_encoded = False
+
+    def __enter__(self) -> "ClutterLibrary":
+        self.open()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def open(self) -> None:
+        if self.read_only:
+            self.connection = connect_read_only(self.database, cached_statements=self.cached_statements)
+        else:
+            self.connection = sqlite3.connect(self.database, cached_statements=self.cached_statements)
+        self.has_stats = self._has_table("MeshStats")
+        self.has_encoded = self._has_table("EncodedMeshes")
+
+    def close(self) -> None:
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    def _has_table(self, name: str) -> bool:
+        query = "SELECT 1 FROM sqlite_master WHERE type='table' AND name=?"
+        return self.connection.execute(query, (name,)).fetchone() is not None
+
+    def _ensure_stats(self) -> None:
+        # only made when stats are first written so queries never change the database
+        for sql in [create_stats_table, create_stats_trigger, create_stats_update_trigger]:
+            self.connection.execute(sql)
+        self.has_stats = True
+
+    def find(
+        self,
+        name: Optional[str] = None,
+        name_like: Optional[str] = None,
+        mesh_type: Optional[str] = None,
+        face_range: Optional[Tuple[Optional[int], Optional[int]]] = None,
+        order_by: str = "id",
+        limit: Optional[int] = None,
+    ) -> Iterator[Asset]:
+        """Find assets, every filter given must match. Rows are streamed so the whole library can be iterated.
+        Parameters :
+            name : str
+                exact asset name
+            name_like : str
+                SQL LIKE pattern for the name, e.g. %chair%
+            mesh_type : str
+                obj, usd, usdc, usdz, usda or fbx
+            face_range : Tuple[int, int]
+                inclusive (min, max) face count, either may be None, meshes without stats never match
+            order_by : str
+                id, name, mesh_type or face_count
+            limit : int
+                most assets to return
+        """
+        if mesh_type is not None and mesh_type not in MESH_TYPES:
+            raise ValueError(f"{mesh_type} is not one of {MESH_TYPES}")
+        if order_by not in ORDER_COLUMNS:
+            raise ValueError(f"can only order by {ORDER_COLUMNS}")
+        low, high = face_range if face_range is not None else (None, None)
+        candidates = (
+            ("name", name),
+            ("name_like", name_like),
+            ("mesh_type", mesh_type),
+            ("min_faces", low),
+            ("max_faces", high),
+        )
+        filters = tuple(key for key, value in candidates if value is not None)
+        if not self.has_stats and face_range is not None:
+            raise ValueError(f"{self.database} has no face counts, open it writable and run update_stats")
+        params: List = [value for _, value in candidates if value is not None]
+        if limit is not None:
+            params.append(limit)
+        sql = _find_sql(filters, order_by, limit is not None, self.has_stats, self.has_encoded)
+        cursor = self.connection.execute(sql, params)
+        for row in cursor:
+            yield Asset(self.connection, row)
+
+    def get(self, mesh_id: int) -> Optional[Asset]:
+        """Get one asset by id
+        Parameters :
+            mesh_id : int
+                id of the asset
+        """
+        sql = _find_sql(("id",), "id", False, self.has_stats, self.has_encoded)
+        row = self.connection.execute(sql, (mesh_id,)).fetchone()
+        return Asset(self.connection, row) if row is not None else None
+
+    def count(self) -> int:
+        return self.connection.execute("SELECT count(*) FROM Meshes").fetchone()[0]
+
+    def add(self, name: str, mesh_data: bytes, mesh_type: str, images: Optional[Sequence[Optional[bytes]]] = None) -> int:
+        """Add an asset, returns its id. The face count is recorded for obj meshes.
+        Parameters :
+            name : str
+                asset name
+            mesh_data : bytes
+                the mesh file
+            mesh_type : str
+                obj, usd, usdc, usdz, usda or fbx
+            images : Sequence[bytes]
+                top, side, front and persp screenshots, any may be None
+        """
+        images = list(images or [None] * 4)
+        with self.connection:
+            if mesh_type == "obj":
+                self._ensure_stats()
+            mesh_id = self.connection.execute(insert_item, (name, mesh_data, mesh_type, *images)).lastrowid
+            if mesh_type == "obj":
+                self.connection.execute(insert_stats, (mesh_id, *count_obj(iter([mesh_data]))))
+        return mesh_id
+
+    def update_stats(self, batch_size: int = 256) -> int:
+        """Count the vertices and faces of every obj without stats, returns the number counted.
+        Meshes are read in pieces so memory use doesn't depend on their size.
+        Parameters :
+            batch_size : int
+                meshes per transaction
+        """
+        with self.connection:
+            self._ensure_stats()
+        # evicted meshes (meshCodec.py encode --evict) are skipped, restoring them is what counts them again
+        query = """SELECT id FROM Meshes WHERE mesh_type = 'obj' AND length(mesh_data) > 0
+        AND id NOT IN (SELECT mesh_id FROM MeshStats)"""
+        ids = [row[0] for row in self.connection.execute(query)]
+        for start in range(0, len(ids), batch_size):
+            with self.connection:
+                for mesh_id in ids[start : start + batch_size]:
+                    handle = BlobHandle(self.connection, mesh_id, "mesh_data", 1)
+                    self.connection.execute(insert_stats, (mesh_id, *count_obj(handle.chunks())))
+        return len(ids)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="search a clutter database")
+    parser.add_argument("--database", "-db", help="Which DB to connect too", required=True)
+    parser.add_argument("--name", "-n", help="SQL LIKE pattern for the name")
+    parser.add_argument("--type", "-t", help="Mesh type")
+    parser.add_argument("--min-faces", help="Fewest faces", type=int)
+    parser.add_argument("--max-faces", help="Most faces", type=int)
+    parser.add_argument("--update-stats", "-u", help="Count faces for meshes without stats first", action="store_true")
+    parser.add_argument("--save", "-s", help="Write the meshes of the matching assets to this folder")
+    args = parser.parse_args()
+
+    with ClutterLibrary(args.database, read_only=not args.update_stats) as library:
+        if args.update_stats:
+            print(f"counted {library.update_stats()} meshes")
+        face_range = None
+        if args.min_faces is not None or args.max_faces is not None:
+            face_range = (args.min_faces, args.max_faces)
+            if not args.update_stats and not library.has_stats:
+                parser.error("the database has no face counts yet, add --update-stats")
+        for asset in library.find(name_like=args.name, mesh_type=args.type, face_range=face_range):
+            print(f"{asset.id}\t{asset.name}\t{asset.mesh_type}\t{asset.face_count}\t{len(asset.mesh)}")
+            if args.save:
+                asset.mesh.save(str(Path(args.save) / f"{asset.name}.{asset.mesh_type}"))
@@ -8,19 +8,13 @@ fi
 
 echo "Generating Database"
 
-sql="DROP TABLE IF EXISTS Meshes;
-Create table Meshes (
-id integer PRIMARY KEY AUTOINCREMENT,
-name text NOT NULL,
-mesh_data BLOB NOT NULL,
-mesh_type TEXT CHECK(mesh_type IN('obj','usd','usdc','usdz','usda','fbx')),
-top_image BLOB,
-side_image BLOB,
-front_image BLOB,
-persp_image BLOB
-);"
-
-echo $sql | sqlite3 ClutterTest.db
+# start from a fresh file so none of the side tables (MeshStats, EncodedMeshes, RenderedViews...) keep rows
+# for the meshes of the last build, and so incremental auto vacuum, which lets deleted blob pages be reclaimed
+# with PRAGMA incremental_vacuum, is set before the first table. The schema comes from scripts/clutter_schema.py
+# and the facet tables and triggers from facetCounts.py, so the GUI's facet panel works straight away
+rm -f ClutterTest.db ClutterTest.db-journal ClutterTest.db-wal ClutterTest.db-shm
+python3 "$(dirname "$0")/scripts/clutter_schema.py" | sqlite3 ClutterTest.db
+python3 "$(dirname "$0")/facetCounts.py" -db ClutterTest.db install > /dev/null
 
 
 # Function to traverse directories and search for obj files
@@ -36,7 +30,7 @@ traverse_and_search() {
                 *.obj)
                     obj_file="$file"
                     ;;
-                *.png)
+                *.png|*.jpg|*.jpeg)
                     if [[ "$file" == *Front* ]]; then
                         front_png="$file"
                     elif [[ "$file" == *Top* ]]; then
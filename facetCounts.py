@@ -0,0 +1,259 @@
+#!/usr/bin/env -S uv run --script
+
+import argparse
+import sqlite3
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from clutterLibrary import create_stats_table, create_stats_trigger, create_stats_update_trigger
+
+"""
+Facet counts for browsing a clutter database, e.g. obj: 3210 / fbx: 412, without a GROUP BY over Meshes.
+
+FacetCounts holds one row per (facet, value) with the number of meshes that have that value, and is kept
+exact by triggers on the tables the facets come from, so every writer (the GUI, addToDB, the ingest daemon
+or plain sqlite3) keeps it up to date and reading it is a scan of a few rows. The facets are listed in
+Design.md
+    mesh_type  : Meshes.mesh_type
+    category   : MeshInfo.category
+    author     : MeshInfo.author
+    face_count : MeshStats.face_count in FACE_BUCKETS, the value is the lower bound of the bucket
+A missing category, author or mesh type is counted under the empty string. MeshInfo gets a row for every
+mesh as it is added so every mesh has a category and author facet, meshes without MeshStats have no face
+count facet until their stats are filled in (see jobRunner.py stats). Rewriting a mesh's mesh_data drops its
+MeshStats row (clutterLibrary.create_stats_update_trigger) so it leaves its old bucket straight away and is
+counted again by the next stats run, rather than staying in a bucket it may no longer belong to. Evicting a
+mesh (meshCodec.py encode --evict) empties mesh_data without changing the mesh so its stats and bucket stay.
+
+SQLite doesn't fire delete triggers for rows replaced by INSERT OR REPLACE (packLibrary unpack, insert_stats)
+so Meshes and MeshStats have a BEFORE INSERT trigger that takes the row being replaced out of the counts. It
+fires for every insert, so write those tables with INSERT or INSERT OR REPLACE, not an upsert or INSERT OR
+IGNORE, and don't turn on PRAGMA recursive_triggers. MeshInfo is only written with upserts (see tag_meshes).
+
+New databases (createDatabase.sh, the GUI) get the tables and triggers when they are made. Use install to add
+them to an existing database, check to compare the counts with a full GROUP BY and tag to set the category or
+author of meshes.
+"""
+
+# lower bounds of the face count buckets, a bucket runs up to the next bound
+FACE_BUCKETS = (0, 1000, 10000, 100000, 1000000)
+INFO_COLUMNS = ("category", "author")
+# tables written with INSERT OR REPLACE
+REPLACED_TABLES = ("Meshes", "MeshStats")
+
+create_info_table = """CREATE TABLE IF NOT EXISTS MeshInfo (
+mesh_id INTEGER PRIMARY KEY,
+category TEXT,
+author TEXT
+);"""
+
+create_info_trigger = """CREATE TRIGGER IF NOT EXISTS MeshInfo_delete AFTER DELETE ON Meshes
+BEGIN
+DELETE FROM MeshInfo WHERE mesh_id = OLD.id;
+END;"""
+
+# every new mesh gets an (empty) MeshInfo row so it is counted in the category and author facets, not OR IGNORE
+# as an INSERT OR REPLACE into Meshes would make it a replace
+create_info_insert_trigger = """CREATE TRIGGER IF NOT EXISTS MeshInfo_insert AFTER INSERT ON Meshes
+BEGIN
+INSERT INTO MeshInfo (mesh_id) SELECT NEW.id WHERE NOT EXISTS (SELECT 1 FROM MeshInfo WHERE mesh_id = NEW.id);
+END;"""
+
+fill_info = "INSERT OR IGNORE INTO MeshInfo (mesh_id) SELECT id FROM Meshes"
+
+create_facet_table = """CREATE TABLE IF NOT EXISTS FacetCounts (
+facet TEXT NOT NULL,
+value TEXT NOT NULL,
+count INTEGER NOT NULL,
+PRIMARY KEY (facet, value)
+) WITHOUT ROWID;"""
+
+set_info = """INSERT INTO MeshInfo (mesh_id, {column}) SELECT id, ? FROM Meshes WHERE id=?
+ON CONFLICT(mesh_id) DO UPDATE SET {column}=excluded.{column}"""
+
+
+def face_bucket(row: str) -> str:
+    """SQL for the face count bucket of a MeshStats row
+    Parameters :
+        row : str
+            prefix for the column, NEW. or OLD. in a trigger or "" in a query
+    """
+    cases = " ".join(f"WHEN {row}face_count >= {bound} THEN '{bound}'" for bound in reversed(FACE_BUCKETS[1:]))
+    return f"CASE {cases} ELSE '{FACE_BUCKETS[0]}' END"
+
+
+# facet name : (table, key column, the columns it depends on, SQL for its value given a column prefix)
+FACETS = {
+    "mesh_type": ("Meshes", "id", ("mesh_type",), lambda row: f"ifnull({row}mesh_type, '')"),
+    "category": ("MeshInfo", "mesh_id", ("category",), lambda row: f"ifnull({row}category, '')"),
+    "author": ("MeshInfo", "mesh_id", ("author",), lambda row: f"ifnull({row}author, '')"),
+    "face_count": ("MeshStats", "mesh_id", ("face_count",), face_bucket),
+}
+
+
+def _increment(facet: str, value: str) -> str:
+    return f"""INSERT INTO FacetCounts (facet, value, count) VALUES ('{facet}', {value}, 1)
+ON CONFLICT(facet, value) DO UPDATE SET count = count + 1;"""
+
+
+def _decrement(facet: str, value: str) -> str:
+    return f"""UPDATE FacetCounts SET count = count - 1 WHERE facet = '{facet}' AND value = {value};
+DELETE FROM FacetCounts WHERE facet = '{facet}' AND count <= 0;"""
+
+
+def facet_triggers() -> List[str]:
+    """The CREATE TRIGGER statements that keep FacetCounts exact, insert, delete (and replace) triggers for each
+    table and an update trigger for each facet"""
+    tables: Dict[str, Tuple[str, List[str]]] = {}
+    for facet, (table, key, _, _) in FACETS.items():
+        tables.setdefault(table, (key, []))[1].append(facet)
+    triggers = []
+    for table, (key, facets) in tables.items():
+        replaced = " ".join(
+            _decrement(facet, f"(SELECT {FACETS[facet][3]('')} FROM {table} WHERE {key} = NEW.{key})")
+            for facet in facets
+        )
+        added = " ".join(_increment(facet, FACETS[facet][3]("NEW.")) for facet in facets)
+        removed = " ".join(_decrement(facet, FACETS[facet][3]("OLD.")) for facet in facets)
+        if table in REPLACED_TABLES:
+            triggers.append(
+                f"CREATE TRIGGER IF NOT EXISTS FacetCounts_{table}_replace BEFORE INSERT ON {table}\n"
+                f"BEGIN\n{replaced}\nEND;"
+            )
+        triggers += [
+            f"CREATE TRIGGER IF NOT EXISTS FacetCounts_{table}_insert AFTER INSERT ON {table}\nBEGIN\n{added}\nEND;",
+            f"CREATE TRIGGER IF NOT EXISTS FacetCounts_{table}_delete AFTER DELETE ON {table}\nBEGIN\n{removed}\nEND;",
+        ]
+        for facet in facets:
+            columns = ", ".join(FACETS[facet][2])
+            old, new = FACETS[facet][3]("OLD."), FACETS[facet][3]("NEW.")
+            triggers.append(
+                f"CREATE TRIGGER IF NOT EXISTS FacetCounts_{facet}_update AFTER UPDATE OF {columns} ON {table}\n"
+                f"WHEN {old} IS NOT {new}\nBEGIN\n{_decrement(facet, old)}\n{_increment(facet, new)}\nEND;"
+            )
+    return triggers
+
+
+def _counted(connection: sqlite3.Connection) -> Dict[Tuple[str, str], int]:
+    """The facet counts from a full GROUP BY of every table"""
+    counts = {}
+    for facet, (table, _, _, value) in FACETS.items():
+        for facet_value, count in connection.execute(f"SELECT {value('')}, count(*) FROM {table} GROUP BY 1"):
+            counts[(facet, facet_value)] = count
+    return counts
+
+
+def rebuild_facets(connection: sqlite3.Connection) -> None:
+    """Recount every facet, the caller commits"""
+    connection.execute("DELETE FROM FacetCounts")
+    connection.executemany(
+        "INSERT INTO FacetCounts (facet, value, count) VALUES (?, ?, ?)",
+        [(facet, value, count) for (facet, value), count in _counted(connection).items()],
+    )
+
+
+def facet_schema() -> List[str]:
+    """The CREATE statements for the facet tables and triggers, enough on their own for a new empty database
+    (createDatabase.sh and the GUI run them), install_facets also counts the meshes already there"""
+    return [
+        create_stats_table,
+        create_stats_trigger,
+        create_stats_update_trigger,
+        create_info_table,
+        create_info_trigger,
+        create_info_insert_trigger,
+        create_facet_table,
+        *facet_triggers(),
+    ]
+
+
+def install_facets(connection: sqlite3.Connection) -> None:
+    """Add the facet tables and triggers to a database and count the facets of the meshes already in it,
+    it is safe to run again"""
+    with connection:
+        for sql in facet_schema():
+            connection.execute(sql)
+            if sql == create_info_insert_trigger:
+                # before the facet triggers so filling MeshInfo doesn't count each row, rebuild_facets does
+                connection.execute(fill_info)
+        rebuild_facets(connection)
+
+
+def facet_counts(connection: sqlite3.Connection) -> Dict[str, List[Tuple[str, int]]]:
+    """The counts for every facet, as {facet: [(value, count)]} with the most common value first
+    and face count buckets in order"""
+    counts: Dict[str, List[Tuple[str, int]]] = {facet: [] for facet in FACETS}
+    for facet, value, count in connection.execute("SELECT facet, value, count FROM FacetCounts ORDER BY count DESC"):
+        counts.setdefault(facet, []).append((value, count))
+    counts["face_count"].sort(key=lambda item: int(item[0]))
+    return counts
+
+
+def check_facets(connection: sqlite3.Connection) -> List[Tuple[str, str, int, int]]:
+    """Compare the stored counts with a full recount, returns (facet, value, stored, counted) for each difference"""
+    stored = {(facet, value): count for facet, value, count in connection.execute("SELECT * FROM FacetCounts")}
+    counted = _counted(connection)
+    return [
+        (facet, value, stored.get((facet, value), 0), counted.get((facet, value), 0))
+        for facet, value in sorted(stored.keys() | counted.keys())
+        if stored.get((facet, value), 0) != counted.get((facet, value), 0)
+    ]
+
+
+def tag_meshes(
+    connection: sqlite3.Connection, ids: Sequence[int], category: Optional[str] = None, author: Optional[str] = None
+) -> None:
+    """Set the category and or author of meshes, None leaves it as it is and "" clears it
+    Parameters :
+        connection : sqlite3.Connection
+            connection to a database with facets installed
+        ids : Sequence[int]
+            ids of the meshes, ids that aren't in Meshes are skipped
+        category : str
+            the new category
+        author : str
+            the new author
+    """
+    with connection:
+        for column, value in zip(INFO_COLUMNS, (category, author)):
+            if value is not None:
+                value = value or None
+                connection.executemany(set_info.format(column=column), [(value, mesh_id) for mesh_id in ids])
+
+
+def _label(facet: str, value: str) -> str:
+    if facet != "face_count":
+        return value or "(none)"
+    bound = FACE_BUCKETS.index(int(value))
+    return f"{value}+" if bound == len(FACE_BUCKETS) - 1 else f"{value}-{FACE_BUCKETS[bound + 1] - 1}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="facet counts for browsing a clutter database")
+    parser.add_argument("--database", "-db", help="Which DB to connect too", required=True)
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("install", help="add the facet tables and triggers and count the existing meshes")
+    commands.add_parser("show", help="print the facet counts")
+    commands.add_parser("check", help="compare the facet counts with a full recount")
+    commands.add_parser("rebuild", help="recount every facet")
+    tag = commands.add_parser("tag", help="set the category and or author of meshes")
+    tag.add_argument("--category", "-c", help="Category, an empty string clears it")
+    tag.add_argument("--author", "-a", help="Author, an empty string clears it")
+    tag.add_argument("ids", nargs="+", type=int, help="Mesh ids")
+    args = parser.parse_args()
+
+    with sqlite3.connect(args.database) as connection:
+        if args.command == "install":
+            install_facets(connection)
+        elif args.command == "tag":
+            tag_meshes(connection, args.ids, args.category, args.author)
+        elif args.command == "rebuild":
+            with connection:
+                rebuild_facets(connection)
+        elif args.command == "check":
+            differences = check_facets(connection)
+            for facet, value, stored, counted in differences:
+                print(f"{facet} {_label(facet, value)}: stored {stored} counted {counted}")
+            print("facet counts are exact" if not differences else f"{len(differences)} facet counts differ")
+        if args.command in ("install", "show", "tag"):
+            for facet, values in facet_counts(connection).items():
+                print(f"{facet}: " + " / ".join(f"{_label(facet, value)}: {count:,}" for value, count in values))
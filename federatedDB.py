@@ -0,0 +1,289 @@
+#!/usr/bin/env -S uv run --script
+
+import argparse
+import heapq
+import json
+import os
+import queue
+import re
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from scripts.clutter_schema import connect_read_only, read_only_uri
+
+"""
+Each show keeps its own clutter database, this module lets several of them be registered and queried as
+one library. Every result row gets a leading source column naming the library it came from.
+
+There are two ways of running a query
+    * attach : ATTACH every library to one connection and query a TEMP view that is a UNION ALL of all the
+      Meshes tables, SQLite can attach at most 10 databases by default.
+    * search : open each library on its own read only connection and run the query on all of them in
+      parallel, the rows are merged and handed back lazily as they arrive (or in order if sorted).
+"""
+
+# SQLite's default SQLITE_MAX_ATTACHED
+MAX_ATTACHED = 10
+METADATA_COLUMNS = ("id", "name", "mesh_type")
+_ALIAS = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+
+def default_registry() -> Path:
+    """The registry lives in CLUTTER_ROOT if it is set otherwise the current directory"""
+    return Path(os.environ.get("CLUTTER_ROOT", ".")) / "libraries.json"
+
+
+def alias_for(path: str, taken: Sequence[str] = ()) -> str:
+    """Make a valid SQL identifier from a database file name, NewGUI uses it for the libraries it attaches
+    Parameters :
+        path : str
+            path of the database
+        taken : Sequence[str]
+            aliases already in use, the alias is made unique by adding underscores (every show's library is
+            often called ClutterTest.db)
+    """
+    alias = re.sub(r"[^A-Za-z0-9_]", "_", Path(path).stem)
+    alias = alias if _ALIAS.match(alias) else f"db_{alias}"
+    # main and temp are the schema names SQLite keeps for itself
+    while alias in taken or alias.lower() in ("main", "temp"):
+        alias += "_"
+    return alias
+
+
+class LibraryRegistry:
+    """
+    The set of libraries to search, stored as a json file of alias : database path.
+    """
+
+    def __init__(self, path: Optional[Path] = None):
+        """Load the registry
+        Parameters :
+            path : Path
+                The registry file, defaults to CLUTTER_ROOT/libraries.json
+        """
+        self.path = Path(path) if path else default_registry()
+        self.libraries: Dict[str, str] = {}
+        if self.path.is_file():
+            self.libraries = json.loads(self.path.read_text())
+
+    def register(self, database: str, alias: Optional[str] = None) -> str:
+        """Add a library, returns the alias used. Registering a library again returns the alias it already has
+        Parameters :
+            database : str
+                path to the database
+            alias : str
+                name for the library, defaults to the file name made unique, an error if another library has it
+        """
+        path = str(Path(database).resolve())
+        if alias is None:
+            for registered, registered_path in self.libraries.items():
+                if registered_path == path:
+                    return registered
+            alias = alias_for(database, list(self.libraries))
+        if not _ALIAS.match(alias) or alias.lower() in ("main", "temp"):
+            raise ValueError(f"{alias} is not a valid library name")
+        if self.libraries.get(alias, path) != path:
+            raise ValueError(f"{alias} is already the name of {self.libraries[alias]}, choose another with --alias")
+        self.libraries[alias] = path
+        self.save()
+        return alias
+
+    def unregister(self, alias: str) -> None:
+        """Remove a library
+        Parameters :
+            alias : str
+                name of the library
+        """
+        self.libraries.pop(alias, None)
+        self.save()
+
+    def save(self) -> None:
+        self.path.write_text(json.dumps(self.libraries, indent=2))
+
+
+def union_view_sql(aliases: Sequence[str], columns: Sequence[str] = METADATA_COLUMNS, view: str = "AllMeshes") -> str:
+    """Build a TEMP view over the Meshes table of every attached database
+    Parameters :
+        aliases : Sequence[str]
+            the schema names the libraries are attached as
+        columns : Sequence[str]
+            columns to include after the source column
+        view : str
+            name of the view
+    """
+    selects = [f"SELECT '{alias}' AS source, {', '.join(columns)} FROM \"{alias}\".Meshes" for alias in aliases]
+    return f"CREATE TEMP VIEW {view} AS\n" + "\nUNION ALL\n".join(selects) + ";"
+
+
+class Federation:
+    """
+    Query a set of libraries as if they were one.
+    """
+
+    def __init__(self, libraries: Dict[str, str], workers: Optional[int] = None):
+        """
+        Parameters :
+            libraries : Dict[str, str]
+                alias : database path
+            workers : int
+                number of threads for parallel searches, defaults to one per library
+        """
+        for alias in libraries:
+            if not _ALIAS.match(alias):
+                raise ValueError(f"{alias} is not a valid library name")
+        self.libraries = dict(libraries)
+        self.workers = workers or max(1, len(self.libraries))
+
+    @staticmethod
+    def _open(path: str) -> sqlite3.Connection:
+        # read only so a search never takes a write lock on a show's library
+        return connect_read_only(path, check_same_thread=False)
+
+    def attach(self, columns: Sequence[str] = METADATA_COLUMNS) -> sqlite3.Connection:
+        """Return an in memory connection with every library attached and an AllMeshes view over them.
+        Parameters :
+            columns : Sequence[str]
+                columns to include in the view, add image columns if needed
+        """
+        if len(self.libraries) > MAX_ATTACHED:
+            raise RuntimeError(f"can only attach {MAX_ATTACHED} libraries, use search instead")
+        connection = sqlite3.connect(":memory:", uri=True)
+        for alias, path in self.libraries.items():
+            connection.execute(f'ATTACH DATABASE ? AS "{alias}"', (read_only_uri(path),))
+        connection.execute(union_view_sql(list(self.libraries), columns))
+        return connection
+
+    def _build_query(self, columns: Sequence[str], where: str, order_by: Optional[str]) -> str:
+        query = f"SELECT {', '.join(columns)} FROM Meshes"
+        if where:
+            query += f" WHERE {where}"
+        if order_by:
+            query += f" ORDER BY {order_by}"
+        return query
+
+    def search(
+        self,
+        where: str = "",
+        params: Sequence = (),
+        columns: Sequence[str] = METADATA_COLUMNS,
+        order_by: Optional[str] = None,
+        chunk_size: int = 256,
+    ) -> Iterator[Tuple]:
+        """Run a query on every library in parallel and yield (source, *columns) rows as they arrive.
+        If order_by is given each library is sorted by SQLite and the streams are merged in order,
+        order_by must then be one of the selected columns.
+        Parameters :
+            where : str
+                optional WHERE clause using ? placeholders
+            params : Sequence
+                values for the placeholders
+            columns : Sequence[str]
+                columns to select
+            order_by : str
+                optional column to sort by
+            chunk_size : int
+                rows fetched from each library at a time
+        """
+        query = self._build_query(columns, where, order_by)
+        if order_by:
+            key_index = 1 + list(columns).index(order_by)
+            streams = [self._stream(alias, path, query, params, chunk_size) for alias, path in self.libraries.items()]
+            yield from heapq.merge(*streams, key=lambda row: row[key_index])
+            return
+        yield from self._parallel(query, params, chunk_size)
+
+    def _stream(self, alias: str, path: str, query: str, params: Sequence, chunk_size: int) -> Iterator[Tuple]:
+        connection = self._open(path)
+        try:
+            cursor = connection.execute(query, params)
+            while rows := cursor.fetchmany(chunk_size):
+                for row in rows:
+                    yield (alias, *row)
+        finally:
+            connection.close()
+
+    def _parallel(self, query: str, params: Sequence, chunk_size: int) -> Iterator[Tuple]:
+        """Fan the query out to a thread per library, SQLite releases the GIL while stepping so the
+        libraries are read concurrently. Chunks are passed back through a bounded queue so memory use
+        stays flat however big the result is."""
+        results: queue.Queue = queue.Queue(maxsize=4 * max(1, len(self.libraries)))
+        stop = threading.Event()
+        done = object()
+
+        def worker(alias: str, path: str) -> None:
+            try:
+                connection = self._open(path)
+                try:
+                    cursor = connection.execute(query, params)
+                    while not stop.is_set() and (rows := cursor.fetchmany(chunk_size)):
+                        results.put([(alias, *row) for row in rows])
+                finally:
+                    connection.close()
+            except sqlite3.Error as e:
+                results.put(e)
+            finally:
+                results.put(done)
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            for alias, path in self.libraries.items():
+                pool.submit(worker, alias, path)
+            remaining = len(self.libraries)
+            try:
+                while remaining:
+                    item = results.get()
+                    if item is done:
+                        remaining -= 1
+                    elif isinstance(item, Exception):
+                        raise item
+                    else:
+                        yield from item
+            finally:
+                # the caller stopped early, let the workers finish up
+                stop.set()
+                while remaining:
+                    if results.get() is done:
+                        remaining -= 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="register and search several clutter libraries as one")
+    parser.add_argument("--registry", "-r", help="Registry file (default $CLUTTER_ROOT/libraries.json)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    register = commands.add_parser("register", help="add a library")
+    register.add_argument("database")
+    register.add_argument("--alias", "-a")
+    unregister = commands.add_parser("unregister", help="remove a library")
+    unregister.add_argument("alias")
+    commands.add_parser("list", help="list the registered libraries")
+    search = commands.add_parser("search", help="search every library")
+    search.add_argument("--name", "-n", help="substring of the asset name")
+    search.add_argument("--type", "-t", help="mesh type")
+    search.add_argument("--sort", "-s", action="store_true", help="sort the merged results by name")
+    args = parser.parse_args()
+
+    registry = LibraryRegistry(args.registry)
+    if args.command == "register":
+        try:
+            print(f"registered {registry.register(args.database, args.alias)}")
+        except ValueError as e:
+            parser.error(str(e))
+    elif args.command == "unregister":
+        registry.unregister(args.alias)
+    elif args.command == "list":
+        for alias, path in registry.libraries.items():
+            print(f"{alias}\t{path}")
+    else:
+        clauses: List[str] = []
+        params: List[str] = []
+        if args.name:
+            clauses.append("name LIKE ?")
+            params.append(f"%{args.name}%")
+        if args.type:
+            clauses.append("mesh_type = ?")
+            params.append(args.type)
+        federation = Federation(registry.libraries)
+        for row in federation.search(" AND ".join(clauses), params, order_by="name" if args.sort else None):
+            print("\t".join(str(value) for value in row))
@@ -0,0 +1,439 @@
+#!/usr/bin/env -S uv run --script
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import signal
+import sqlite3
+import time
+from contextlib import closing
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+from meshVersions import add_version
+from scripts.clutter_schema import VIEW_COLUMNS, connect_read_only, create_schema
+from transcodeImages import SCREENSHOT_SUFFIXES
+
+if TYPE_CHECKING:
+    # normalizeMesh needs numpy, it is only imported when --normalize is used
+    from normalizeMesh import Normalization
+
+"""
+Long running service that ingests the asset folders ExportScript.py writes into $CLUTTER_ROOT/ExportedMeshes,
+so nobody has to run createDatabase.sh by hand.
+
+The tree is polled (there is no portable file notification that works on network shares) and an asset
+folder <name>/ is only ingested once it is
+    * complete : <name>.obj and <name>Front/Side/Top/Persp.png (or .jpg) all exist
+    * stable : nothing in the folder has changed size or modification time for settle seconds
+
+Ready folders are gathered into batches, a batch is written once no new folder has become ready for
+debounce seconds (or it is full), so a large export goes in as a few big transactions rather than one
+per asset. There is a single writer connection for the life of the daemon.
+
+Every ingested folder is recorded in the IngestLog table in the same transaction as its Meshes row,
+along with a signature of its files. After a crash the log says exactly what made it into the database,
+so a restart skips those folders and picks up the rest. A folder whose files change after ingest is
+ingested again and replaces its row, the previous mesh is kept in the version history (meshVersions.py).
+Folders already ingested are only looked at again when their directory's modification time changes (files
+added, removed or renamed), plus a full check of every folder each rescan seconds to catch files rewritten
+in place. A database error (e.g. locked by another writer) rolls the batch back and it is tried again on
+the next poll. The current backlog is logged every poll and written to a status file that the status
+command reports.
+"""
+
+create_log_table = """CREATE TABLE IF NOT EXISTS IngestLog (
+folder TEXT PRIMARY KEY,
+signature TEXT NOT NULL,
+mesh_id INTEGER,
+status TEXT NOT NULL CHECK(status IN('ingested','failed')),
+error TEXT,
+ingested_at REAL NOT NULL
+);"""
+
+insert_mesh = """INSERT INTO Meshes (name, mesh_data, mesh_type, top_image, side_image, front_image, persp_image)
+VALUES (?, ?, 'obj', ?, ?, ?, ?)"""
+update_mesh = """UPDATE Meshes SET name=?, mesh_data=?, mesh_type='obj', top_image=?, side_image=?, front_image=?,
+persp_image=? WHERE id=?"""
+insert_log = """INSERT OR REPLACE INTO IngestLog (folder, signature, mesh_id, status, error, ingested_at)
+VALUES (?, ?, ?, ?, ?, ?)"""
+
+
+def asset_files(folder: str, name: str) -> Optional[Dict[str, str]]:
+    """The files that make up a complete export of an asset as column : path, None if any are missing
+    Parameters :
+        folder : str
+            the asset folder
+        name : str
+            name of the asset, the same as its folder
+    """
+    files = {"mesh_data": os.path.join(folder, f"{name}.obj")}
+    if not os.path.isfile(files["mesh_data"]):
+        return None
+    for view, column in VIEW_COLUMNS.items():
+        paths = [os.path.join(folder, f"{name}{view}{suffix}") for suffix in SCREENSHOT_SUFFIXES]
+        found = [path for path in paths if os.path.isfile(path)]
+        if not found:
+            return None
+        files[column] = found[0]
+    return files
+
+
+def folder_signature(folder: Path) -> Optional[str]:
+    """Hash of the name, size and modification time of every file in a folder, None if it can't be read
+    Parameters :
+        folder : Path
+            the asset folder
+    """
+    digest = hashlib.sha1()
+    try:
+        for entry in sorted(os.scandir(folder), key=lambda entry: entry.name):
+            if entry.is_file():
+                stat = entry.stat()
+                digest.update(f"{entry.name}\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode())
+    except OSError:
+        return None
+    return digest.hexdigest()
+
+
+@dataclass
+class Candidate:
+    """A complete folder waiting to be stable, since is when its current signature was first seen"""
+
+    folder: Path
+    signature: str
+    since: float
+
+
+class IngestDaemon:
+    """
+    Poll an ExportedMeshes folder and ingest complete, stable asset folders into a database.
+    """
+
+    def __init__(
+        self,
+        export_dir: Path,
+        database: str,
+        settle: float = 5.0,
+        debounce: float = 3.0,
+        batch_size: int = 32,
+        normalize: bool = False,
+        status_file: Optional[Path] = None,
+        rescan: float = 300.0,
+    ):
+        """
+        Parameters :
+            export_dir : Path
+                the folder to watch, normally $CLUTTER_ROOT/ExportedMeshes
+            database : str
+                name of database, created if needed
+            settle : float
+                seconds a folder must be unchanged before it is ingested
+            debounce : float
+                seconds without a new ready folder before a batch is written
+            batch_size : int
+                most assets written in one transaction
+            normalize : bool
+                centre and scale the meshes to unit size (see normalizeMesh.py)
+            status_file : Path
+                where the backlog is written each poll, defaults to ingest_status.json in export_dir
+            rescan : float
+                seconds between full checks of the folders already ingested
+        """
+        self.export_dir = Path(export_dir)
+        self.database = database
+        self.settle = settle
+        self.debounce = debounce
+        self.batch_size = batch_size
+        self.normalize = normalize
+        self.status_file = status_file or default_status_file(self.export_dir)
+        self.rescan = rescan
+        self.connection = sqlite3.connect(database)
+        create_schema(self.connection)
+        self.connection.execute(create_log_table)
+        self.connection.commit()
+        # folder : (signature, mesh_id) of everything already in the log, this is the crash recovery
+        self.done: Dict[str, Tuple[str, Optional[int]]] = {
+            folder: (signature, mesh_id)
+            for folder, signature, mesh_id in self.connection.execute(
+                "SELECT folder, signature, mesh_id FROM IngestLog"
+            )
+        }
+        # folder : directory mtime when its files last matched the log, unchanged folders aren't hashed again
+        self.checked: Dict[str, int] = {}
+        self._last_rescan = -float("inf")
+        self.candidates: Dict[str, Candidate] = {}
+        self.incomplete: List[str] = []
+        self.ready_count = 0
+        self._last_ready_count = 0
+        self._last_arrival = 0.0
+        self._last_backlog: Tuple[int, int, int] = (0, 0, 0)
+        self.stopping = False
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def scan(self, now: float) -> List[Candidate]:
+        """Look at every asset folder and return the ones that are ready to ingest
+        Parameters :
+            now : float
+                time of this poll
+        """
+        seen = set()
+        self.incomplete = []
+        full = now - self._last_rescan >= self.rescan
+        if full:
+            self._last_rescan = now
+        try:
+            folders = [entry for entry in os.scandir(self.export_dir) if entry.is_dir()]
+        except FileNotFoundError:
+            folders = []
+        for entry in folders:
+            key = entry.name
+            seen.add(key)
+            try:
+                folder_mtime = entry.stat().st_mtime_ns
+            except OSError:
+                continue
+            if not full and key in self.done and self.checked.get(key) == folder_mtime:
+                continue
+            if asset_files(entry.path, key) is None:
+                self.incomplete.append(key)
+                self.candidates.pop(key, None)
+                continue
+            signature = folder_signature(Path(entry.path))
+            if signature is None:
+                continue
+            if key in self.done and self.done[key][0] == signature:
+                self.candidates.pop(key, None)
+                self.checked[key] = folder_mtime
+                continue
+            candidate = self.candidates.get(key)
+            if candidate is None or candidate.signature != signature:
+                # new or still being written, start the settle timer again
+                self.candidates[key] = Candidate(Path(entry.path), signature, now)
+        for key in set(self.candidates) - seen:
+            del self.candidates[key]
+        for key in set(self.checked) - seen:
+            del self.checked[key]
+        ready = [candidate for candidate in self.candidates.values() if now - candidate.since >= self.settle]
+        if len(ready) != self._last_ready_count:
+            if len(ready) > self._last_ready_count:
+                self._last_arrival = now
+            self._last_ready_count = len(ready)
+        return sorted(ready, key=lambda candidate: candidate.since)
+
+    def _read(self, candidate: Candidate) -> Tuple[Tuple, Optional["Normalization"]]:
+        # the row for insert_mesh and, when normalizing, the Normalization to record with it
+        name = candidate.folder.name
+        files = asset_files(str(candidate.folder), name)
+        if files is None:
+            raise FileNotFoundError(f"{candidate.folder} is no longer complete")
+        mesh = Path(files["mesh_data"]).read_bytes()
+        normalization = None
+        if self.normalize:
+            from normalizeMesh import normalize_obj
+
+            mesh, normalization = normalize_obj(mesh)
+        images = {column: Path(files[column]).read_bytes() for column in VIEW_COLUMNS.values()}
+        row = (
+            name,
+            mesh,
+            images["top_image"],
+            images["side_image"],
+            images["front_image"],
+            images["persp_image"],
+        )
+        return row, normalization
+
+    def ingest(self, batch: List[Candidate]) -> int:
+        """Write a batch of assets and their log entries in one transaction, returns the number ingested.
+        If the database raises sqlite3.Error the transaction is rolled back and nothing is marked done.
+        Parameters :
+            batch : List[Candidate]
+                ready folders
+        """
+        ingested = 0
+        # only applied to self.done once the transaction has committed
+        done: Dict[str, Tuple[str, Optional[int]]] = {}
+        with self.connection:
+            for candidate in batch:
+                key = candidate.folder.name
+                previous_id = self.done.get(key, (None, None))[1]
+                try:
+                    row, normalization = self._read(candidate)
+                except (OSError, ValueError) as e:
+                    logging.error(f"failed to read {candidate.folder}: {e}")
+                    self.connection.execute(
+                        insert_log, (key, candidate.signature, previous_id, "failed", str(e), time.time())
+                    )
+                    done[key] = (candidate.signature, previous_id)
+                    continue
+                mesh_id = None
+                if previous_id is not None:
+                    # exported again, keep the old mesh in the version history and replace the row
+                    # rather than adding a duplicate
+                    try:
+                        add_version(self.connection, previous_id, row[1])
+                    except KeyError:
+                        pass
+                    cursor = self.connection.execute(update_mesh, (*row, previous_id))
+                    mesh_id = previous_id if cursor.rowcount else None
+                if mesh_id is None:
+                    mesh_id = self.connection.execute(insert_mesh, row).lastrowid
+                if normalization is not None:
+                    # the original bounds, so normalize_database doesn't take the mesh for an unnormalized one
+                    from normalizeMesh import record_normalization
+
+                    record_normalization(self.connection, mesh_id, normalization)
+                self.connection.execute(
+                    insert_log, (key, candidate.signature, mesh_id, "ingested", None, time.time())
+                )
+                done[key] = (candidate.signature, mesh_id)
+                ingested += 1
+        self.done.update(done)
+        for candidate in batch:
+            self.candidates.pop(candidate.folder.name, None)
+        self._last_ready_count = 0
+        return ingested
+
+    def poll(self, now: Optional[float] = None) -> int:
+        """Scan once and write a batch if one is due, returns the number of assets ingested
+        Parameters :
+            now : float
+                time of this poll, defaults to time.monotonic
+        """
+        now = time.monotonic() if now is None else now
+        ready = self.scan(now)
+        ingested = 0
+        if ready and (len(ready) >= self.batch_size or now - self._last_arrival >= self.debounce):
+            try:
+                ingested = self.ingest(ready[: self.batch_size])
+                logging.info(f"ingested {ingested} assets")
+            except sqlite3.Error as e:
+                # e.g. the database is locked, the batch was rolled back and is still ready for the next poll
+                logging.error(f"could not write batch of {min(len(ready), self.batch_size)} assets: {e}")
+        self.ready_count = len(ready) - ingested
+        self.write_status()
+        return ingested
+
+    def backlog(self) -> Dict[str, int]:
+        """Counts of the folders not yet in the database"""
+        return {
+            "ready": self.ready_count,
+            "settling": len(self.candidates) - self.ready_count,
+            "incomplete": len(self.incomplete),
+        }
+
+    def write_status(self) -> None:
+        status = {
+            **self.backlog(),
+            "ingested": sum(1 for _, mesh_id in self.done.values() if mesh_id is not None),
+            "updated_at": time.time(),
+            "pid": os.getpid(),
+        }
+        backlog = (status["ready"], status["settling"], status["incomplete"])
+        if backlog != self._last_backlog:
+            logging.info(f"backlog : {backlog[0]} ready, {backlog[1]} settling, {backlog[2]} incomplete")
+            self._last_backlog = backlog
+        try:
+            temp = self.status_file.with_suffix(".tmp")
+            temp.write_text(json.dumps(status, indent=2))
+            temp.replace(self.status_file)
+        except OSError as e:
+            logging.warning(f"could not write {self.status_file}: {e}")
+
+    def run(self, interval: float = 2.0) -> None:
+        """Poll until SIGINT or SIGTERM, the batch in progress is always finished first
+        Parameters :
+            interval : float
+                seconds between polls
+        """
+
+        def stop(*_) -> None:
+            self.stopping = True
+
+        signal.signal(signal.SIGINT, stop)
+        signal.signal(signal.SIGTERM, stop)
+        logging.info(f"watching {self.export_dir}, {len(self.done)} folders already ingested")
+        while not self.stopping:
+            self.poll()
+            time.sleep(interval)
+        logging.info("stopped")
+
+
+def default_status_file(export_dir: Path) -> Path:
+    return export_dir / "ingest_status.json"
+
+
+def report_status(export_dir: Path, database: str, status_file: Optional[Path] = None) -> None:
+    """Print the backlog written by a running daemon and a summary of the ingest log
+    Parameters :
+        export_dir : Path
+            the watched folder
+        database : str
+            name of database
+        status_file : Path
+            the daemon's status file, defaults to ingest_status.json in export_dir
+    """
+    status_file = status_file or default_status_file(export_dir)
+    if status_file.is_file():
+        status = json.loads(status_file.read_text())
+        age = time.time() - status["updated_at"]
+        print(f"daemon pid {status['pid']} last polled {age:.0f}s ago")
+        print(f"backlog : {status['ready']} ready, {status['settling']} settling, {status['incomplete']} incomplete")
+    else:
+        print("no status file, is the daemon running?")
+    with closing(connect_read_only(database)) as connection:
+        try:
+            for state, count in connection.execute("SELECT status, count(*) FROM IngestLog GROUP BY status"):
+                print(f"{state} : {count}")
+            for folder, error in connection.execute("SELECT folder, error FROM IngestLog WHERE status='failed'"):
+                print(f"  {folder} : {error}")
+        except sqlite3.OperationalError:
+            print("nothing ingested yet")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="ingest exported assets from $CLUTTER_ROOT/ExportedMeshes")
+    parser.add_argument("--database", "-db", help="Which DB to connect too", required=True)
+    parser.add_argument("--folder", "-f", help="Folder to watch (default $CLUTTER_ROOT/ExportedMeshes)")
+    parser.add_argument("--interval", "-i", help="Seconds between polls", type=float, default=2.0)
+    parser.add_argument("--settle", "-s", help="Seconds a folder must be unchanged", type=float, default=5.0)
+    parser.add_argument(
+        "--debounce", "-d", help="Seconds to wait for more assets before a batch", type=float, default=3.0
+    )
+    parser.add_argument("--batch-size", "-b", help="Assets per transaction", type=int, default=32)
+    parser.add_argument("--normalize", "-N", help="Centre and scale meshes to unit size", action="store_true")
+    parser.add_argument("--rescan", help="Seconds between full checks of ingested folders", type=float, default=300.0)
+    parser.add_argument("--status-file", help="Backlog file (default ingest_status.json in the folder)", type=Path)
+    parser.add_argument("--status", help="Report the backlog and exit", action="store_true")
+    args = parser.parse_args()
+
+    folder = args.folder
+    if folder is None:
+        try:
+            folder = Path(os.environ["CLUTTER_ROOT"]) / "ExportedMeshes"
+        except KeyError:
+            parser.error("CLUTTER_ROOT Not set, use --folder")
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    if args.status:
+        report_status(Path(folder), args.database, args.status_file)
+    else:
+        daemon = IngestDaemon(
+            Path(folder),
+            args.database,
+            args.settle,
+            args.debounce,
+            args.batch_size,
+            args.normalize,
+            args.status_file,
+            args.rescan,
+        )
+        try:
+            daemon.run(args.interval)
+        finally:
+            daemon.close()
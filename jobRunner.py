@@ -0,0 +1,313 @@
+#!/usr/bin/env -S uv run --script
+
+import argparse
+import hashlib
+import logging
+import os
+import sqlite3
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from contextlib import closing
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple
+
+from clutterLibrary import (
+    BlobHandle,
+    count_obj,
+    create_stats_table,
+    create_stats_trigger,
+    create_stats_update_trigger,
+    insert_stats,
+)
+from scripts.clutter_schema import connect_read_only
+
+"""
+Run a maintenance job over every row of a clutter database, for backfilling derived data (hashes, geometry
+statistics and so on) into existing libraries.
+
+Row ids are read a page at a time and handed to a process pool in small chunks. Each worker opens its own
+read only connection and reads the blobs it needs itself, so only ids and results cross the process
+boundary. Results come back in id order and are written by this process in batched transactions, along
+with a checkpoint of the last id written, so an interrupted job carries on from where it stopped next time.
+Once a job has finished the next run starts a new pass from the first row, results are dropped by triggers
+when a mesh is rewritten in place so the new pass only does those rows and the new ones.
+Progress and throughput are logged after each batch.
+
+A new job subclasses Job and is added to JOBS, see HashJob and StatsJob.
+"""
+
+PAGE_SIZE = 1024
+
+create_checkpoint_table = """CREATE TABLE IF NOT EXISTS JobCheckpoints (
+job TEXT PRIMARY KEY,
+last_id INTEGER NOT NULL,
+rows_done INTEGER NOT NULL,
+updated_at REAL NOT NULL,
+finished_at REAL
+);"""
+
+update_checkpoint = """INSERT INTO JobCheckpoints (job, last_id, rows_done, updated_at) VALUES (?, ?, ?, ?)
+ON CONFLICT(job) DO UPDATE SET last_id=excluded.last_id, rows_done=rows_done + excluded.rows_done,
+updated_at=excluded.updated_at, finished_at=NULL"""
+
+create_hashes_table = """CREATE TABLE IF NOT EXISTS MeshHashes (
+mesh_id INTEGER PRIMARY KEY,
+sha1 TEXT NOT NULL,
+size INTEGER NOT NULL
+);"""
+
+create_hashes_trigger = """CREATE TRIGGER IF NOT EXISTS MeshHashes_delete AFTER DELETE ON Meshes
+BEGIN
+DELETE FROM MeshHashes WHERE mesh_id = OLD.id;
+END;"""
+
+# evicting a mesh (meshCodec.py encode --evict) empties mesh_data without changing the mesh, so keeps the hash
+create_hashes_update_trigger = """CREATE TRIGGER IF NOT EXISTS MeshHashes_update AFTER UPDATE OF mesh_data ON Meshes
+WHEN length(NEW.mesh_data) > 0
+BEGIN
+DELETE FROM MeshHashes WHERE mesh_id = OLD.id;
+END;"""
+
+insert_hash = "INSERT OR REPLACE INTO MeshHashes (mesh_id, sha1, size) VALUES (?, ?, ?)"
+
+
+class Job:
+    """A unit of maintenance work done to each row of Meshes.
+    pending, setup and write run in the main process, work runs in the pool so the job must be picklable."""
+
+    name = ""
+    description = ""
+    # the rows still to do, in id order, with a ? for the last id already done
+    pending = "SELECT id FROM Meshes WHERE id > ? ORDER BY id"
+
+    def setup(self, connection: sqlite3.Connection) -> None:
+        """Create the tables the job writes to"""
+
+    def work(self, connection: sqlite3.Connection, mesh_id: int) -> Optional[Tuple[Any, int]]:
+        """Do the work for one row in a worker, returns the result and the number of bytes read,
+        or None if there is nothing to write
+        Parameters :
+            connection : sqlite3.Connection
+                the worker's read only connection
+            mesh_id : int
+                the row to process
+        """
+        raise NotImplementedError
+
+    @staticmethod
+    def mesh(connection: sqlite3.Connection, mesh_id: int) -> Optional[BlobHandle]:
+        """The mesh_data of a row, None if the row has been deleted since its id was read"""
+        row = connection.execute("SELECT length(mesh_data) FROM Meshes WHERE id=?", (mesh_id,)).fetchone()
+        return None if row is None else BlobHandle(connection, mesh_id, "mesh_data", row[0])
+
+    def write(self, connection: sqlite3.Connection, mesh_id: int, result: Any) -> None:
+        """Store the result of work, called inside the batch transaction"""
+        raise NotImplementedError
+
+
+class HashJob(Job):
+    """sha1 and size of every mesh, for finding duplicates and checking copies"""
+
+    name = "hash"
+    description = "sha1 of every mesh into MeshHashes"
+    pending = """SELECT id FROM Meshes WHERE id > ? AND length(mesh_data) > 0
+    AND id NOT IN (SELECT mesh_id FROM MeshHashes) ORDER BY id"""
+
+    def setup(self, connection: sqlite3.Connection) -> None:
+        connection.execute(create_hashes_table)
+        connection.execute(create_hashes_trigger)
+        connection.execute(create_hashes_update_trigger)
+
+    def work(self, connection: sqlite3.Connection, mesh_id: int) -> Optional[Tuple[Any, int]]:
+        handle = self.mesh(connection, mesh_id)
+        if handle is None:
+            return None
+        digest = hashlib.sha1()
+        for chunk in handle.chunks():
+            digest.update(chunk)
+        return (digest.hexdigest(), len(handle)), len(handle)
+
+    def write(self, connection: sqlite3.Connection, mesh_id: int, result: Any) -> None:
+        connection.execute(insert_hash, (mesh_id, *result))
+
+
+class StatsJob(Job):
+    """Vertex and face counts of every obj, the same as ClutterLibrary.update_stats but in parallel"""
+
+    name = "stats"
+    description = "vertex and face counts of every obj into MeshStats"
+    pending = """SELECT id FROM Meshes WHERE id > ? AND mesh_type = 'obj' AND length(mesh_data) > 0
+    AND id NOT IN (SELECT mesh_id FROM MeshStats) ORDER BY id"""
+
+    def setup(self, connection: sqlite3.Connection) -> None:
+        connection.execute(create_stats_table)
+        connection.execute(create_stats_trigger)
+        connection.execute(create_stats_update_trigger)
+
+    def work(self, connection: sqlite3.Connection, mesh_id: int) -> Optional[Tuple[Any, int]]:
+        handle = self.mesh(connection, mesh_id)
+        if handle is None:
+            return None
+        return count_obj(handle.chunks()), len(handle)
+
+    def write(self, connection: sqlite3.Connection, mesh_id: int, result: Any) -> None:
+        connection.execute(insert_stats, (mesh_id, *result))
+
+
+JOBS: Dict[str, Job] = {job.name: job for job in (HashJob(), StatsJob())}
+
+# each worker process keeps its connection open between chunks
+_worker_connection: Optional[Tuple[str, sqlite3.Connection]] = None
+
+
+def _run_chunk(database: str, job: Job, ids: List[int]) -> List[Tuple[int, Any, int]]:
+    """Process pool worker, returns (id, result, bytes read) for each id the job has a result for"""
+    global _worker_connection
+    if _worker_connection is None or _worker_connection[0] != database:
+        _worker_connection = (database, connect_read_only(database, timeout=30))
+    connection = _worker_connection[1]
+    results = []
+    for mesh_id in ids:
+        done = job.work(connection, mesh_id)
+        if done is not None:
+            results.append((mesh_id, *done))
+    return results
+
+
+def _pages(connection: sqlite3.Connection, job: Job, last_id: int) -> Iterator[List[int]]:
+    """The pending ids a page at a time, each page is a finished query so no read lock is held between pages"""
+    while True:
+        page = [row[0] for row in connection.execute(f"{job.pending} LIMIT {PAGE_SIZE}", (last_id,))]
+        if not page:
+            return
+        yield page
+        last_id = page[-1]
+
+
+@dataclass
+class JobReport:
+    """What a run of a job did"""
+
+    job: str
+    rows: int
+    bytes_read: int
+    seconds: float
+
+    def __str__(self) -> str:
+        rate = self.rows / self.seconds if self.seconds else 0.0
+        throughput = self.bytes_read / self.seconds / 1e6 if self.seconds else 0.0
+        return f"{self.job}: {self.rows} rows in {self.seconds:.1f}s, {rate:.1f} rows/s, {throughput:.1f} MB/s read"
+
+
+def run_job(
+    database: str,
+    job: Job,
+    workers: Optional[int] = None,
+    batch_size: int = 256,
+    chunk_size: int = 8,
+    restart: bool = False,
+) -> JobReport:
+    """Run a job over a database, resuming from its checkpoint
+    Parameters :
+        database : str
+            name of database
+        job : Job
+            the job to run
+        workers : int
+            number of worker processes, defaults to the number of cores
+        batch_size : int
+            rows written per transaction, the checkpoint moves on after each one
+        chunk_size : int
+            ids sent to a worker at a time
+        restart : bool
+            ignore the checkpoint and start from the first row, a finished job always starts a new pass
+    """
+    with closing(sqlite3.connect(database, timeout=30)) as connection:
+        job.setup(connection)
+        connection.execute(create_checkpoint_table)
+        finished = connection.execute("SELECT finished_at FROM JobCheckpoints WHERE job=?", (job.name,)).fetchone()
+        if restart or (finished is not None and finished[0] is not None):
+            connection.execute("DELETE FROM JobCheckpoints WHERE job=?", (job.name,))
+        connection.commit()
+        row = connection.execute("SELECT last_id FROM JobCheckpoints WHERE job=?", (job.name,)).fetchone()
+        last_id = row[0] if row else 0
+        total = connection.execute(f"SELECT count(*) FROM ({job.pending})", (last_id,)).fetchone()[0]
+        logging.info(f"{job.name}: {total} rows to do" + (f", resuming after id {last_id}" if last_id else ""))
+
+        start = time.perf_counter()
+        done = bytes_read = written = 0
+        pending: Deque[Tuple[Future, int]] = deque()
+
+        def commit(checkpoint_id: int) -> None:
+            nonlocal written
+            connection.execute(update_checkpoint, (job.name, checkpoint_id, written, time.time()))
+            connection.commit()
+            written = 0
+            elapsed = time.perf_counter() - start
+            logging.info(
+                f"{job.name}: {done}/{total} rows, {done / elapsed:.1f} rows/s, {bytes_read / elapsed / 1e6:.1f} MB/s"
+            )
+
+        def collect() -> None:
+            # results are taken in submission order so the checkpoint only covers rows that are written
+            nonlocal done, bytes_read, written
+            future, chunk_last_id = pending.popleft()
+            results = future.result()
+            for mesh_id, result, read in results:
+                job.write(connection, mesh_id, result)
+                bytes_read += read
+                written += 1
+            done += len(results)
+            if written >= batch_size:
+                commit(chunk_last_id)
+
+        checkpoint_id = last_id
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            window = 4 * (workers or os.cpu_count() or 1)
+            for page in _pages(connection, job, last_id):
+                for offset in range(0, len(page), chunk_size):
+                    chunk = page[offset : offset + chunk_size]
+                    pending.append((pool.submit(_run_chunk, database, job, chunk), chunk[-1]))
+                    checkpoint_id = chunk[-1]
+                    while len(pending) >= window:
+                        collect()
+            while pending:
+                collect()
+        connection.execute(update_checkpoint, (job.name, checkpoint_id, written, time.time()))
+        connection.execute("UPDATE JobCheckpoints SET finished_at=? WHERE job=?", (time.time(), job.name))
+        connection.commit()
+    return JobReport(job.name, done, bytes_read, time.perf_counter() - start)
+
+
+def checkpoints(database: str) -> List[Tuple[str, int, int, float, Optional[float]]]:
+    """(job, last id, rows done, updated at, finished at) for every job that has been run on a database"""
+    with closing(connect_read_only(database)) as connection:
+        table = connection.execute("SELECT name FROM sqlite_master WHERE name='JobCheckpoints'").fetchone()
+        if table is None:
+            return []
+        return connection.execute("SELECT * FROM JobCheckpoints ORDER BY job").fetchall()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="run maintenance jobs over every row of a clutter database")
+    parser.add_argument("--database", "-db", help="Which DB to connect too", required=True)
+    parser.add_argument("--workers", "-w", help="Number of worker processes", type=int)
+    parser.add_argument("--batch-size", "-b", help="Rows per transaction", type=int, default=256)
+    parser.add_argument("--restart", "-r", help="Ignore the checkpoints and start again", action="store_true")
+    parser.add_argument("--list", "-l", help="List the jobs and their checkpoints", action="store_true")
+    parser.add_argument("jobs", nargs="*", help=f"Jobs to run, from {', '.join(JOBS)}")
+    args = parser.parse_args()
+    for name in args.jobs:
+        if name not in JOBS:
+            parser.error(f"unknown job {name}, choose from {', '.join(JOBS)}")
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    if args.list or not args.jobs:
+        for name, job in JOBS.items():
+            print(f"{name:<8}{job.description}")
+        for name, last_id, rows, updated_at, finished_at in checkpoints(args.database):
+            state = f"finished {time.ctime(finished_at)}" if finished_at else f"stopped {time.ctime(updated_at)}"
+            print(f"{name}: {rows} rows up to id {last_id}, {state}")
+    for name in args.jobs:
+        print(run_job(args.database, JOBS[name], args.workers, args.batch_size, restart=args.restart))
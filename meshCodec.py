@@ -0,0 +1,625 @@
+#!/usr/bin/env -S uv run --script
+
+import argparse
+import lzma
+import sqlite3
+import struct
+import sys
+import time
+import zlib
+from contextlib import closing
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from objMesh import ObjArrays, parse_obj, write_obj
+from scripts.clutter_schema import connect_read_only
+
+"""
+A compact lossy encoding of obj meshes for archiving dense scanned clutter, typically a fraction of the size
+of the zlib compressed obj text.
+
+The obj is parsed into arrays and
+    * positions, uvs and normals are quantized to a fixed number of bits over their bounding box, so the
+      largest error on each axis is half a quantization step (see ErrorBounds, stored with every encoding)
+    * vertices are put in Morton (z curve) order and the triangles sorted so that neighbouring triangles
+      share vertices, then every index stream is renumbered in order of first use. This gives the
+      locality a vertex cache optimizer aims for with a few linear NumPy passes.
+    * indices are written relative to the highest index used so far (a new vertex is 0, recently used ones
+      are small), attributes as deltas along the vertex order, all zigzag coded
+    * the streams are byte shuffled (all the low bytes, then the next...) and compressed with lzma or zlib
+Only v, vt, vn and f are kept, polygons are triangulated and the vertex order changes, so decoding gives
+an equivalent obj rather than the same file.
+
+Encoded meshes are stored in the EncodedMeshes table against their Meshes row, whose mesh_type stays obj
+as that is what they decode back to on export. Rewriting a row's mesh_data drops its encoding as it no
+longer matches. By default the original obj is kept as well, encode --evict archives the meshes instead:
+mesh_data is emptied (and the space given back to the file system) so the encoding is the only copy, and
+restore decodes it back into mesh_data. An evicted mesh keeps its stats, hash, screenshots and facets,
+the maintenance tools (renderViews.py, jobRunner.py, normalizeMesh.py) skip it, and the readers
+(clutterLibrary.py, queryDB.py, meshVersions.py, the GUI) decode it with read_mesh. Run with benchmark to
+see bytes per triangle and decode throughput for the meshes in a database.
+"""
+
+MAGIC = b"CLUTMSH\0"
+VERSION = 1
+COMPRESSORS = {"lzma": 0, "zlib": 1}
+# raw lzma2 without the xz container, whose headers would be most of the size of a small prop
+LZMA_FILTERS = [{"id": lzma.FILTER_LZMA2, "preset": 9}]
+# version, position/uv/normal bits, compressor, index flags, vertex/uv/normal/triangle counts, bounds
+HEADER = struct.Struct("<8sHBBBBB3x4Q3d3d2d2d")
+# byte width and length of each stream in the payload
+STREAMS = struct.Struct("<6B2x6Q")
+NO_INDEX, ALL_INDEXED, SOME_INDEXED = 0, 1, 2
+MORTON_MASKS = (
+    (32, 0x1F00000000FFFF),
+    (16, 0x1F0000FF0000FF),
+    (8, 0x100F00F00F00F00F),
+    (4, 0x10C30C30C30C30C3),
+    (2, 0x1249249249249249),
+)
+
+create_encoded_table = """CREATE TABLE IF NOT EXISTS EncodedMeshes (
+mesh_id INTEGER PRIMARY KEY,
+mesh_type TEXT NOT NULL DEFAULT 'obj',
+position_bits INTEGER NOT NULL,
+uv_bits INTEGER NOT NULL,
+normal_bits INTEGER NOT NULL,
+position_error REAL NOT NULL,
+uv_error REAL NOT NULL,
+normal_error REAL NOT NULL,
+size INTEGER NOT NULL,
+data BLOB NOT NULL
+);"""
+
+create_encoded_trigger = """CREATE TRIGGER IF NOT EXISTS EncodedMeshes_delete AFTER DELETE ON Meshes
+BEGIN
+DELETE FROM EncodedMeshes WHERE mesh_id = OLD.id;
+END;"""
+
+# a new mesh makes the encoding stale, emptying mesh_data is how encode --evict archives a mesh so keeps it
+create_encoded_update_trigger = """CREATE TRIGGER IF NOT EXISTS EncodedMeshes_update AFTER UPDATE OF mesh_data ON Meshes
+WHEN length(NEW.mesh_data) > 0
+BEGIN
+DELETE FROM EncodedMeshes WHERE mesh_id = OLD.id;
+END;"""
+
+select_mesh = """SELECT mesh_data FROM Meshes WHERE id=?"""
+evict_mesh = """UPDATE Meshes SET mesh_data=zeroblob(0) WHERE id=?"""
+select_encoded = """SELECT data FROM EncodedMeshes WHERE mesh_id=?"""
+insert_encoded = """INSERT OR REPLACE INTO EncodedMeshes
+(mesh_id, mesh_type, position_bits, uv_bits, normal_bits, position_error, uv_error, normal_error, size, data)
+VALUES (?, 'obj', ?, ?, ?, ?, ?, ?, ?, ?)"""
+
+
+@dataclass
+class ErrorBounds:
+    """The largest difference between an original and decoded value on any axis, from quantization and from
+    the digits written to the obj text"""
+
+    position: float
+    uv: float
+    normal: float
+
+    def as_row(self) -> Tuple[float, float, float]:
+        return (self.position, self.uv, self.normal)
+
+
+def _quantize(values: np.ndarray, bits: int, low: np.ndarray, high: np.ndarray) -> np.ndarray:
+    steps = (1 << bits) - 1
+    extent = np.where(high > low, high - low, 1.0)
+    return np.rint((values - low) / extent * steps).astype(np.int64)
+
+
+def _dequantize(values: np.ndarray, bits: int, low: np.ndarray, high: np.ndarray) -> np.ndarray:
+    steps = (1 << bits) - 1
+    extent = np.where(high > low, high - low, 1.0)
+    return low + values.astype(np.float64) * (extent / steps)
+
+
+def _step_error(bits: int, low: np.ndarray, high: np.ndarray) -> float:
+    if len(low) == 0:
+        return 0.0
+    return float((high - low).max()) / ((1 << bits) - 1) / 2.0
+
+
+def _spread_bits(values: np.ndarray) -> np.ndarray:
+    """Put two zero bits between each of the low 21 bits, for Morton codes"""
+    values = values.astype(np.uint64) & np.uint64(0x1FFFFF)
+    for shift, mask in MORTON_MASKS:
+        values = (values | (values << np.uint64(shift))) & np.uint64(mask)
+    return values
+
+
+def _morton(quantized: np.ndarray) -> np.ndarray:
+    x, y, z = (_spread_bits(quantized[:, axis]) for axis in range(3))
+    return x | (y << np.uint64(1)) | (z << np.uint64(2))
+
+
+def _first_use(indices: np.ndarray, count: int) -> np.ndarray:
+    """The new number for each of count items so they are numbered in order of first use in indices,
+    unused items go at the end. -1 entries (no index) are ignored."""
+    used = indices[indices >= 0]
+    _, first = np.unique(used, return_index=True)
+    order = used[np.sort(first)]
+    unused = np.setdiff1d(np.arange(count), order, assume_unique=True)
+    remap = np.empty(count, dtype=np.int64)
+    remap[np.concatenate([order, unused]).astype(np.int64)] = np.arange(count)
+    return remap
+
+
+def _zigzag(values: np.ndarray) -> np.ndarray:
+    return ((values << 1) ^ (values >> 63)).astype(np.uint32)
+
+
+def _unzigzag(values: np.ndarray) -> np.ndarray:
+    values = values.astype(np.int64)
+    return (values >> 1) ^ -(values & 1)
+
+
+def _shuffle(values: np.ndarray) -> Tuple[int, bytes]:
+    """Byte planes (all the low bytes, then the next...) of a uint32 array stored in as few bytes as fit"""
+    width = 1 if len(values) == 0 or values.max() < 1 << 8 else 2 if values.max() < 1 << 16 else 4
+    data = values.astype(f"<u{width}").view(np.uint8).reshape(-1, width)
+    return width, np.ascontiguousarray(data.T).tobytes()
+
+
+def _unshuffle(data: bytes, width: int) -> np.ndarray:
+    planes = np.frombuffer(data, dtype=np.uint8).reshape(width, -1)
+    return np.ascontiguousarray(planes.T).view(f"<u{width}").ravel().astype(np.uint32)
+
+
+def _encode_indices(indices: np.ndarray) -> np.ndarray:
+    """Each index as its distance below the next unused index, so a vertex used for the first time is 0
+    (streams are numbered in order of first use) and -1 (no index) is that distance plus one"""
+    flat = indices.ravel()
+    if len(flat) == 0:
+        return flat.astype(np.uint32)
+    high_water = np.concatenate(([0], np.maximum(np.maximum.accumulate(flat)[:-1] + 1, 0)))
+    return (high_water - flat).astype(np.uint32)
+
+
+def _decode_indices(values: np.ndarray) -> np.ndarray:
+    values = values.astype(np.int64)
+    # with first use numbering the next unused index is the number of first uses so far
+    high_water = np.concatenate(([0], np.cumsum(values == 0)[:-1])) if len(values) else values
+    return high_water - values
+
+
+def _delta(values: np.ndarray) -> np.ndarray:
+    """Zigzag coded differences along the vertex order, one axis after another"""
+    return _zigzag(np.diff(values, axis=0, prepend=np.zeros((1, values.shape[1]), dtype=np.int64)).T.ravel())
+
+
+def _undelta(values: np.ndarray, width: int) -> np.ndarray:
+    return np.cumsum(_unzigzag(values).reshape(width, -1), axis=1).T
+
+
+def _bounds(values: np.ndarray, width: int) -> Tuple[np.ndarray, np.ndarray]:
+    if len(values) == 0:
+        return np.zeros(width), np.zeros(width)
+    return values.min(axis=0), values.max(axis=0)
+
+
+def _index_flag(indices: np.ndarray) -> int:
+    if len(indices) == 0 or (indices < 0).all():
+        return NO_INDEX
+    return ALL_INDEXED if (indices >= 0).all() else SOME_INDEXED
+
+
+def _renumber(indices: np.ndarray, count: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Number an index stream in order of first use, returns the new indices and the new number of each item"""
+    remap = _first_use(indices, count)
+    if count == 0:
+        return np.full_like(indices, -1), remap
+    return np.where(indices >= 0, remap[np.maximum(indices, 0)], -1), remap
+
+
+def _encode(
+    arrays: ObjArrays, position_bits: int, uv_bits: int, normal_bits: int, compression: str
+) -> Tuple[bytes, np.ndarray]:
+    """Encode arrays, returns the encoding and the new number of every original vertex"""
+    for bits in (position_bits, uv_bits, normal_bits):
+        if not 1 <= bits <= 21:
+            raise ValueError("quantization bits must be between 1 and 21")
+    if compression not in COMPRESSORS:
+        raise ValueError(f"unknown compression {compression}, use one of {', '.join(COMPRESSORS)}")
+    position_low, position_high = _bounds(arrays.positions, 3)
+    uv_low, uv_high = _bounds(arrays.texcoords, 2)
+    normal_low, normal_high = _bounds(arrays.normals, 3)
+    positions = _quantize(arrays.positions, position_bits, position_low, position_high)
+
+    # spatial order, then each triangle starts at its lowest vertex (keeping the winding) and the
+    # triangles are sorted so that neighbours come together
+    spatial = np.empty(len(positions), dtype=np.int64)
+    spatial[np.argsort(_morton(positions), kind="stable")] = np.arange(len(positions))
+    triangles = spatial[arrays.triangles] if len(arrays.triangles) else arrays.triangles.reshape(-1, 3)
+    rotation = (triangles.argmin(axis=1)[:, None] + np.arange(3)) % 3 if len(triangles) else np.zeros((0, 3), int)
+    corner_streams = [
+        np.take_along_axis(stream, rotation, axis=1)
+        for stream in (triangles, arrays.triangle_uvs, arrays.triangle_normals)
+    ]
+    order = np.lexsort((corner_streams[0][:, 1], corner_streams[0][:, 0]))
+    triangles, triangle_uvs, triangle_normals = (stream[order] for stream in corner_streams)
+
+    triangles, vertex_remap = _renumber(triangles, len(positions))
+    vertex_order = vertex_remap[spatial]
+    ordered_positions = np.empty_like(positions)
+    ordered_positions[vertex_order] = positions
+    triangle_uvs, uv_remap = _renumber(triangle_uvs, len(arrays.texcoords))
+    uvs = np.empty((len(arrays.texcoords), 2), dtype=np.int64)
+    uvs[uv_remap] = _quantize(arrays.texcoords, uv_bits, uv_low, uv_high)
+    triangle_normals, normal_remap = _renumber(triangle_normals, len(arrays.normals))
+    normals = np.empty((len(arrays.normals), 3), dtype=np.int64)
+    normals[normal_remap] = _quantize(arrays.normals, normal_bits, normal_low, normal_high)
+
+    uv_flag, normal_flag = _index_flag(triangle_uvs), _index_flag(triangle_normals)
+    streams = [
+        _delta(ordered_positions),
+        _encode_indices(triangles),
+        _delta(uvs),
+        _encode_indices(triangle_uvs) if uv_flag != NO_INDEX else np.zeros(0, np.uint32),
+        _delta(normals),
+        _encode_indices(triangle_normals) if normal_flag != NO_INDEX else np.zeros(0, np.uint32),
+    ]
+    widths, shuffled = zip(*(_shuffle(stream) for stream in streams))
+    payload = STREAMS.pack(*widths, *(len(stream) for stream in shuffled)) + b"".join(shuffled)
+    if compression == "lzma":
+        payload = lzma.compress(payload, format=lzma.FORMAT_RAW, filters=LZMA_FILTERS)
+    else:
+        payload = zlib.compress(payload, 9)
+    header = HEADER.pack(
+        MAGIC,
+        VERSION,
+        position_bits,
+        uv_bits,
+        normal_bits,
+        COMPRESSORS[compression],
+        uv_flag | normal_flag << 4,
+        len(positions),
+        len(uvs),
+        len(normals),
+        len(triangles),
+        *position_low,
+        *position_high,
+        *uv_low,
+        *uv_high,
+    )
+    normal_bounds = struct.pack("<3d3d", *normal_low, *normal_high)
+    return header + normal_bounds + payload, vertex_order
+
+
+def encode_mesh(
+    arrays: ObjArrays, position_bits: int = 14, uv_bits: int = 12, normal_bits: int = 10, compression: str = "lzma"
+) -> bytes:
+    """Encode parsed obj geometry
+    Parameters :
+        arrays : ObjArrays
+            result of objMesh.parse_obj
+        position_bits : int
+            bits per position axis, the error is half of the largest side of the bounding box / (2^bits - 1)
+        uv_bits : int
+            bits per uv axis
+        normal_bits : int
+            bits per normal axis
+        compression : str
+            lzma (smaller) or zlib (faster)
+    """
+    return _encode(arrays, position_bits, uv_bits, normal_bits, compression)[0]
+
+
+def _read_header(data: bytes) -> Tuple:
+    if len(data) < HEADER.size + 48 or data[: len(MAGIC)] != MAGIC:
+        raise ValueError("not an encoded mesh")
+    fields = HEADER.unpack_from(data)
+    if fields[1] != VERSION:
+        raise ValueError(f"unsupported encoded mesh version {fields[1]}")
+    normal_bounds = struct.unpack_from("<3d3d", data, HEADER.size)
+    return fields + normal_bounds
+
+
+def error_bounds(data: bytes, digits: int = 6) -> ErrorBounds:
+    """The largest error on any axis of the positions, uvs and normals of an encoded mesh once decoded to obj
+    Parameters :
+        data : bytes
+            an encoded mesh
+        digits : int
+            the decimal places the obj will be written with
+    """
+    fields = _read_header(data)
+    _, _, position_bits, uv_bits, normal_bits = fields[:5]
+    position_low, position_high = np.array(fields[11:14]), np.array(fields[14:17])
+    uv_low, uv_high = np.array(fields[17:19]), np.array(fields[19:21])
+    normal_low, normal_high = np.array(fields[21:24]), np.array(fields[24:27])
+    rounding = 0.5 * 10.0**-digits
+    return ErrorBounds(
+        _step_error(position_bits, position_low, position_high) + rounding,
+        _step_error(uv_bits, uv_low, uv_high) + rounding,
+        _step_error(normal_bits, normal_low, normal_high) + rounding,
+    )
+
+
+def decode_mesh(data: bytes) -> ObjArrays:
+    """Decode an encoded mesh back to arrays
+    Parameters :
+        data : bytes
+            result of encode_mesh
+    """
+    fields = _read_header(data)
+    _, _, position_bits, uv_bits, normal_bits, compressor, flags = fields[:7]
+    vertex_count, uv_count, normal_count, triangle_count = fields[7:11]
+    payload = data[HEADER.size + 48 :]
+    if compressor == COMPRESSORS["lzma"]:
+        payload = lzma.decompress(payload, format=lzma.FORMAT_RAW, filters=LZMA_FILTERS)
+    else:
+        payload = zlib.decompress(payload)
+    layout = STREAMS.unpack_from(payload)
+    widths, sizes = layout[:6], layout[6:]
+    offsets = np.cumsum((STREAMS.size,) + sizes).tolist()
+    streams = [_unshuffle(payload[start:end], width) for width, start, end in zip(widths, offsets[:-1], offsets[1:])]
+
+    def indices(stream: np.ndarray, flag: int) -> np.ndarray:
+        if flag == NO_INDEX:
+            return np.full((triangle_count, 3), -1, dtype=np.int64)
+        return _decode_indices(stream).reshape(-1, 3)
+
+    return ObjArrays(
+        _dequantize(_undelta(streams[0], 3), position_bits, np.array(fields[11:14]), np.array(fields[14:17])),
+        _dequantize(_undelta(streams[2], 2), uv_bits, np.array(fields[17:19]), np.array(fields[19:21])),
+        _dequantize(_undelta(streams[4], 3), normal_bits, np.array(fields[21:24]), np.array(fields[24:27])),
+        indices(streams[1], ALL_INDEXED),
+        indices(streams[3], flags & 0xF),
+        indices(streams[5], flags >> 4),
+    )
+
+
+def encode_obj(data: bytes, **options) -> bytes:
+    """Parse and encode obj text, see encode_mesh for the options"""
+    return encode_mesh(parse_obj(data), **options)
+
+
+def decode_obj(data: bytes, digits: int = 6) -> bytes:
+    """Decode an encoded mesh to obj text, the values are within error_bounds(data, digits) of the original"""
+    return write_obj(decode_mesh(data), digits)
+
+
+def read_mesh(connection: sqlite3.Connection, mesh_id: int) -> Optional[bytes]:
+    """The obj of an asset, decoded from EncodedMeshes if encode --evict has emptied its mesh_data.
+    None if there is no such asset.
+    Parameters :
+        connection : sqlite3.Connection
+            The open database
+        mesh_id : int
+            id of the asset
+    """
+    row = connection.execute(select_mesh, (mesh_id,)).fetchone()
+    if row is None:
+        return None
+    if len(row[0]) or not is_evicted(connection, mesh_id):
+        return bytes(row[0])
+    (blob,) = connection.execute(select_encoded, (mesh_id,)).fetchone()
+    return decode_obj(bytes(blob))
+
+
+def is_evicted(connection: sqlite3.Connection, mesh_id: int) -> bool:
+    """Whether an asset's mesh_data has been emptied by encode --evict, so the encoding is the only copy"""
+    if connection.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='EncodedMeshes'").fetchone() is None:
+        return False
+    query = """SELECT 1 FROM Meshes JOIN EncodedMeshes ON EncodedMeshes.mesh_id = Meshes.id
+    WHERE Meshes.id=? AND length(Meshes.mesh_data) = 0"""
+    return connection.execute(query, (mesh_id,)).fetchone() is not None
+
+
+def ensure_encoded_table(connection: sqlite3.Connection) -> None:
+    connection.execute(create_encoded_table)
+    connection.execute(create_encoded_trigger)
+    connection.execute(create_encoded_update_trigger)
+
+
+def encode_database(database: str, batch_size: int = 16, evict: bool = False, **options) -> Tuple[int, int, int]:
+    """Store an encoded variant of every obj mesh in the EncodedMeshes table.
+    Returns the number of meshes encoded, their obj size and their encoded size.
+    Parameters :
+        database : str
+            the database to update
+        batch_size : int
+            meshes encoded per transaction
+        evict : bool
+            empty mesh_data once a mesh is encoded so the database shrinks, restore_database puts it back
+        options :
+            passed on to encode_mesh
+    """
+    encoded = obj_bytes = encoded_bytes = 0
+    with closing(sqlite3.connect(database)) as connection:
+        ensure_encoded_table(connection)
+        # evicted meshes are already archived
+        query = "SELECT id FROM Meshes WHERE mesh_type='obj' AND length(mesh_data) > 0 ORDER BY id"
+        ids = [row[0] for row in connection.execute(query)]
+        for start in range(0, len(ids), batch_size):
+            with connection:
+                for mesh_id in ids[start : start + batch_size]:
+                    data = bytes(connection.execute(select_mesh, (mesh_id,)).fetchone()[0])
+                    try:
+                        blob = encode_obj(data, **options)
+                    except ValueError as e:
+                        print(f"could not encode mesh {mesh_id}: {e}", file=sys.stderr)
+                        continue
+                    fields = _read_header(blob)
+                    bounds = error_bounds(blob)
+                    row = (mesh_id, *fields[2:5], *bounds.as_row(), len(data), blob)
+                    connection.execute(insert_encoded, row)
+                    if evict:
+                        connection.execute(evict_mesh, (mesh_id,))
+                    encoded += 1
+                    obj_bytes += len(data)
+                    encoded_bytes += len(blob)
+        if evict:
+            # a no-op unless the database uses auto_vacuum=INCREMENTAL, as new clutter databases do
+            connection.executescript("PRAGMA incremental_vacuum;")
+    return encoded, obj_bytes, encoded_bytes
+
+
+def restore_database(database: str, batch_size: int = 16) -> int:
+    """Decode the meshes emptied by encode_database(evict=True) back into mesh_data, returns the number restored.
+    The values are within the stored error bounds of the originals, the encoding is dropped once restored.
+    Parameters :
+        database : str
+            the database to update
+        batch_size : int
+            meshes decoded per transaction
+    """
+    restored = 0
+    with closing(sqlite3.connect(database)) as connection:
+        ensure_encoded_table(connection)
+        query = """SELECT mesh_id FROM EncodedMeshes JOIN Meshes ON Meshes.id = mesh_id
+        WHERE length(mesh_data) = 0 ORDER BY mesh_id"""
+        ids = [row[0] for row in connection.execute(query)]
+        for start in range(0, len(ids), batch_size):
+            with connection:
+                for mesh_id in ids[start : start + batch_size]:
+                    (blob,) = connection.execute(select_encoded, (mesh_id,)).fetchone()
+                    data = decode_obj(bytes(blob))
+                    connection.execute("UPDATE Meshes SET mesh_data=? WHERE id=?", (data, mesh_id))
+                    restored += 1
+    return restored
+
+
+def export_obj(database: str, mesh_id: int, output: str) -> ErrorBounds:
+    """Decode the encoded variant of a mesh to an obj file, returns its error bounds
+    Parameters :
+        database : str
+            the database
+        mesh_id : int
+            id of the mesh in Meshes
+        output : str
+            the obj to write
+    """
+    with closing(connect_read_only(database)) as connection:
+        row = connection.execute(select_encoded, (mesh_id,)).fetchone()
+    if row is None:
+        raise KeyError(f"mesh {mesh_id} has not been encoded")
+    Path(output).write_bytes(decode_obj(bytes(row[0])))
+    return error_bounds(bytes(row[0]))
+
+
+def benchmark(meshes: List[Tuple[str, bytes]], repeats: int = 3, **options) -> None:
+    """Report the size of each mesh as obj, zlib compressed obj and encoded, how fast it decodes and the
+    largest position error measured against the bound
+    Parameters :
+        meshes : List[Tuple[str, bytes]]
+            name and obj text of each mesh
+        repeats : int
+            decodes timed per mesh, the fastest is used
+        options :
+            passed on to encode_mesh
+    """
+    print(
+        f"{'mesh':<24}{'tris':>9}{'obj B/tri':>11}{'zlib B/tri':>11}{'enc B/tri':>11}{'Mtri/s':>9}"
+        f"{'obj MB/s':>10}{'err/bound':>11}"
+    )
+    totals = np.zeros(4)
+    for name, data in meshes:
+        arrays = parse_obj(data)
+        if arrays.face_count == 0:
+            continue
+        blob, vertex_order = _encode(
+            arrays,
+            options.get("position_bits", 14),
+            options.get("uv_bits", 12),
+            options.get("normal_bits", 10),
+            options.get("compression", "lzma"),
+        )
+        decode_time = obj_time = float("inf")
+        for _ in range(repeats):
+            start = time.perf_counter()
+            decoded = decode_mesh(blob)
+            decode_time = min(decode_time, time.perf_counter() - start)
+            start = time.perf_counter()
+            obj = write_obj(decoded)
+            obj_time = min(obj_time, time.perf_counter() - start)
+        # decoding to obj text is both steps
+        obj_time += decode_time
+        error = np.abs(decoded.positions[vertex_order] - arrays.positions).max() if len(arrays.positions) else 0.0
+        # the arrays haven't been through write_obj so only the quantization part of the bound applies
+        bound = error_bounds(blob, digits=6).position - 0.5e-6
+        triangles = arrays.face_count
+        compressed = len(zlib.compress(data, 9))
+        totals += (triangles, len(data), compressed, len(blob))
+        print(
+            f"{name[:23]:<24}{triangles:>9}{len(data) / triangles:>11.1f}{compressed / triangles:>11.1f}"
+            f"{len(blob) / triangles:>11.2f}{triangles / decode_time / 1e6:>9.2f}{len(obj) / obj_time / 1e6:>10.1f}"
+            f"{error / bound if bound else 0.0:>11.3f}"
+        )
+    if totals[0]:
+        triangles = totals[0]
+        print(
+            f"{'total':<24}{int(triangles):>9}{totals[1] / triangles:>11.1f}{totals[2] / triangles:>11.1f}"
+            f"{totals[3] / triangles:>11.2f}"
+        )
+
+
+def _sphere(rows: int, columns: int) -> bytes:
+    """A uv sphere standing in for a dense scan when there is no database to benchmark"""
+    theta, phi = np.meshgrid(np.linspace(0, np.pi, rows), np.linspace(0, 2 * np.pi, columns), indexing="ij")
+    rng = np.random.default_rng(42)
+    radius = 1.0 + rng.normal(0, 0.002, theta.shape)
+    positions = np.stack(
+        [radius * np.sin(theta) * np.cos(phi), radius * np.cos(theta), radius * np.sin(theta) * np.sin(phi)], -1
+    )
+    uvs = np.stack([phi / (2 * np.pi), theta / np.pi], -1).reshape(-1, 2)
+    grid = np.arange(rows * columns).reshape(rows, columns)
+    a, b, c, d = grid[:-1, :-1], grid[:-1, 1:], grid[1:, 1:], grid[1:, :-1]
+    triangles = np.concatenate([np.stack([a, b, c], -1).reshape(-1, 3), np.stack([a, c, d], -1).reshape(-1, 3)])
+    no_normals = np.full_like(triangles, -1)
+    arrays = ObjArrays(positions.reshape(-1, 3), uvs, np.zeros((0, 3)), triangles, triangles, no_normals)
+    return write_obj(arrays)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="quantized mesh encoding for archiving obj meshes")
+    parser.add_argument("--position-bits", "-p", help="Bits per position axis", type=int, default=14)
+    parser.add_argument("--uv-bits", "-u", help="Bits per uv axis", type=int, default=12)
+    parser.add_argument("--normal-bits", "-n", help="Bits per normal axis", type=int, default=10)
+    parser.add_argument("--compression", "-c", help="Entropy coder", choices=list(COMPRESSORS), default="lzma")
+    commands = parser.add_subparsers(dest="command", required=True)
+    encode = commands.add_parser("encode", help="store an encoded variant of every obj mesh in a database")
+    encode.add_argument("database")
+    encode.add_argument(
+        "--evict", "-e", help="Empty mesh_data once encoded so the database shrinks (see restore)", action="store_true"
+    )
+    restore = commands.add_parser("restore", help="decode evicted meshes back into mesh_data")
+    restore.add_argument("database")
+    export = commands.add_parser("export", help="decode a mesh's encoded variant to an obj file")
+    export.add_argument("database")
+    export.add_argument("id", type=int)
+    export.add_argument("output")
+    bench = commands.add_parser("benchmark", help="report bytes per triangle and decode throughput")
+    bench.add_argument("database", nargs="?", help="Benchmark the obj meshes in this database, else a synthetic scan")
+    args = parser.parse_args()
+    options = {
+        "position_bits": args.position_bits,
+        "uv_bits": args.uv_bits,
+        "normal_bits": args.normal_bits,
+        "compression": args.compression,
+    }
+
+    if args.command == "encode":
+        count, obj_bytes, encoded_bytes = encode_database(args.database, evict=args.evict, **options)
+        print(f"encoded {count} meshes, {obj_bytes / 1e6:.2f} MB of obj as {encoded_bytes / 1e6:.2f} MB")
+    elif args.command == "restore":
+        print(f"restored {restore_database(args.database)} meshes")
+    elif args.command == "export":
+        try:
+            bounds = export_obj(args.database, args.id, args.output)
+        except KeyError as e:
+            sys.exit(str(e))
+        errors = f"position {bounds.position:.3g} uv {bounds.uv:.3g} normal {bounds.normal:.3g}"
+        print(f"wrote {args.output}, max error {errors}")
+    elif args.database:
+        with closing(connect_read_only(args.database)) as connection:
+            rows = connection.execute("SELECT name, mesh_data FROM Meshes WHERE mesh_type='obj' ORDER BY id")
+            benchmark([(name, bytes(data)) for name, data in rows], **options)
+    else:
+        benchmark([("sphere 500x1000", _sphere(500, 1000))], **options)
@@ -0,0 +1,391 @@
+#!/usr/bin/env -S uv run --script
+
+import argparse
+import bisect
+import hashlib
+import sqlite3
+import struct
+import time
+import zlib
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+"""
+Version history for the meshes in a clutter database.
+
+Meshes.mesh_data always holds the latest version, so everything that reads the library (and every "latest
+version" query) works as before without reconstructing anything. The history lives in MeshVersions, one
+row per version. Most versions are stored as a zlib compressed line delta against the version before,
+a full compressed snapshot is stored every snapshot_interval versions (or when a delta wouldn't be much
+smaller) so rebuilding any version applies at most snapshot_interval - 1 deltas. If Meshes.mesh_data has
+been rewritten without going through add_version its contents are stored as a snapshot before the new
+version, so the history always ends with what was really there. For a mesh evicted by meshCodec.py encode
+--evict that is the decoded mesh, the encoding being the only copy.
+
+A delta is a list of operations that rebuild the new version from the lines of the old one
+    C start count : copy count lines of the old version starting at line start
+    I length data : insert length bytes of new data
+Lines are matched by a greedy hash lookup that prefers to carry on from the last copy, which is linear in
+the size of the mesh and works well for the way revisions of a prop change (vertices moved, faces added).
+
+Run with --benchmark to see the storage saved over a run of typical revisions.
+"""
+
+SNAPSHOT_INTERVAL = 8
+# a copy has to save at least this many bytes over inserting the lines again
+MIN_COPY_BYTES = 16
+COPY = struct.Struct("<cII")
+INSERT = struct.Struct("<cI")
+
+create_versions_table = """CREATE TABLE IF NOT EXISTS MeshVersions (
+mesh_id INTEGER NOT NULL,
+version INTEGER NOT NULL,
+kind TEXT NOT NULL CHECK(kind IN('snapshot','delta')),
+data BLOB NOT NULL,
+size INTEGER NOT NULL,
+sha1 TEXT NOT NULL,
+created_at REAL NOT NULL,
+PRIMARY KEY (mesh_id, version)
+);"""
+
+create_versions_trigger = """CREATE TRIGGER IF NOT EXISTS MeshVersions_delete AFTER DELETE ON Meshes
+BEGIN
+DELETE FROM MeshVersions WHERE mesh_id = OLD.id;
+END;"""
+
+# the newest version of every asset, answered from the primary key index
+create_latest_view = """CREATE VIEW IF NOT EXISTS LatestVersions AS
+SELECT mesh_id, max(version) AS version FROM MeshVersions GROUP BY mesh_id;"""
+
+# the newest asset with a name, re-adding an asset stores a new version of this row rather than a new row
+select_named_asset = "SELECT id FROM Meshes WHERE name=? AND mesh_type IS ? ORDER BY id DESC LIMIT 1"
+
+insert_version = """INSERT INTO MeshVersions (mesh_id, version, kind, data, size, sha1, created_at)
+VALUES (?, ?, ?, ?, ?, ?, ?)"""
+
+
+def make_delta(base: bytes, target: bytes) -> bytes:
+    """Build the (uncompressed) operations that turn base into target
+    Parameters :
+        base : bytes
+            the previous version
+        target : bytes
+            the new version
+    """
+    base_lines = base.splitlines(keepends=True)
+    target_lines = target.splitlines(keepends=True)
+    positions: Dict[bytes, List[int]] = {}
+    for number, line in enumerate(base_lines):
+        positions.setdefault(line, []).append(number)
+
+    ops = bytearray()
+    pending = bytearray()
+
+    def flush_insert() -> None:
+        if pending:
+            ops.extend(INSERT.pack(b"I", len(pending)))
+            ops.extend(pending)
+            pending.clear()
+
+    index = 0
+    next_base = 0
+    while index < len(target_lines):
+        line = target_lines[index]
+        if next_base < len(base_lines) and base_lines[next_base] == line:
+            start = next_base
+        else:
+            candidates = positions.get(line)
+            if not candidates:
+                pending.extend(line)
+                index += 1
+                continue
+            # the first match after the last copy keeps runs in order, otherwise the first anywhere
+            found = bisect.bisect_left(candidates, next_base)
+            start = candidates[found] if found < len(candidates) else candidates[0]
+        count = 0
+        length = 0
+        while (
+            index + count < len(target_lines)
+            and start + count < len(base_lines)
+            and base_lines[start + count] == target_lines[index + count]
+        ):
+            length += len(target_lines[index + count])
+            count += 1
+        if length < MIN_COPY_BYTES:
+            # not worth a copy, short repeated lines like "vt 0 0" are cheaper inserted
+            pending.extend(b"".join(target_lines[index : index + count]))
+        else:
+            flush_insert()
+            ops.extend(COPY.pack(b"C", start, count))
+            next_base = start + count
+        index += count
+    flush_insert()
+    return bytes(ops)
+
+
+def apply_delta(base: bytes, delta: bytes) -> bytes:
+    """Rebuild a version from the one before and its delta
+    Parameters :
+        base : bytes
+            the previous version
+        delta : bytes
+            result of make_delta
+    """
+    base_lines = base.splitlines(keepends=True)
+    parts: List[bytes] = []
+    offset = 0
+    while offset < len(delta):
+        if delta[offset : offset + 1] == b"C":
+            _, start, count = COPY.unpack_from(delta, offset)
+            parts.append(b"".join(base_lines[start : start + count]))
+            offset += COPY.size
+        else:
+            _, length = INSERT.unpack_from(delta, offset)
+            offset += INSERT.size
+            parts.append(delta[offset : offset + length])
+            offset += length
+    return b"".join(parts)
+
+
+def ensure_versions_table(connection: sqlite3.Connection) -> None:
+    connection.execute(create_versions_table)
+    connection.execute(create_versions_trigger)
+    connection.execute(create_latest_view)
+
+
+def latest_version(connection: sqlite3.Connection, mesh_id: int) -> int:
+    """The newest version number of an asset, 0 if it has no history yet
+    Parameters :
+        connection : sqlite3.Connection
+            The open database
+        mesh_id : int
+            id of the asset
+    """
+    row = connection.execute("SELECT max(version) FROM MeshVersions WHERE mesh_id=?", (mesh_id,)).fetchone()
+    return row[0] or 0
+
+
+def find_asset(connection: sqlite3.Connection, name: str, mesh_type: Optional[str]) -> Optional[int]:
+    """The id of the newest asset with this name and mesh type, None if there isn't one
+    Parameters :
+        connection : sqlite3.Connection
+            The open database
+        name : str
+            asset name
+        mesh_type : str
+            obj, usd, usdc, usdz, usda or fbx
+    """
+    row = connection.execute(select_named_asset, (name, mesh_type)).fetchone()
+    return None if row is None else row[0]
+
+
+def list_versions(connection: sqlite3.Connection, mesh_id: int) -> List[Tuple[int, str, int, int, float]]:
+    """(version, kind, mesh size, stored size, created_at) for every version of an asset
+    Parameters :
+        connection : sqlite3.Connection
+            The open database
+        mesh_id : int
+            id of the asset
+    """
+    query = """SELECT version, kind, size, length(data), created_at FROM MeshVersions
+    WHERE mesh_id=? ORDER BY version"""
+    return connection.execute(query, (mesh_id,)).fetchall()
+
+
+def _store(
+    connection: sqlite3.Connection, mesh_id: int, version: int, data: bytes, base: Optional[bytes], snapshot_interval: int
+) -> None:
+    sha1 = hashlib.sha1(data).hexdigest()
+    snapshot = zlib.compress(data, 6)
+    kind, stored = "snapshot", snapshot
+    if base is not None and (version - 1) % snapshot_interval != 0:
+        delta = zlib.compress(make_delta(base, data), 6)
+        # fall back to a snapshot if the mesh changed so much the delta barely helps
+        if len(delta) < len(snapshot) // 2:
+            kind, stored = "delta", delta
+    connection.execute(insert_version, (mesh_id, version, kind, stored, len(data), sha1, time.time()))
+
+
+def add_version(
+    connection: sqlite3.Connection, mesh_id: int, data: bytes, snapshot_interval: int = SNAPSHOT_INTERVAL
+) -> int:
+    """Store a new version of an asset's mesh and make it the one in Meshes.mesh_data, returns the version number.
+    The first time an asset gets a new version its current mesh is recorded as version 1, as is a mesh that
+    was changed in Meshes without a version being stored. Call inside a transaction.
+    Parameters :
+        connection : sqlite3.Connection
+            The open database
+        mesh_id : int
+            id of the asset
+        data : bytes
+            the new mesh
+        snapshot_interval : int
+            store a full snapshot every this many versions
+    """
+    ensure_versions_table(connection)
+    row = connection.execute("SELECT mesh_data FROM Meshes WHERE id=?", (mesh_id,)).fetchone()
+    if row is None:
+        raise KeyError(f"no asset with id {mesh_id}")
+    current = bytes(row[0])
+    if not current:
+        from meshCodec import read_mesh
+
+        # evicted by meshCodec.py encode --evict, b"" if it is really empty
+        current = read_mesh(connection, mesh_id)
+    current_sha1 = hashlib.sha1(current).hexdigest()
+    latest = connection.execute(
+        "SELECT version, sha1 FROM MeshVersions WHERE mesh_id=? ORDER BY version DESC LIMIT 1", (mesh_id,)
+    ).fetchone()
+    version = latest[0] if latest else 0
+    if latest is None or latest[1] != current_sha1:
+        # no history yet, or the mesh was rewritten in place since the last version, a delta against the
+        # stored history wouldn't rebuild so keep what is there as a snapshot
+        version += 1
+        _store(connection, mesh_id, version, current, None, snapshot_interval)
+    if hashlib.sha1(data).hexdigest() == current_sha1:
+        return version
+    version += 1
+    _store(connection, mesh_id, version, data, current, snapshot_interval)
+    connection.execute("UPDATE Meshes SET mesh_data=? WHERE id=?", (data, mesh_id))
+    return version
+
+
+def get_version(connection: sqlite3.Connection, mesh_id: int, version: Optional[int] = None) -> bytes:
+    """Rebuild a version of an asset's mesh, the latest is read straight from Meshes
+    Parameters :
+        connection : sqlite3.Connection
+            The open database
+        mesh_id : int
+            id of the asset
+        version : int
+            version to rebuild, None for the latest
+    """
+    if version is None or version == latest_version(connection, mesh_id):
+        row = connection.execute("SELECT mesh_data FROM Meshes WHERE id=?", (mesh_id,)).fetchone()
+        if row is None:
+            raise KeyError(f"no asset with id {mesh_id}")
+        if version is None:
+            if not len(row[0]):
+                from meshCodec import read_mesh
+
+                return read_mesh(connection, mesh_id)
+            return bytes(row[0])
+        # Meshes only holds the latest version if nothing has rewritten it since
+        stored = connection.execute(
+            "SELECT sha1 FROM MeshVersions WHERE mesh_id=? AND version=?", (mesh_id, version)
+        ).fetchone()
+        if stored is not None and hashlib.sha1(row[0]).hexdigest() == stored[0]:
+            return bytes(row[0])
+    # the nearest snapshot at or before the version then the deltas after it
+    query = """SELECT version, kind, data, sha1 FROM MeshVersions WHERE mesh_id=? AND version <= ?
+    AND version >= (SELECT max(version) FROM MeshVersions WHERE mesh_id=? AND version <= ? AND kind='snapshot')
+    ORDER BY version"""
+    rows = connection.execute(query, (mesh_id, version, mesh_id, version)).fetchall()
+    if not rows or rows[-1][0] != version:
+        raise KeyError(f"asset {mesh_id} has no version {version}")
+    data = b""
+    for _, kind, stored, _ in rows:
+        payload = zlib.decompress(stored)
+        data = payload if kind == "snapshot" else apply_delta(data, payload)
+    if hashlib.sha1(data).hexdigest() != rows[-1][3]:
+        raise RuntimeError(f"version {version} of asset {mesh_id} did not rebuild correctly")
+    return data
+
+
+def _revisions(count: int, vertices: int) -> List[bytes]:
+    """A synthetic prop and a run of revisions, each moves some vertices and adds a little geometry"""
+    import numpy as np
+
+    rng = np.random.default_rng(25)
+    positions = rng.random((vertices, 3))
+    texcoords = rng.random((vertices, 2)).round(3)
+    faces = [(index, index + 1, index + 2) for index in range(1, vertices - 1)]
+    revisions = []
+    for _ in range(count):
+        lines = [b"# clutter benchmark prop\n", b"o Prop\n"]
+        lines += [b"v %.6f %.6f %.6f\n" % tuple(position) for position in positions]
+        lines += [b"vt %.3f %.3f\n" % tuple(uv) for uv in texcoords]
+        lines += [b"f %d/%d %d/%d %d/%d\n" % (a, a, b, b, c, c) for a, b, c in faces]
+        revisions.append(b"".join(lines))
+        moved = rng.choice(len(positions), len(positions) // 50, replace=False)
+        positions[moved] += rng.normal(0, 0.01, (len(moved), 3))
+        added = rng.random((vertices // 200, 3))
+        first = len(positions) + 1
+        positions = np.vstack([positions, added])
+        texcoords = np.vstack([texcoords, rng.random((len(added), 2)).round(3)])
+        faces += [(index, index + 1, index + 2) for index in range(first, first + len(added) - 2)]
+    return revisions
+
+
+def benchmark(count: int = 20, vertices: int = 20000, snapshot_interval: int = SNAPSHOT_INTERVAL) -> None:
+    """Store a run of revisions in a scratch database and report the space used and rebuild times
+    Parameters :
+        count : int
+            number of revisions
+        vertices : int
+            size of the prop
+        snapshot_interval : int
+            store a full snapshot every this many versions
+    """
+    revisions = _revisions(count, vertices)
+    connection = sqlite3.connect(":memory:")
+    connection.execute(
+        "CREATE TABLE Meshes (id INTEGER PRIMARY KEY, name TEXT, mesh_data BLOB NOT NULL, mesh_type TEXT)"
+    )
+    connection.execute("INSERT INTO Meshes (id, name, mesh_data, mesh_type) VALUES (1, 'Prop', ?, 'obj')", (revisions[0],))
+    start = time.perf_counter()
+    for revision in revisions[1:]:
+        with connection:
+            add_version(connection, 1, revision, snapshot_interval)
+    store_time = time.perf_counter() - start
+
+    full_copies = sum(len(revision) for revision in revisions)
+    compressed_copies = sum(len(zlib.compress(revision, 6)) for revision in revisions)
+    history = sum(row[3] for row in list_versions(connection, 1))
+    latest = len(revisions[-1])
+    rebuild_times = []
+    for version, revision in enumerate(revisions, 1):
+        start = time.perf_counter()
+        assert get_version(connection, 1, version) == revision
+        rebuild_times.append(time.perf_counter() - start)
+    kinds = [row[1] for row in list_versions(connection, 1)]
+
+    print(f"{count} revisions of a {vertices} vertex prop ({latest / 1e6:.2f} MB latest)")
+    print(f"  full copies (one row per revision) {full_copies / 1e6:8.2f} MB")
+    print(f"  compressed copies                  {compressed_copies / 1e6:8.2f} MB")
+    print(f"  history + latest in Meshes         {(history + latest) / 1e6:8.2f} MB")
+    print(f"  saved                              {100.0 * (1 - (history + latest) / full_copies):8.1f} %")
+    print(f"  {kinds.count('snapshot')} snapshots, {kinds.count('delta')} deltas")
+    print(f"  store {1000.0 * store_time / (count - 1):.1f} ms per version")
+    print(f"  rebuild mean {1000.0 * sum(rebuild_times) / count:.1f} ms, worst {1000.0 * max(rebuild_times):.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="mesh version history")
+    parser.add_argument("--database", "-db", help="Which DB to connect too")
+    parser.add_argument("--id", "-i", help="Asset id", type=int)
+    parser.add_argument("--add", "-a", help="Store this mesh file as a new version of the asset")
+    parser.add_argument("--get", "-g", help="Rebuild this version of the asset", type=int)
+    parser.add_argument("--output", "-o", help="Where to write the rebuilt version")
+    parser.add_argument("--benchmark", "-b", help="Report the storage saved over a run of revisions", action="store_true")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark()
+    elif not args.database or args.id is None:
+        parser.error("--database and --id are needed unless running the benchmark")
+    else:
+        with sqlite3.connect(args.database) as connection:
+            ensure_versions_table(connection)
+            if args.add:
+                with connection:
+                    print(f"stored version {add_version(connection, args.id, Path(args.add).read_bytes())}")
+            elif args.get is not None:
+                data = get_version(connection, args.id, args.get)
+                if args.output:
+                    Path(args.output).write_bytes(data)
+                else:
+                    print(data.decode(errors="replace"))
+            else:
+                for version, kind, size, stored, created_at in list_versions(connection, args.id):
+                    print(f"{version}\t{kind}\t{size}\t{stored}\t{time.ctime(created_at)}")
@@ -0,0 +1,237 @@
+#!/usr/bin/env -S uv run --script
+
+import argparse
+import io
+import itertools
+import logging
+import sqlite3
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO, List, Tuple
+
+import numpy as np
+
+from meshVersions import add_version
+from objMesh import parse_floats
+
+"""
+Centre an obj at the origin and scale it to unit size, the same as NCCA.center_pivot_to_bounding_box and
+NCCA.center_and_scale do in Maya, so meshes added with addToDB.py or the AddDialog match exported ones.
+
+It is done in two streaming passes over the file, the first finds the bounding box and the second rewrites
+only the v lines, everything else (faces, uvs, normals, groups, comments) is copied through byte for byte.
+Lines are handled in chunks so the vertex maths is done with NumPy and memory use doesn't depend on the
+size of the file. The original bounds and scale are recorded in the MeshNormalization table so the
+original placement can be recovered.
+"""
+
+CHUNK_LINES = 1 << 16
+
+create_normalization_table = """CREATE TABLE IF NOT EXISTS MeshNormalization (
+mesh_id INTEGER PRIMARY KEY,
+min_x REAL, min_y REAL, min_z REAL,
+max_x REAL, max_y REAL, max_z REAL,
+scale REAL NOT NULL,
+vertex_count INTEGER NOT NULL
+);"""
+
+create_normalization_trigger = """CREATE TRIGGER IF NOT EXISTS MeshNormalization_delete AFTER DELETE ON Meshes
+BEGIN
+DELETE FROM MeshNormalization WHERE mesh_id = OLD.id;
+END;"""
+
+insert_normalization = """INSERT OR REPLACE INTO MeshNormalization
+(mesh_id, min_x, min_y, min_z, max_x, max_y, max_z, scale, vertex_count) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"""
+
+
+@dataclass
+class Normalization:
+    """The original bounds of a mesh and the scale applied, original = normalized / scale + centre"""
+
+    low: np.ndarray
+    high: np.ndarray
+    scale: float
+    vertex_count: int
+
+    @property
+    def centre(self) -> np.ndarray:
+        return (self.low + self.high) / 2.0
+
+    def as_row(self, mesh_id: int) -> Tuple:
+        """The values for insert_normalization"""
+        return (mesh_id, *map(float, self.low), *map(float, self.high), self.scale, self.vertex_count)
+
+
+def _chunks(stream: BinaryIO, chunk_lines: int):
+    while lines := list(itertools.islice(stream, chunk_lines)):
+        yield lines
+
+
+def scan_bounds(stream: BinaryIO, chunk_lines: int = CHUNK_LINES) -> Normalization:
+    """First pass, find the bounding box of the v lines
+    Parameters :
+        stream : BinaryIO
+            the obj opened in binary mode
+        chunk_lines : int
+            number of lines processed at a time
+    """
+    low = np.full(3, np.inf)
+    high = np.full(3, -np.inf)
+    count = 0
+    for lines in _chunks(stream, chunk_lines):
+        vertices = [line[2:] for line in lines if line.startswith(b"v ")]
+        if vertices:
+            positions = parse_floats(vertices, 3)
+            low = np.minimum(low, positions.min(axis=0))
+            high = np.maximum(high, positions.max(axis=0))
+            count += len(positions)
+    if count == 0:
+        return Normalization(np.zeros(3), np.zeros(3), 1.0, 0)
+    size = float((high - low).max())
+    return Normalization(low, high, 1.0 / size if size > 0 else 1.0, count)
+
+
+def _format_vertices(lines: List[bytes], positions: np.ndarray) -> List[bytes]:
+    """Write the new positions back as v lines, keeping any extra values (w or vertex colour) on the line"""
+    if b"".join(lines).count(b" ") == 3 * len(lines):
+        # just x y z on every line, format the whole chunk in one go
+        text = ("v %.6f %.6f %.6f\n" * len(positions)) % tuple(positions.ravel())
+        return text.encode().splitlines(keepends=True)
+    tails = [line.split()[4:] for line in lines]
+    return [
+        b"v %.6f %.6f %.6f" % tuple(position) + b"".join(b" " + value for value in tail) + b"\n"
+        for position, tail in zip(positions, tails)
+    ]
+
+
+def rewrite_positions(
+    source: BinaryIO, dest: BinaryIO, normalization: Normalization, chunk_lines: int = CHUNK_LINES
+) -> None:
+    """Second pass, copy source to dest moving and scaling the v lines
+    Parameters :
+        source : BinaryIO
+            the obj opened in binary mode
+        dest : BinaryIO
+            where to write the normalized obj
+        normalization : Normalization
+            result of scan_bounds
+        chunk_lines : int
+            number of lines processed at a time
+    """
+    centre = normalization.centre
+    for lines in _chunks(source, chunk_lines):
+        rows = [row for row, line in enumerate(lines) if line.startswith(b"v ")]
+        if rows:
+            vertices = [lines[row] for row in rows]
+            positions = (parse_floats([line[2:] for line in vertices], 3) - centre) * normalization.scale
+            for row, line in zip(rows, _format_vertices(vertices, positions)):
+                lines[row] = line
+        dest.write(b"".join(lines))
+
+
+def normalize_obj(data: bytes) -> Tuple[bytes, Normalization]:
+    """Normalize an obj held in memory, returns the new obj and the normalization applied
+    Parameters :
+        data : bytes
+            The contents of an obj file
+    """
+    normalization = scan_bounds(io.BytesIO(data))
+    output = io.BytesIO()
+    rewrite_positions(io.BytesIO(data), output, normalization)
+    return output.getvalue(), normalization
+
+
+def normalize_file(source: Path, dest: Path) -> Normalization:
+    """Normalize an obj file into dest without loading it into memory
+    Parameters :
+        source : Path
+            The obj to read
+        dest : Path
+            The obj to write, must not be the same as source
+    """
+    with open(source, "rb") as stream:
+        normalization = scan_bounds(stream)
+    with open(source, "rb") as stream, open(dest, "wb") as output:
+        rewrite_positions(stream, output, normalization)
+    return normalization
+
+
+def ensure_normalization_table(connection: sqlite3.Connection) -> None:
+    connection.execute(create_normalization_table)
+    connection.execute(create_normalization_trigger)
+
+
+def record_normalization(connection: sqlite3.Connection, mesh_id: int, normalization: Normalization) -> None:
+    """Store the original bounds and scale of a mesh, call inside the transaction that stores the mesh
+    Parameters :
+        connection : sqlite3.Connection
+            The open database
+        mesh_id : int
+            id of the row in Meshes
+        normalization : Normalization
+            what was applied
+    """
+    ensure_normalization_table(connection)
+    connection.execute(insert_normalization, normalization.as_row(mesh_id))
+
+
+def is_normalized(normalization: Normalization, tolerance: float = 1e-4) -> bool:
+    """True if the mesh was already centred and unit sized
+    Parameters :
+        normalization : Normalization
+            result of scan_bounds
+        tolerance : float
+            allowed error, the Maya exporter writes 6 decimal places
+    """
+    return bool(np.all(np.abs(normalization.centre) < tolerance) and abs(normalization.scale - 1.0) < tolerance)
+
+
+def normalize_database(database: str, batch_size: int = 32) -> int:
+    """Normalize every stored obj that hasn't been normalized yet, returns the number of meshes changed.
+    Meshes from the Maya exporter are already in the unit box so they are recorded but left as they are.
+    Changed meshes are stored as a new version (meshVersions.py) so the original can still be rebuilt.
+    Meshes evicted by meshCodec.py encode --evict are skipped until they are restored.
+    Parameters :
+        database : str
+            name of database
+        batch_size : int
+            meshes per transaction
+    """
+    changed = 0
+    with sqlite3.connect(database) as connection:
+        ensure_normalization_table(connection)
+        ids = [
+            row[0]
+            for row in connection.execute(
+                """SELECT id FROM Meshes WHERE mesh_type = 'obj' AND length(mesh_data) > 0
+                AND id NOT IN (SELECT mesh_id FROM MeshNormalization)"""
+            )
+        ]
+        for done, mesh_id in enumerate(ids, 1):
+            (data,) = connection.execute("SELECT mesh_data FROM Meshes WHERE id=?", (mesh_id,)).fetchone()
+            normalized, normalization = normalize_obj(data)
+            if not is_normalized(normalization):
+                add_version(connection, mesh_id, normalized)
+                changed += 1
+            record_normalization(connection, mesh_id, normalization)
+            if done % batch_size == 0:
+                connection.commit()
+                logging.info(f"{done}/{len(ids)} meshes")
+        connection.commit()
+    return changed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="centre objs at the origin and scale them to unit size")
+    parser.add_argument("--database", "-db", help="Normalize every obj in this database")
+    parser.add_argument("--input", "-i", help="obj file to normalize")
+    parser.add_argument("--output", "-o", help="where to write the normalized obj")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    if args.database:
+        print(f"normalized {normalize_database(args.database)} meshes")
+    elif args.input and args.output:
+        result = normalize_file(Path(args.input), Path(args.output))
+        print(f"{result.vertex_count} vertices, bounds {result.low} {result.high}, scale {result.scale}")
+    else:
+        parser.error("give either --database or --input and --output")
@@ -0,0 +1,183 @@
+import itertools
+from dataclasses import dataclass
+from typing import List, Tuple
+
+import numpy as np
+
+
+"""
+Reading obj files into NumPy arrays for the tools that need to work on the geometry of a stored mesh
+(rendering screenshots, statistics, encoding). Only the parts of the format we use are read, that is
+v, vt, vn and f, polygons are triangulated as fans. Indices are converted to 0 based.
+write_obj goes the other way for tools that generate geometry (decoding meshCodec.py archives).
+"""
+
+
+@dataclass
+class ObjArrays:
+    """The geometry of an obj as arrays, the uv and normal indices are -1 where a face has none"""
+
+    positions: np.ndarray
+    texcoords: np.ndarray
+    normals: np.ndarray
+    triangles: np.ndarray
+    triangle_uvs: np.ndarray
+    triangle_normals: np.ndarray
+
+    @property
+    def face_count(self) -> int:
+        return len(self.triangles)
+
+    def bounds(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the min and max corners of the positions"""
+        if len(self.positions) == 0:
+            return np.zeros(3), np.zeros(3)
+        return self.positions.min(axis=0), self.positions.max(axis=0)
+
+
+def parse_floats(lines: List[bytes], width: int) -> np.ndarray:
+    """Convert the value part of a list of v/vt/vn lines to an (n, width) array in one go.
+    Extra components (w, vertex colours) are dropped, missing ones are zero."""
+    if not lines:
+        return np.zeros((0, width))
+    # the one go reshape is only right if every line has the same number of values. With single spaces between
+    # values (the lines are already stripped at the end) a line has one more value than spaces, so counting the
+    # spaces of every line (not a sample) gives the value counts, in C and much cheaper than the float conversion.
+    # Anything else (tabs, runs of spaces) is left to the line at a time loop
+    joined = b" ".join(lines)
+    single_spaced = b"  " not in joined and b"\t" not in joined and not joined.startswith(b" ")
+    counts = set(map(bytes.count, lines, itertools.repeat(b" ")))
+    if single_spaced and len(counts) == 1:
+        per_line = counts.pop() + 1
+        try:
+            values = np.array(joined.split(), dtype=np.float64)
+            if per_line * len(lines) == len(values) and per_line >= width:
+                return values.reshape(len(lines), per_line)[:, :width]
+        except ValueError:
+            pass
+    # mixed component counts, do it a line at a time
+    result = np.zeros((len(lines), width))
+    for row, line in enumerate(lines):
+        values = [float(value) for value in line.split()[:width]]
+        result[row, : len(values)] = values
+    return result
+
+
+def parse_obj(data: bytes) -> ObjArrays:
+    """Parse obj text into arrays
+    Parameters :
+        data : bytes
+            The contents of an obj file
+    """
+    positions: List[bytes] = []
+    texcoords: List[bytes] = []
+    normals: List[bytes] = []
+    corners: List[Tuple[int, int, int]] = []
+    polygon_sizes: List[int] = []
+
+    def index(token: bytes, count: int) -> int:
+        value = int(token)
+        # negative indices are relative to the end of the list so far
+        return value - 1 if value > 0 else count + value
+
+    for line in data.splitlines():
+        line = line.strip()
+        if line.startswith(b"v "):
+            positions.append(line[2:])
+        elif line.startswith(b"vt "):
+            texcoords.append(line[3:])
+        elif line.startswith(b"vn "):
+            normals.append(line[3:])
+        elif line.startswith(b"f "):
+            tokens = line.split()[1:]
+            for token in tokens:
+                parts = token.split(b"/")
+                v = index(parts[0], len(positions))
+                vt = index(parts[1], len(texcoords)) if len(parts) > 1 and parts[1] else -1
+                vn = index(parts[2], len(normals)) if len(parts) > 2 and parts[2] else -1
+                corners.append((v, vt, vn))
+            polygon_sizes.append(len(tokens))
+
+    corner_array = np.array(corners, dtype=np.int64).reshape(-1, 3)
+    triangles = _triangulate(corner_array, np.array(polygon_sizes, dtype=np.int64))
+    return ObjArrays(
+        parse_floats(positions, 3),
+        parse_floats(texcoords, 2),
+        parse_floats(normals, 3),
+        triangles[:, :, 0].astype(np.int64),
+        triangles[:, :, 1].astype(np.int64),
+        triangles[:, :, 2].astype(np.int64),
+    )
+
+
+def _triangulate(corners: np.ndarray, sizes: np.ndarray) -> np.ndarray:
+    """Fan triangulate polygons given as a flat list of corners and the corner count of each polygon.
+    Returns an (m, 3, 3) array of (v, vt, vn) per triangle corner."""
+    starts = np.concatenate(([0], np.cumsum(sizes)[:-1])).astype(np.int64)
+    # points and lines written as f records can't be drawn
+    keep = sizes >= 3
+    starts, sizes = starts[keep], sizes[keep]
+    if len(sizes) == 0:
+        return np.zeros((0, 3, 3), dtype=np.int64)
+    fan_counts = sizes - 2
+    first = np.repeat(starts, fan_counts)
+    # offset of each fan triangle within its polygon 1..size-2
+    offsets = np.arange(fan_counts.sum()) - np.repeat(np.cumsum(fan_counts) - fan_counts, fan_counts) + 1
+    return np.stack([corners[first], corners[first + offsets], corners[first + offsets + 1]], axis=1)
+
+
+def normalize_positions(positions: np.ndarray) -> Tuple[np.ndarray, np.ndarray, float]:
+    """Centre positions on the origin and scale the largest side of the bounding box to 1,
+    the same as NCCA.center_and_scale. Returns the new positions, the original centre and the scale.
+    Parameters :
+        positions : np.ndarray
+            (n, 3) vertex positions
+    """
+    if len(positions) == 0:
+        return positions, np.zeros(3), 1.0
+    low, high = positions.min(axis=0), positions.max(axis=0)
+    centre = (low + high) / 2.0
+    size = float((high - low).max())
+    scale = 1.0 / size if size > 0 else 1.0
+    return (positions - centre) * scale, centre, scale
+
+
+def _corner_format(has_uvs: bool, has_normals: bool) -> str:
+    """The format of a face corner, v, v/vt, v//vn or v/vt/vn"""
+    return "%d" + ("/%d" if has_uvs else "/" if has_normals else "") + ("/%d" if has_normals else "")
+
+
+def _face_lines(arrays: ObjArrays) -> bytes:
+    """The f lines for the triangles with the uv and normal indices that are present"""
+    streams = [arrays.triangles, arrays.triangle_uvs, arrays.triangle_normals]
+    present = [(stream >= 0).all(axis=1) if len(stream) else np.zeros(0, bool) for stream in streams[1:]]
+    if all(flags.all() or not flags.any() for flags in present):
+        # every triangle has the same layout, format them all in one go
+        has_uvs, has_normals = (bool(len(flags)) and flags.all() for flags in present)
+        line = "f " + " ".join([_corner_format(has_uvs, has_normals)] * 3) + "\n"
+        used = [stream + 1 for stream, use in zip(streams, (True, has_uvs, has_normals)) if use]
+        return ((line * len(arrays.triangles)) % tuple(np.stack(used, axis=2).ravel().tolist())).encode()
+    lines = []
+    for corners, uvs, normals, has_uvs, has_normals in zip(*[stream.tolist() for stream in streams], *present):
+        corner = _corner_format(has_uvs, has_normals)
+        used = (True, has_uvs, has_normals)
+        values = [tuple(v + 1 for v, use in zip(indices, used) if use) for indices in zip(corners, uvs, normals)]
+        lines.append("f " + " ".join(corner % value for value in values) + "\n")
+    return "".join(lines).encode()
+
+
+def write_obj(arrays: ObjArrays, digits: int = 6) -> bytes:
+    """Write arrays back out as obj text, the inverse of parse_obj (polygons stay triangulated)
+    Parameters :
+        arrays : ObjArrays
+            the geometry
+        digits : int
+            decimal places written for the positions, uvs and normals
+    """
+    parts = []
+    for prefix, values in ((b"v", arrays.positions), (b"vt", arrays.texcoords), (b"vn", arrays.normals)):
+        if len(values):
+            line = prefix.decode() + f" %.{digits}f" * values.shape[1] + "\n"
+            parts.append(((line * len(values)) % tuple(values.ravel().tolist())).encode())
+    parts.append(_face_lines(arrays))
+    return b"".join(parts)
@@ -0,0 +1,316 @@
+#!/usr/bin/env -S uv run --script
+
+import argparse
+import bisect
+import mmap
+import os
+import sqlite3
+import struct
+from contextlib import closing
+from dataclasses import dataclass
+from typing import Iterator, List, Optional
+
+import numpy as np
+
+from scripts.clutter_schema import BLOB_COLUMNS, MESH_TYPES, connect_read_only, create_schema
+
+"""
+Pack a clutter database into a single read only file that farm nodes can mmap, rather than copying and
+opening the SQLite database on every node.
+
+The layout is
+    * header : magic, version, asset count and the offset of each section
+    * index : one fixed size entry per asset sorted by id, holding the name and the offset and length
+      of the mesh and each screenshot
+    * name order : entry numbers sorted by name, for looking assets up by name
+    * names : utf-8 names, referenced from the index
+    * data : the blobs, each aligned to ALIGNMENT bytes
+
+The index is read with np.frombuffer straight from the mapping and the blobs are handed out as memoryviews
+of it, so nothing is copied or parsed up front and the page cache is shared by every process on a node.
+"""
+
+MAGIC = b"CLUTPAK\0"
+VERSION = 1
+ALIGNMENT = 64
+NO_TYPE = 255
+# offset used for NULL columns so they can be told apart from empty ones
+NULL_OFFSET = np.iinfo(np.uint64).max
+
+HEADER = struct.Struct("<8sIIQQQQ")
+HEADER_SIZE = 64
+ENTRY = np.dtype(
+    [
+        ("id", "<i8"),
+        ("name_offset", "<u4"),
+        ("name_length", "<u4"),
+        ("mesh_type", "u1"),
+        ("reserved", "V7"),
+        ("blobs", "<u8", (len(BLOB_COLUMNS), 2)),
+    ]
+)
+
+
+def _align(offset: int) -> int:
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def pack_database(database: str, output: str) -> int:
+    """Write every asset in a database into a packed library, returns the number of assets.
+    The file is written next to output and renamed into place so readers never see a partial file.
+    Parameters :
+        database : str
+            name of database
+        output : str
+            the packed file to write
+    """
+    lengths = ", ".join(f"length({column}), {column} IS NULL" for column in BLOB_COLUMNS)
+    with closing(connect_read_only(database)) as connection:
+        rows = connection.execute(f"SELECT id, name, mesh_type, {lengths} FROM Meshes ORDER BY id").fetchall()
+        entries = np.zeros(len(rows), dtype=ENTRY)
+        names = bytearray()
+        for entry, (mesh_id, name, mesh_type, *sizes) in zip(entries, rows):
+            encoded = name.encode()
+            entry["id"] = mesh_id
+            entry["name_offset"] = len(names)
+            entry["name_length"] = len(encoded)
+            entry["mesh_type"] = MESH_TYPES.index(mesh_type) if mesh_type in MESH_TYPES else NO_TYPE
+            names += encoded
+        order = np.array(sorted(range(len(rows)), key=lambda row: rows[row][1]), dtype="<u4")
+
+        # lay the blobs out after the index
+        index_offset = HEADER_SIZE
+        order_offset = index_offset + entries.nbytes
+        names_offset = order_offset + order.nbytes
+        data_offset = _align(names_offset + len(names))
+        offset = data_offset
+        for entry, row in zip(entries, rows):
+            sizes = row[3:]
+            for column in range(len(BLOB_COLUMNS)):
+                length, is_null = sizes[2 * column], sizes[2 * column + 1]
+                if is_null:
+                    entry["blobs"][column] = (NULL_OFFSET, 0)
+                else:
+                    entry["blobs"][column] = (offset, length)
+                    offset = _align(offset + length)
+
+        temp = f"{output}.tmp"
+        with open(temp, "wb") as stream:
+            stream.write(HEADER.pack(MAGIC, VERSION, len(rows), index_offset, order_offset, names_offset, data_offset))
+            stream.write(bytes(HEADER_SIZE - HEADER.size))
+            stream.write(entries.tobytes())
+            stream.write(order.tobytes())
+            stream.write(names)
+            # stream the blobs across one at a time so the database is never held in memory
+            for entry in entries:
+                for column, (blob_offset, length) in zip(BLOB_COLUMNS, entry["blobs"]):
+                    if blob_offset == NULL_OFFSET or length == 0:
+                        continue
+                    stream.seek(int(blob_offset))
+                    with connection.blobopen("Meshes", column, int(entry["id"]), readonly=True) as blob:
+                        stream.write(blob.read())
+            stream.truncate(offset)
+    os.replace(temp, output)
+    return len(rows)
+
+
+@dataclass
+class PackedAsset:
+    """An asset in a packed library, the blobs are zero copy views of the mapping (None if NULL)"""
+
+    id: int
+    name: str
+    mesh_type: Optional[str]
+    mesh_data: memoryview
+    top_image: Optional[memoryview]
+    side_image: Optional[memoryview]
+    front_image: Optional[memoryview]
+    persp_image: Optional[memoryview]
+
+
+class PackedLibrary:
+    """
+    Read only access to a packed library through mmap, use as a context manager.
+    memoryviews handed out must be released before the library is closed, close raises BufferError and leaves
+    the library open if any are still alive.
+    """
+
+    def __init__(self, path: str):
+        """Map the file and check the header
+        Parameters :
+            path : str
+                the packed library
+        """
+        self.path = path
+        with open(path, "rb") as stream:
+            self._map = mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self._map_index()
+        except ValueError:
+            self.close()
+            raise
+
+    def _map_index(self) -> None:
+        self._view = memoryview(self._map)
+        if len(self._map) < HEADER_SIZE or self._map[: len(MAGIC)] != MAGIC:
+            raise ValueError(f"{self.path} is not a packed clutter library")
+        _, version, count, index_offset, order_offset, names_offset, _ = HEADER.unpack_from(self._map)
+        if version != VERSION:
+            raise ValueError(f"{self.path} is version {version}, only version {VERSION} is supported")
+        self._entries = np.frombuffer(self._map, dtype=ENTRY, count=count, offset=index_offset)
+        self._order = np.frombuffer(self._map, dtype="<u4", count=count, offset=order_offset)
+        self._names_offset = names_offset
+
+    def __enter__(self) -> "PackedLibrary":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if self._map.closed:
+            return
+        # the index arrays and view are our own exports of the mapping, drop them so it can be closed
+        self._entries = self._order = None
+        self._view.release()
+        try:
+            self._map.close()
+        except BufferError:
+            # a memoryview handed out is still alive, map the index again so the library stays usable
+            self._map_index()
+            raise BufferError(f"{self.path} has memoryviews still in use, release them before closing") from None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, mesh_id: int) -> bool:
+        return self._row(mesh_id) is not None
+
+    def __iter__(self) -> Iterator[PackedAsset]:
+        for row in range(len(self._entries)):
+            yield self._asset(row)
+
+    def ids(self) -> np.ndarray:
+        """The ids of every asset in order"""
+        return self._entries["id"].copy()
+
+    def _row(self, mesh_id: int) -> Optional[int]:
+        row = int(np.searchsorted(self._entries["id"], mesh_id))
+        if row < len(self._entries) and self._entries["id"][row] == mesh_id:
+            return row
+        return None
+
+    def _name(self, row: int) -> str:
+        start = self._names_offset + int(self._entries["name_offset"][row])
+        return str(self._view[start : start + int(self._entries["name_length"][row])], "utf-8")
+
+    def _blob(self, row: int, column: int) -> Optional[memoryview]:
+        offset, length = (int(value) for value in self._entries["blobs"][row, column])
+        if offset == NULL_OFFSET:
+            return None
+        return self._view[offset : offset + length]
+
+    def _asset(self, row: int) -> PackedAsset:
+        mesh_type = int(self._entries["mesh_type"][row])
+        return PackedAsset(
+            int(self._entries["id"][row]),
+            self._name(row),
+            MESH_TYPES[mesh_type] if mesh_type != NO_TYPE else None,
+            *(self._blob(row, column) for column in range(len(BLOB_COLUMNS))),
+        )
+
+    def get(self, mesh_id: int) -> Optional[PackedAsset]:
+        """Look an asset up by id
+        Parameters :
+            mesh_id : int
+                id of the asset
+        """
+        row = self._row(mesh_id)
+        return None if row is None else self._asset(row)
+
+    def blob(self, mesh_id: int, column: str) -> Optional[memoryview]:
+        """Get a single blob without building the whole asset
+        Parameters :
+            mesh_id : int
+                id of the asset
+            column : str
+                one of BLOB_COLUMNS
+        """
+        row = self._row(mesh_id)
+        if row is None:
+            raise KeyError(mesh_id)
+        return self._blob(row, BLOB_COLUMNS.index(column))
+
+    def find(self, name: str) -> List[PackedAsset]:
+        """Every asset with exactly this name, found by a binary search of the name order
+        Parameters :
+            name : str
+                asset name
+        """
+        def key(row) -> str:
+            return self._name(int(row))
+
+        start = bisect.bisect_left(self._order, name, key=key)
+        end = bisect.bisect_right(self._order, name, lo=start, key=key)
+        return [self._asset(int(row)) for row in self._order[start:end]]
+
+
+def unpack_library(path: str, database: str) -> int:
+    """Write a packed library back into a database (which may already have assets), returns the number added.
+    Ids are kept so rows already in the database with the same id are replaced.
+    Parameters :
+        path : str
+            the packed library
+        database : str
+            name of database, created if needed
+    """
+    columns = ", ".join(("id", "name", "mesh_type", *BLOB_COLUMNS))
+    query = f"INSERT OR REPLACE INTO Meshes ({columns}) VALUES ({', '.join('?' * (3 + len(BLOB_COLUMNS)))})"
+    with PackedLibrary(path) as library, closing(sqlite3.connect(database)) as connection:
+        create_schema(connection)
+        count = 0
+        for asset in library:
+            connection.execute(
+                query,
+                (
+                    asset.id,
+                    asset.name,
+                    asset.mesh_type,
+                    asset.mesh_data,
+                    asset.top_image,
+                    asset.side_image,
+                    asset.front_image,
+                    asset.persp_image,
+                ),
+            )
+            count += 1
+            # drop our references to the views before the mapping is closed
+            del asset
+        connection.commit()
+    return count
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="pack a clutter database into a read only mmap archive and back")
+    commands = parser.add_subparsers(dest="command", required=True)
+    pack = commands.add_parser("pack", help="write a packed library from a database")
+    pack.add_argument("database")
+    pack.add_argument("output")
+    unpack = commands.add_parser("unpack", help="write a packed library into a database")
+    unpack.add_argument("library")
+    unpack.add_argument("database")
+    listing = commands.add_parser("list", help="list the assets in a packed library")
+    listing.add_argument("library")
+    args = parser.parse_args()
+
+    if args.command == "pack":
+        print(f"packed {pack_database(args.database, args.output)} assets into {args.output}")
+    elif args.command == "unpack":
+        print(f"added {unpack_library(args.library, args.database)} assets to {args.database}")
+    else:
+        with PackedLibrary(args.library) as library:
+            for asset in library:
+                blobs = (getattr(asset, column) for column in BLOB_COLUMNS)
+                sizes = " ".join("NULL" if blob is None else str(len(blob)) for blob in blobs)
+                print(f"{asset.id}\t{asset.name}\t{asset.mesh_type}\t{sizes}")
+                del asset
@@ -0,0 +1,283 @@
+#!/usr/bin/env -S uv run --script
+
+import argparse
+import base64
+import csv
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, TextIO, Tuple
+
+from clutterLibrary import ArchivedMesh, BlobHandle
+from scripts.clutter_schema import BLOB_COLUMNS, MESH_TYPES, connect_read_only
+
+"""
+Query a clutter database from the shell, streaming the results a row at a time as NDJSON or CSV, e.g.
+
+    ./queryDB.py -db ClutterTest.db --type obj --min-faces 1000 --columns id,name,face_count | jq .name
+    ./queryDB.py -db ClutterTest.db --columns id,name,mesh_data --blobs sha1 --format csv > hashes.csv
+
+Only the columns asked for are selected and blob columns are never read unless they are listed. A listed
+blob is written as its length (read from the record header, no blob data is touched), its sha1 or its
+base64 data, the last two read the blob in pieces with incremental blob I/O. The database is opened read
+only, rows come straight from the cursor and the output is flushed after the first row and then every
+FLUSH_INTERVAL seconds, so a pipeline over a huge library starts working at once. That only holds for the
+default --order-by id, which walks the table in rowid order, any other column has no index so SQLite sorts
+every matching row before the first one comes out, use --min-id/--max-id to keep that sort small.
+Meshes evicted by meshCodec.py encode --evict give the size of the original obj and are decoded for sha1
+and base64.
+"""
+
+FLUSH_INTERVAL = 0.5
+BLOB_MODES = ("length", "sha1", "base64")
+DEFAULT_COLUMNS = ("id", "name", "mesh_type", "mesh_size")
+
+# column : (SQL, the table it needs), MeshStats is filled by clutterLibrary.py or jobRunner.py
+# and MeshInfo comes from facetCounts.py
+METADATA_COLUMNS: Dict[str, Tuple[str, Optional[str]]] = {
+    "id": ("Meshes.id", None),
+    "name": ("Meshes.name", None),
+    "mesh_type": ("Meshes.mesh_type", None),
+    "mesh_size": ("length(Meshes.mesh_data)", None),
+    "image_size": (
+        "ifnull(length(Meshes.top_image), 0) + ifnull(length(Meshes.side_image), 0)"
+        " + ifnull(length(Meshes.front_image), 0) + ifnull(length(Meshes.persp_image), 0)",
+        None,
+    ),
+    "vertex_count": ("MeshStats.vertex_count", "MeshStats"),
+    "face_count": ("MeshStats.face_count", "MeshStats"),
+    "category": ("MeshInfo.category", "MeshInfo"),
+    "author": ("MeshInfo.author", "MeshInfo"),
+}
+COLUMNS = tuple(METADATA_COLUMNS) + BLOB_COLUMNS
+
+# the mesh sizes in a database with EncodedMeshes, an evicted mesh's mesh_data is empty
+EVICTED_SIZE = ("ifnull(EncodedMeshes.size, length(Meshes.mesh_data))", "EncodedMeshes")
+EVICTED_COLUMNS = {"mesh_size": EVICTED_SIZE, "mesh_data": EVICTED_SIZE}
+
+JOINS = {
+    "MeshStats": "LEFT JOIN MeshStats ON MeshStats.mesh_id = Meshes.id",
+    "MeshInfo": "LEFT JOIN MeshInfo ON MeshInfo.mesh_id = Meshes.id",
+    "EncodedMeshes": "LEFT JOIN EncodedMeshes ON EncodedMeshes.mesh_id = Meshes.id AND length(Meshes.mesh_data) = 0",
+}
+
+# filter : (SQL, the table it needs), MeshInfo columns can be NULL so '' matches a missing category or author
+# the way facetCounts.py counts them
+FILTERS: Dict[str, Tuple[str, Optional[str]]] = {
+    "name": ("Meshes.name LIKE ?", None),
+    "mesh_type": ("Meshes.mesh_type = ?", None),
+    "min_faces": ("MeshStats.face_count >= ?", "MeshStats"),
+    "max_faces": ("MeshStats.face_count <= ?", "MeshStats"),
+    "category": ("ifnull(MeshInfo.category, '') = ?", "MeshInfo"),
+    "author": ("ifnull(MeshInfo.author, '') = ?", "MeshInfo"),
+    "min_id": ("Meshes.id >= ?", None),
+    "max_id": ("Meshes.id <= ?", None),
+}
+
+
+def build_query(
+    columns: Sequence[str],
+    filters: Dict[str, Any],
+    order_by: str = "id",
+    limit: Optional[int] = None,
+    encoded: bool = False,
+) -> Tuple[str, List[Any], List[str]]:
+    """Build the SELECT for a query, returns the SQL, its parameters and the tables it joins. The first result
+    column is always the id (for reading blobs) followed by one per column asked for, blob columns select their
+    length. With encoded and mesh_data asked for a last column says whether the mesh has been evicted
+    Parameters :
+        columns : Sequence[str]
+            names from COLUMNS
+        filters : Dict[str, Any]
+            FILTERS name : value, every one must match, None values are skipped
+        order_by : str
+            a name from METADATA_COLUMNS, anything but id sorts all the matching rows before the first is returned
+        limit : int
+            most rows to return
+        encoded : bool
+            the database has an EncodedMeshes table, evicted meshes give the size of the original obj
+    """
+    for column in [*columns, order_by]:
+        if column not in COLUMNS or (column == order_by and column in BLOB_COLUMNS):
+            raise ValueError(f"unknown column {column}, choose from {', '.join(COLUMNS)}")
+    filters = {name: value for name, value in filters.items() if value is not None}
+    expressions, tables = ["Meshes.id"], set()
+    known = {**METADATA_COLUMNS, **EVICTED_COLUMNS} if encoded else METADATA_COLUMNS
+    for column in columns:
+        sql, table = known.get(column, (f"length(Meshes.{column})", None))
+        expressions.append(sql)
+        tables.add(table)
+    if encoded and "mesh_data" in columns:
+        expressions.append("EncodedMeshes.size IS NOT NULL")
+    clauses, params = [], []
+    for name, value in filters.items():
+        sql, table = FILTERS[name]
+        clauses.append(sql)
+        params.append(value)
+        tables.add(table)
+    tables.add(known[order_by][1])
+    joined = [table for table in JOINS if table in tables]
+    query = f"SELECT {', '.join(expressions)} FROM Meshes"
+    query += "".join(f" {JOINS[table]}" for table in joined)
+    if clauses:
+        query += " WHERE " + " AND ".join(clauses)
+    query += f" ORDER BY {known[order_by][0]}, Meshes.id"
+    if limit is not None:
+        query += " LIMIT ?"
+        params.append(limit)
+    return query, params, joined
+
+
+def _sha1(handle: BlobHandle) -> str:
+    digest = hashlib.sha1()
+    for chunk in handle.chunks():
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _base64(handle: BlobHandle) -> str:
+    # a multiple of 3 bytes per piece so the encoded pieces join without padding in between
+    return "".join(base64.b64encode(chunk).decode("ascii") for chunk in handle.chunks(3 << 14))
+
+
+def run_query(
+    database: str,
+    columns: Sequence[str] = DEFAULT_COLUMNS,
+    filters: Optional[Dict[str, Any]] = None,
+    blobs: str = "length",
+    order_by: str = "id",
+    limit: Optional[int] = None,
+) -> Iterator[Dict[str, Any]]:
+    """Stream the rows of a query as {column: value} in the order asked for, the arguments are checked and the
+    database opened straight away, the rows are read as they are iterated
+    Parameters :
+        database : str
+            name of database, opened read only
+        columns : Sequence[str]
+            names from COLUMNS
+        filters : Dict[str, Any]
+            FILTERS name : value
+        blobs : str
+            how blob columns are given, length, sha1 or base64, None for a NULL blob
+        order_by : str
+            a name from METADATA_COLUMNS, anything but id sorts all the matching rows before the first is returned
+        limit : int
+            most rows to return
+    """
+    if blobs not in BLOB_MODES:
+        raise ValueError(f"blobs must be one of {BLOB_MODES}")
+    connection = connect_read_only(database)
+    try:
+        tables = {row[0] for row in connection.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+        query, params, joined = build_query(columns, filters or {}, order_by, limit, "EncodedMeshes" in tables)
+        for table in joined:
+            if table not in tables:
+                raise ValueError(f"{database} has no {table} table")
+    except (ValueError, sqlite3.Error):
+        connection.close()
+        raise
+    return _stream(connection, query, params, columns, {"sha1": _sha1, "base64": _base64}.get(blobs))
+
+
+def _stream(
+    connection: sqlite3.Connection, query: str, params: List[Any], columns: Sequence[str], encode: Optional[Callable]
+) -> Iterator[Dict[str, Any]]:
+    try:
+        for row in connection.execute(query, params):
+            record = dict(zip(columns, row[1:]))
+            # the evicted flag build_query adds after the columns
+            evicted = len(row) > len(columns) + 1 and row[-1]
+            if encode is not None:
+                for column in columns:
+                    if column in BLOB_COLUMNS and record[column] is not None:
+                        handle = ArchivedMesh if column == "mesh_data" and evicted else BlobHandle
+                        record[column] = encode(handle(connection, row[0], column, record[column]))
+            yield record
+    finally:
+        connection.close()
+
+
+def write_rows(
+    rows: Iterator[Dict[str, Any]], columns: Sequence[str], output: TextIO, output_format: str = "ndjson"
+) -> int:
+    """Write rows as they arrive, returns the number written
+    Parameters :
+        rows : Iterator[Dict[str, Any]]
+            from run_query
+        columns : Sequence[str]
+            the columns, for the CSV header
+        output : TextIO
+            where to write
+        output_format : str
+            ndjson (one JSON object per line) or csv (with a header, NULL is an empty field)
+    """
+    writer = None
+    if output_format == "csv":
+        writer = csv.writer(output, lineterminator="\n")
+        writer.writerow(columns)
+    count = 0
+    flushed = 0.0
+    for record in rows:
+        if writer is not None:
+            writer.writerow(record.values())
+        else:
+            output.write(json.dumps(record, ensure_ascii=False) + "\n")
+        count += 1
+        now = time.monotonic()
+        if count == 1 or now - flushed > FLUSH_INTERVAL:
+            output.flush()
+            flushed = now
+    output.flush()
+    return count
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="stream the results of a query on a clutter database")
+    parser.add_argument("--database", "-db", help="Which DB to connect too", required=True)
+    parser.add_argument(
+        "--columns", "-c", help=f"Comma separated columns from {','.join(COLUMNS)}", default=",".join(DEFAULT_COLUMNS)
+    )
+    parser.add_argument("--format", "-f", help="Output format", choices=("ndjson", "csv"), default="ndjson")
+    parser.add_argument("--blobs", "-b", help="How to write blob columns", choices=BLOB_MODES, default="length")
+    parser.add_argument("--name", "-n", help="SQL LIKE pattern for the name")
+    parser.add_argument("--type", "-t", help="Mesh type", choices=MESH_TYPES)
+    parser.add_argument("--min-faces", help="Fewest faces", type=int)
+    parser.add_argument("--max-faces", help="Most faces", type=int)
+    parser.add_argument("--category", help="Category (see facetCounts.py)")
+    parser.add_argument("--author", help="Author (see facetCounts.py)")
+    parser.add_argument("--min-id", help="Smallest id", type=int)
+    parser.add_argument("--max-id", help="Largest id", type=int)
+    parser.add_argument(
+        "--order-by",
+        "-o",
+        help="Column to order by, any but id sorts all the matching rows before writing the first",
+        choices=tuple(METADATA_COLUMNS),
+        default="id",
+    )
+    parser.add_argument("--limit", "-l", help="Most rows to return", type=int)
+    args = parser.parse_args()
+
+    columns = [column.strip() for column in args.columns.split(",") if column.strip()]
+    filters = {
+        "name": args.name,
+        "mesh_type": args.type,
+        "min_faces": args.min_faces,
+        "max_faces": args.max_faces,
+        "category": args.category,
+        "author": args.author,
+        "min_id": args.min_id,
+        "max_id": args.max_id,
+    }
+    try:
+        rows = run_query(args.database, columns, filters, args.blobs, args.order_by, args.limit)
+        write_rows(rows, columns, sys.stdout, args.format)
+    except (ValueError, sqlite3.DatabaseError) as e:
+        # DatabaseError covers OperationalError, a missing or unreadable database or one that isn't SQLite
+        parser.error(f"{args.database}: {e}" if isinstance(e, sqlite3.Error) else str(e))
+    except BrokenPipeError:
+        # the reader went away (e.g. head), point stdout at devnull so the exit flush doesn't fail again
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        sys.exit(1)
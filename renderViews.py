@@ -0,0 +1,392 @@
+#!/usr/bin/env -S uv run --script
+
+import argparse
+import hashlib
+import logging
+import sqlite3
+import struct
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from objMesh import normalize_positions, parse_obj
+from scripts.clutter_schema import VIEW_COLUMNS, connect_read_only
+
+"""
+Render the Front, Side, Top and Persp screenshots of a stored obj without Maya.
+
+This is a small software rasterizer written with NumPy. The mesh is centred and scaled to unit size the
+same way NCCA.center_and_scale does, each view is framed to fit like viewSet(fit=True) and drawn flat
+shaded with a z-buffer. Triangles are rasterized in batches grouped by the size of their screen bounding
+box, so all the per pixel work is done with array operations rather than Python loops.
+
+Run as a batch command it fills in any missing screenshots for a whole library (and re-renders the ones
+it made earlier if the mesh has changed since) using a process pool.
+"""
+
+BACKGROUND = np.array([0.36, 0.36, 0.36])
+SURFACE = np.array([0.75, 0.75, 0.75])
+# number of pixel samples per rasterizer batch, bounds memory use
+BATCH_SAMPLES = 1 << 22
+
+create_rendered_table = """CREATE TABLE IF NOT EXISTS RenderedViews (
+mesh_id INTEGER PRIMARY KEY,
+mesh_sha1 TEXT NOT NULL,
+views TEXT NOT NULL,
+rendered_at REAL NOT NULL
+);"""
+
+create_rendered_trigger = """CREATE TRIGGER IF NOT EXISTS RenderedViews_delete AFTER DELETE ON Meshes
+BEGIN
+DELETE FROM RenderedViews WHERE mesh_id = OLD.id;
+END;"""
+
+select_rendered_views = "SELECT views FROM RenderedViews WHERE mesh_id=?"
+insert_rendered = """INSERT OR REPLACE INTO RenderedViews (mesh_id, mesh_sha1, views, rendered_at)
+VALUES (?, ?, ?, ?)"""
+
+
+@dataclass
+class Camera:
+    """A view direction with the screen right and up axes, orthographic unless fov is set"""
+
+    forward: np.ndarray
+    right: np.ndarray
+    up: np.ndarray
+    fov: Optional[float] = None
+
+
+def _camera(forward, up, fov=None) -> Camera:
+    forward = np.asarray(forward, dtype=np.float64)
+    forward /= np.linalg.norm(forward)
+    right = np.cross(forward, up)
+    right /= np.linalg.norm(right)
+    return Camera(forward, right, np.cross(right, forward), fov)
+
+
+# Maya's default cameras, persp sits at (28, 21, 28) with a 35mm lens (54.43 degree horizontal fov)
+CAMERAS = {
+    "Front": _camera([0, 0, -1], [0, 1, 0]),
+    "Side": _camera([-1, 0, 0], [0, 1, 0]),
+    "Top": _camera([0, -1, 0], [0, 0, -1]),
+    "Persp": _camera([-28, -21, -28], [0, 1, 0], fov=np.radians(54.43)),
+}
+
+
+def encode_png(image: np.ndarray) -> bytes:
+    """Encode an (h, w, 3) uint8 image as a PNG without needing an imaging library
+    Parameters :
+        image : np.ndarray
+            the pixels
+    """
+    height, width, _ = image.shape
+    raw = np.zeros((height, width * 3 + 1), dtype=np.uint8)
+    raw[:, 1:] = image.reshape(height, width * 3)
+
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF)
+
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", header)
+        + chunk(b"IDAT", zlib.compress(raw.tobytes(), 6))
+        + chunk(b"IEND", b"")
+    )
+
+
+def _project(
+    positions: np.ndarray, camera: Camera, width: int, height: int, margin: float
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Transform positions into pixel coordinates and depth for a camera, framing the mesh to fit."""
+    x = positions @ camera.right
+    y = positions @ camera.up
+    depth = positions @ camera.forward
+    if camera.fov is not None:
+        # move the camera back until the unit box fits inside the field of view
+        distance = 0.5 * np.sqrt(3.0) / np.sin(camera.fov / 2.0)
+        depth = depth + distance
+        focal = 1.0 / np.tan(camera.fov / 2.0)
+        x = focal * x / depth
+        y = focal * y / depth
+    low = np.array([x.min(), y.min()])
+    high = np.array([x.max(), y.max()])
+    centre = (low + high) / 2.0
+    extent = max(float((high - low).max()), 1e-9)
+    scale = margin * min(width, height) / extent
+    screen = np.empty((len(positions), 2))
+    screen[:, 0] = (x - centre[0]) * scale + width / 2.0
+    screen[:, 1] = height / 2.0 - (y - centre[1]) * scale
+    return screen, depth
+
+
+def _shade(corners: np.ndarray, camera: Camera) -> np.ndarray:
+    """Flat two sided lambert lighting from the camera (a headlight) per triangle"""
+    normals = np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+    lengths = np.linalg.norm(normals, axis=1)
+    lengths[lengths == 0] = 1.0
+    if camera.fov is None:
+        to_eye = -camera.forward[None, :]
+    else:
+        centres = corners.mean(axis=1)
+        eye = -camera.forward * 0.5 * np.sqrt(3.0) / np.sin(camera.fov / 2.0)
+        to_eye = eye - centres
+        to_eye /= np.linalg.norm(to_eye, axis=1)[:, None]
+    lambert = np.abs(np.sum(normals * to_eye, axis=1)) / lengths
+    return 0.25 + 0.75 * lambert
+
+
+def rasterize(
+    screen: np.ndarray, depth: np.ndarray, triangles: np.ndarray, shade: np.ndarray, width: int, height: int
+) -> np.ndarray:
+    """Draw triangles into a width x height intensity buffer, returns NaN where nothing was drawn.
+    Parameters :
+        screen : np.ndarray
+            (n, 2) pixel coordinates of the vertices
+        depth : np.ndarray
+            (n,) distance of each vertex along the view direction
+        triangles : np.ndarray
+            (m, 3) vertex indices
+        shade : np.ndarray
+            (m,) intensity of each triangle
+        width : int
+            image width
+        height : int
+            image height
+    """
+    zbuffer = np.full(width * height, np.inf)
+    colour = np.full(width * height, np.nan)
+    if len(triangles) == 0:
+        return colour.reshape(height, width)
+
+    p = screen[triangles]
+    z = depth[triangles]
+    # twice the signed area, used to normalise the edge functions
+    area = (p[:, 1, 0] - p[:, 0, 0]) * (p[:, 2, 1] - p[:, 0, 1]) - (p[:, 2, 0] - p[:, 0, 0]) * (p[:, 1, 1] - p[:, 0, 1])
+    low = np.floor(p.min(axis=1)).astype(np.int64)
+    high = np.ceil(p.max(axis=1)).astype(np.int64)
+    low = np.maximum(low, 0)
+    high = np.minimum(high, [width - 1, height - 1])
+    visible = (np.abs(area) > 1e-12) & np.all(high >= low, axis=1)
+    spans = (high - low + 1).max(axis=1)
+
+    # group triangles by the power of two that covers their bounding box so each batch is a dense grid
+    sizes = np.where(visible, 1 << np.ceil(np.log2(np.maximum(spans, 1))).astype(np.int64), 0)
+    for size in np.unique(sizes[sizes > 0]):
+        grid_y, grid_x = np.divmod(np.arange(size * size), size)
+        members = np.nonzero(sizes == size)[0]
+        per_batch = max(1, BATCH_SAMPLES // (size * size))
+        for start in range(0, len(members), per_batch):
+            batch = members[start : start + per_batch]
+            px = low[batch, 0][:, None] + grid_x[None, :]
+            py = low[batch, 1][:, None] + grid_y[None, :]
+            cx = px + 0.5
+            cy = py + 0.5
+            tp = p[batch]
+            inv_area = 1.0 / area[batch][:, None]
+            x0, y0 = tp[:, 0, 0, None] - cx, tp[:, 0, 1, None] - cy
+            x1, y1 = tp[:, 1, 0, None] - cx, tp[:, 1, 1, None] - cy
+            x2, y2 = tp[:, 2, 0, None] - cx, tp[:, 2, 1, None] - cy
+            w0 = (x1 * y2 - x2 * y1) * inv_area
+            w1 = (x2 * y0 - x0 * y2) * inv_area
+            w2 = 1.0 - w0 - w1
+            inside = (w0 >= 0) & (w1 >= 0) & (w2 >= 0)
+            inside &= (px <= high[batch, 0][:, None]) & (py <= high[batch, 1][:, None])
+            if not inside.any():
+                continue
+            tz = z[batch]
+            sample_depth = (w0 * tz[:, 0, None] + w1 * tz[:, 1, None] + w2 * tz[:, 2, None])[inside]
+            pixel = (py * width + px)[inside]
+            sample_shade = np.broadcast_to(shade[batch][:, None], inside.shape)[inside]
+            # keep the nearest sample for each pixel in this batch then merge with the z-buffer
+            order = np.lexsort((sample_depth, pixel))
+            pixel, sample_depth, sample_shade = pixel[order], sample_depth[order], sample_shade[order]
+            first = np.ones(len(pixel), dtype=bool)
+            first[1:] = pixel[1:] != pixel[:-1]
+            pixel, sample_depth, sample_shade = pixel[first], sample_depth[first], sample_shade[first]
+            nearer = sample_depth < zbuffer[pixel]
+            zbuffer[pixel[nearer]] = sample_depth[nearer]
+            colour[pixel[nearer]] = sample_shade[nearer]
+    return colour.reshape(height, width)
+
+
+def render_view(
+    positions: np.ndarray, triangles: np.ndarray, view: str, width: int = 250, height: int = 250, supersample: int = 2
+) -> np.ndarray:
+    """Render one of the standard views of a normalised mesh to an (h, w, 3) uint8 image
+    Parameters :
+        positions : np.ndarray
+            (n, 3) vertex positions, centred and scaled to unit size
+        triangles : np.ndarray
+            (m, 3) vertex indices
+        view : str
+            Front, Side, Top or Persp
+        width : int
+            image width
+        height : int
+            image height
+        supersample : int
+            samples per pixel along each axis for anti-aliasing
+    """
+    camera = CAMERAS[view]
+    big_width, big_height = width * supersample, height * supersample
+    screen, depth = _project(positions, camera, big_width, big_height, margin=0.9)
+    shade = _shade(positions[triangles], camera)
+    intensity = rasterize(screen, depth, triangles, shade, big_width, big_height)
+    covered = ~np.isnan(intensity)
+    rgb = np.where(covered[..., None], np.nan_to_num(intensity)[..., None] * SURFACE, BACKGROUND)
+    # box filter back down to the output size
+    rgb = rgb.reshape(height, supersample, width, supersample, 3).mean(axis=(1, 3))
+    return np.clip(rgb * 255.0 + 0.5, 0, 255).astype(np.uint8)
+
+
+def render_obj(data: bytes, views=tuple(VIEW_COLUMNS), width: int = 250, height: int = 250) -> Dict[str, bytes]:
+    """Render the requested views of an obj, returns view name : PNG bytes. A ValueError is raised for an obj
+    with no faces, there is nothing to draw
+    Parameters :
+        data : bytes
+            The obj file
+        views : Sequence[str]
+            Which of Front, Side, Top and Persp to render
+        width : int
+            image width
+        height : int
+            image height
+    """
+    mesh = parse_obj(data)
+    if mesh.face_count == 0:
+        raise ValueError("the mesh has no faces")
+    positions, _, _ = normalize_positions(mesh.positions)
+    return {view: encode_png(render_view(positions, mesh.triangles, view, width, height)) for view in views}
+
+
+def _render_job(
+    job: Tuple[str, int, Optional[str], List[str], bool, int]
+) -> Tuple[int, str, Dict[str, bytes], Optional[str]]:
+    """Process pool worker, reads the mesh itself so only ids and images cross the process boundary. A mesh that
+    can't be rendered returns the error rather than raising it, so one bad mesh doesn't stop the whole library"""
+    database, mesh_id, rendered_sha1, missing, rendered_views, size = job
+    sha1 = ""
+    try:
+        with connect_read_only(database) as connection:
+            (data,) = connection.execute("SELECT mesh_data FROM Meshes WHERE id=?", (mesh_id,)).fetchone()
+        sha1 = hashlib.sha1(data).hexdigest()
+        views = set(missing)
+        if rendered_sha1 is not None and rendered_sha1 != sha1:
+            # the mesh has changed since we last rendered it so our screenshots are stale
+            views.update(rendered_views)
+        if not views:
+            return mesh_id, sha1, {}, None
+        return mesh_id, sha1, render_obj(data, sorted(views), size, size), None
+    except Exception as e:
+        return mesh_id, sha1, {}, f"{type(e).__name__}: {e}"
+
+
+def find_work(
+    connection: sqlite3.Connection, force: bool = False, min_id: Optional[int] = None, max_id: Optional[int] = None
+) -> Iterator[Tuple[int, Optional[str], List[str], List[str]]]:
+    """Find the obj rows with missing screenshots, or screenshots rendered by us that may be stale.
+    Meshes evicted by meshCodec.py encode --evict are skipped until they are restored.
+    Parameters :
+        connection : sqlite3.Connection
+            The open database
+        force : bool
+            re-render every view of every row
+        min_id : int
+            only look at rows from this id on
+        max_id : int
+            only look at rows up to this id
+    """
+    columns = ", ".join(f"{column} IS NULL OR length({column}) = 0" for column in VIEW_COLUMNS.values())
+    query = f"""SELECT Meshes.id, RenderedViews.mesh_sha1, RenderedViews.views, {columns}
+    FROM Meshes LEFT JOIN RenderedViews ON RenderedViews.mesh_id = Meshes.id WHERE Meshes.mesh_type = 'obj'
+    AND length(Meshes.mesh_data) > 0"""
+    params = []
+    if min_id is not None:
+        query += " AND Meshes.id >= ?"
+        params.append(min_id)
+    if max_id is not None:
+        query += " AND Meshes.id <= ?"
+        params.append(max_id)
+    for mesh_id, sha1, views, *empty in connection.execute(query, params):
+        missing = [view for view, is_empty in zip(VIEW_COLUMNS, empty) if is_empty or force]
+        rendered = views.split(",") if views else []
+        if missing or sha1 is not None:
+            yield mesh_id, sha1, missing, rendered
+
+
+def render_library(
+    database: str,
+    workers: Optional[int] = None,
+    batch_size: int = 32,
+    size: int = 250,
+    force: bool = False,
+    min_id: Optional[int] = None,
+    max_id: Optional[int] = None,
+) -> int:
+    """Fill in missing (and refresh stale) screenshots for every obj in a database using a process pool.
+    Results are written back from this process in batched transactions, meshes that can't be rendered are logged
+    and skipped. Returns the number of rows updated.
+    Parameters :
+        database : str
+            name of database
+        workers : int
+            number of worker processes, defaults to the number of cores
+        batch_size : int
+            rows per transaction
+        size : int
+            image width and height
+        force : bool
+            re-render every view of every row
+        min_id : int
+            only render rows from this id on, e.g. the first row of an export farm run
+        max_id : int
+            only render rows up to this id
+    """
+    updated = 0
+    with sqlite3.connect(database) as connection:
+        connection.execute(create_rendered_table)
+        connection.execute(create_rendered_trigger)
+        connection.commit()
+        jobs = [
+            (database, mesh_id, sha1, missing, rendered, size)
+            for mesh_id, sha1, missing, rendered in find_work(connection, force, min_id, max_id)
+        ]
+        logging.info(f"checking {len(jobs)} meshes")
+        start = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for done, (mesh_id, sha1, images, error) in enumerate(pool.map(_render_job, jobs, chunksize=4), 1):
+                if error is not None:
+                    logging.warning(f"skipped mesh {mesh_id}, {error}")
+                if images:
+                    assignments = ", ".join(f"{VIEW_COLUMNS[view]}=?" for view in images)
+                    connection.execute(f"UPDATE Meshes SET {assignments} WHERE id=?", (*images.values(), mesh_id))
+                    previous = connection.execute(select_rendered_views, (mesh_id,)).fetchone()
+                    views = set(images) | set(previous[0].split(",") if previous else [])
+                    connection.execute(insert_rendered, (mesh_id, sha1, ",".join(sorted(views)), time.time()))
+                    updated += 1
+                if done % batch_size == 0:
+                    connection.commit()
+                    logging.info(f"{done}/{len(jobs)} meshes, {done / (time.perf_counter() - start):.1f} per second")
+        connection.commit()
+    return updated
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="render missing screenshots for a clutter database without Maya")
+    parser.add_argument("--database", "-db", help="Which DB to connect too", required=True)
+    parser.add_argument("--workers", "-w", help="Number of worker processes", type=int)
+    parser.add_argument("--size", "-s", help="Image width and height", type=int, default=250)
+    parser.add_argument("--force", "-f", help="Re-render every view of every obj", action="store_true")
+    parser.add_argument("--min-id", help="Only render rows from this id on", type=int)
+    parser.add_argument("--max-id", help="Only render rows up to this id", type=int)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    updated = render_library(
+        args.database, args.workers, size=args.size, force=args.force, min_id=args.min_id, max_id=args.max_id
+    )
+    print(f"updated {updated} meshes")
@@ -15,6 +15,7 @@ def save_screenshots(
     top: bool = True,
     side: bool = True,
     front: bool = True,
+    image_format: str = "png",
 ) -> None:
     # build a dictionary of views and their commands so we can use a loop
     views = {
@@ -46,7 +47,9 @@ def save_screenshots(
                 # Resize to selected size
                 image.resize(width, height, preserveAspectRatio=True)
                 # Write to file
-                print(f"{path}/{base_name}{name}.png")
-                image.writeToFile(f"{path}/{base_name}{name}.png", outputFormat="png")
+                # image_format is any format MImage can write (png, jpg, tif...), use jpg for smaller
+                # files or leave as png and transcode at ingest (see transcodeImages.py)
+                print(f"{path}/{base_name}{name}.{image_format}")
+                image.writeToFile(f"{path}/{base_name}{name}.{image_format}", outputFormat=image_format)
             except Exception as e:
                 print(f"Failed to save screenshot for {name} view: {e}")
\ No newline at end of file
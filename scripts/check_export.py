@@ -0,0 +1,72 @@
+"""
+Check the export core (clutter_export.py) on a machine without Maya, e.g.
+
+    python scripts/check_export.py
+
+A few groups are exported through the stub backend from export_stub_worker.py into a scratch database, one of
+them set to fail, and what was written is compared with what was asked for: one row per good group in order,
+the obj and all four screenshots stored, the failure skipped and a new database made with the shared schema
+(clutter_schema.py). The problems found are printed and the exit code is non zero if there are any.
+"""
+
+import sqlite3
+import sys
+import tempfile
+from pathlib import Path
+from typing import List
+
+from clutter_export import asset_name, export_to_database
+from clutter_schema import create_meshes_table
+from export_stub_worker import CUBE, PIXEL_PNG, StubBackend
+
+
+def check_export(count: int = 5, batch_size: int = 2) -> List[str]:
+    """
+    Export count groups (plus one that fails) with the stub backend and check the database.
+
+    Args:
+        count (int): Number of groups that should export.
+        batch_size (int): Assets per transaction, smaller than count so several batches are written.
+
+    Returns:
+        List[str]: The problems found, empty if the export is correct.
+    """
+    problems: List[str] = []
+    good = [f"|set|prop{index}" for index in range(count)]
+    children = good[:1] + ["|set|broken"] + good[1:]
+    with tempfile.TemporaryDirectory(prefix="clutter_check_") as folder:
+        database = str(Path(folder) / "check.db")
+        written = export_to_database(database, children, StubBackend(screenshots=True, fail="broken"), batch_size)
+        if written != count:
+            problems.append(f"wrote {written} assets, expected {count}")
+
+        connection = sqlite3.connect(database)
+        try:
+            schema = connection.execute("SELECT sql FROM sqlite_master WHERE name='Meshes'").fetchone()[0]
+            if f"{schema};" != create_meshes_table.replace("IF NOT EXISTS ", ""):
+                problems.append("Meshes table doesn't match clutter_schema.create_meshes_table")
+            if connection.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+                problems.append("new database isn't auto_vacuum=INCREMENTAL")
+            rows = connection.execute(
+                "SELECT name, mesh_data, mesh_type, top_image, side_image, front_image, persp_image FROM Meshes "
+                "ORDER BY id"
+            ).fetchall()
+        finally:
+            connection.close()
+    names = [row[0] for row in rows]
+    if names != [asset_name(child) for child in good]:
+        problems.append(f"rows {names} don't match the groups {good}")
+    for name, mesh, mesh_type, *images in rows:
+        if not mesh.decode().endswith(CUBE) or mesh_type != "obj":
+            problems.append(f"{name} mesh wasn't stored as exported")
+        if images != [PIXEL_PNG] * 4:
+            problems.append(f"{name} is missing screenshots")
+    return problems
+
+
+if __name__ == "__main__":
+    problems = check_export()
+    for problem in problems:
+        print(problem)
+    print("export core ok" if not problems else f"{len(problems)} problems")
+    sys.exit(1 if problems else 0)
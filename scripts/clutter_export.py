@@ -0,0 +1,215 @@
+"""
+Export clutter assets straight into a clutter database.
+
+This module holds the orchestration for ExportScript.py and deliberately doesn't import maya, everything
+that needs Maya goes through an ExportBackend object. ExportScript.MayaBackend is the real one, a stub
+backend can be used to run the loop (and the database writes) on a machine without Maya.
+
+Each asset is written by the backend to a scratch folder, read back and deleted straight away, and the
+rows are inserted in batched transactions as the loop runs, so there is no ExportedMeshes folder to
+ingest afterwards with createDatabase.sh.
+"""
+
+import sqlite3
+import tempfile
+from pathlib import Path
+from typing import Callable, Iterable, List, Optional, Protocol, Tuple
+
+from clutter_schema import create_schema
+
+insert_item = """INSERT INTO Meshes (name, mesh_data, mesh_type, top_image, side_image, front_image, persp_image)
+VALUES (?, ?, ?, ?, ?, ?, ?)"""
+
+# order matches the image columns in insert_item
+VIEWS = ("Top", "Side", "Front", "Persp")
+
+
+class ExportBackend(Protocol):
+    """The DCC specific parts of an export"""
+
+    def prepare(self, child: str) -> None:
+        """Duplicate child into an export group, centred and scaled to unit size"""
+
+    def save_screenshots(self, path: Path, width: int, height: int, base_name: str) -> None:
+        """Write <base_name>Front/Side/Top/Persp.png into path"""
+
+    def export_obj(self, path: Path) -> None:
+        """Write the export group as an obj"""
+
+    def cleanup(self) -> None:
+        """Remove the export group"""
+
+    def interrupted(self) -> bool:
+        """True if the user asked to stop"""
+
+
+def asset_name(child: str) -> str:
+    """
+    Get the asset name from the full path of a child group.
+    child is in the format |group name|top level group name
+
+    Args:
+        child (str): The full DAG path of the group.
+
+    Returns:
+        str: The name of the top level group.
+    """
+    return child.split("|")[2]
+
+
+def capture_asset(backend: ExportBackend, child: str, scratch: Path, width: int, height: int) -> Tuple:
+    """
+    Export a single group through the backend and read the results back as a database row.
+
+    Args:
+        backend (ExportBackend): The DCC backend.
+        child (str): The full DAG path of the group.
+        scratch (Path): Folder for the temporary files, they are removed once read.
+        width (int): Screenshot width.
+        height (int): Screenshot height.
+
+    Returns:
+        Tuple: The values for insert_item.
+    """
+    name = asset_name(child)
+    backend.prepare(child)
+    try:
+        backend.save_screenshots(scratch, width, height, name)
+        mesh_path = scratch / f"{name}.obj"
+        backend.export_obj(mesh_path)
+    finally:
+        backend.cleanup()
+
+    def take(path: Path) -> Optional[bytes]:
+        if not path.is_file():
+            return None
+        data = path.read_bytes()
+        path.unlink()
+        return data
+
+    mesh = take(mesh_path)
+    if mesh is None:
+        raise RuntimeError(f"export of {child} did not write {mesh_path}")
+    images = [take(scratch / f"{name}{view}.png") for view in VIEWS]
+    # anything else the exporter wrote (.mtl files etc) isn't stored
+    for leftover in scratch.iterdir():
+        if leftover.is_file():
+            leftover.unlink()
+    return (name, mesh, "obj", *images)
+
+
+class DatabaseExporter:
+    """
+    Writes exported assets into a clutter database in batches, use as a context manager.
+    """
+
+    def __init__(self, database: str, batch_size: int = 16, width: int = 250, height: int = 250) -> None:
+        """
+        Args:
+            database (str): The database to write to, the Meshes table is created if needed (see clutter_schema.py).
+            batch_size (int): Number of assets per transaction.
+            width (int): Screenshot width.
+            height (int): Screenshot height.
+        """
+        self.database = database
+        self.batch_size = batch_size
+        self.width = width
+        self.height = height
+        self.connection: Optional[sqlite3.Connection] = None
+        self._pending: List[Tuple] = []
+        self.exported = 0
+
+    def __enter__(self) -> "DatabaseExporter":
+        self.connection = sqlite3.connect(self.database)
+        create_schema(self.connection)
+        return self
+
+    def __exit__(self, *exc) -> None:
+        try:
+            if exc[0] is None:
+                self.flush()
+            else:
+                self.connection.rollback()
+        finally:
+            self.connection.close()
+            self.connection = None
+
+    def add(self, row: Tuple) -> None:
+        """
+        Queue a row, the batch is written once it is full.
+
+        Args:
+            row (Tuple): The values for insert_item.
+        """
+        self._pending.append(row)
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """
+        Write any queued rows in a single transaction.
+        """
+        if not self._pending:
+            return
+        with self.connection:
+            self.connection.executemany(insert_item, self._pending)
+        self.exported += len(self._pending)
+        self._pending = []
+
+    def export(
+        self,
+        children: Iterable[str],
+        backend: ExportBackend,
+        progress: Optional[Callable[[int, str], None]] = None,
+    ) -> int:
+        """
+        Export every child group into the database, stopping early if the backend is interrupted.
+        Assets that fail are reported and skipped.
+
+        Args:
+            children (Iterable[str]): Full DAG paths of the groups to export.
+            backend (ExportBackend): The DCC backend.
+            progress (Callable[[int, str], None]): Called with the index and name of each asset.
+
+        Returns:
+            int: The number of assets written so far.
+        """
+        with tempfile.TemporaryDirectory(prefix="clutter_export_") as scratch:
+            for index, child in enumerate(children):
+                if progress is not None:
+                    progress(index, child)
+                try:
+                    self.add(capture_asset(backend, child, Path(scratch), self.width, self.height))
+                except Exception as e:
+                    print(f"failed to export {child}: {e}")
+                if backend.interrupted():
+                    print("interrupted by user")
+                    break
+        self.flush()
+        return self.exported
+
+
+def export_to_database(
+    database: str,
+    children: Iterable[str],
+    backend: ExportBackend,
+    batch_size: int = 16,
+    width: int = 250,
+    height: int = 250,
+) -> int:
+    """
+    Helper to export a list of groups into a database.
+
+    Args:
+        database (str): The database to write to.
+        children (Iterable[str]): Full DAG paths of the groups to export.
+        backend (ExportBackend): The DCC backend.
+        batch_size (int): Number of assets per transaction.
+        width (int): Screenshot width.
+        height (int): Screenshot height.
+
+    Returns:
+        int: The number of assets written.
+    """
+    with DatabaseExporter(database, batch_size, width, height) as exporter:
+        return exporter.export(children, backend)
@@ -0,0 +1,86 @@
+"""
+The clutter database schema, the one definition of the Meshes table shared by everything that creates a
+database: the exporters in scripts/, the root tools (ingestDaemon.py, packLibrary.py), the GUI and
+createDatabase.sh, which pipes the output of running this module into sqlite3. The mesh types, the image and
+blob columns and the screenshot view each image column holds are defined here too and imported by the rest
+
+    python scripts/clutter_schema.py | sqlite3 ClutterTest.db
+
+New databases use auto_vacuum=INCREMENTAL so deleted blobs can be given back to the file system a few pages
+at a time (see NewGUI/IncrementalVacuum.py), the mode can only be set before the first table is created.
+
+Tools that only read a library open it with connect_read_only, which passes the path as a proper file: URI so
+names with ?, # or % in them open the file they name.
+"""
+
+import sqlite3
+from pathlib import Path
+
+MESH_TYPES = ("obj", "usd", "usdc", "usdz", "usda", "fbx")
+# in table order
+IMAGE_COLUMNS = ("top_image", "side_image", "front_image", "persp_image")
+BLOB_COLUMNS = ("mesh_data", *IMAGE_COLUMNS)
+# the <name><view>.png suffixes written by NCCA.save_screenshots and the column each one is stored in
+VIEW_COLUMNS = {"Front": "front_image", "Side": "side_image", "Top": "top_image", "Persp": "persp_image"}
+
+create_meshes_table = f"""CREATE TABLE IF NOT EXISTS Meshes (
+id integer PRIMARY KEY AUTOINCREMENT,
+name text NOT NULL,
+mesh_data BLOB NOT NULL,
+mesh_type TEXT CHECK(mesh_type IN({','.join(f"'{mesh_type}'" for mesh_type in MESH_TYPES)})),
+top_image BLOB,
+side_image BLOB,
+front_image BLOB,
+persp_image BLOB
+);"""
+
+auto_vacuum_incremental = "PRAGMA auto_vacuum=INCREMENTAL;"
+
+
+def new_database_sql() -> str:
+    """The SQL that sets up a new, empty database"""
+    return f"{auto_vacuum_incremental}\n{create_meshes_table}"
+
+
+def create_schema(connection: sqlite3.Connection) -> None:
+    """
+    Create the Meshes table if it doesn't exist, a database with no tables yet is switched to
+    auto_vacuum=INCREMENTAL first.
+
+    Args:
+        connection (sqlite3.Connection): The open database.
+    """
+    if connection.execute("SELECT count(*) FROM sqlite_master").fetchone()[0] == 0:
+        connection.execute(auto_vacuum_incremental)
+    connection.execute(create_meshes_table)
+
+
+def read_only_uri(database: str) -> str:
+    """
+    The URI that opens a database read only, for sqlite3.connect(uri=True) or ATTACH.
+
+    Args:
+        database (str): Path to the database file.
+
+    Returns:
+        str: The escaped file: URI with mode=ro.
+    """
+    return f"{Path(database).resolve().as_uri()}?mode=ro"
+
+
+def connect_read_only(database: str, **kwargs) -> sqlite3.Connection:
+    """
+    Open a database read only.
+
+    Args:
+        database (str): Path to the database file.
+        kwargs: Passed on to sqlite3.connect, e.g. timeout.
+
+    Returns:
+        sqlite3.Connection: The open connection.
+    """
+    return sqlite3.connect(read_only_uri(database), uri=True, **kwargs)
+
+
+if __name__ == "__main__":
+    print(new_database_sql())
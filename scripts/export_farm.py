@@ -0,0 +1,401 @@
+"""
+Export the child groups of a scene with several headless mayapy processes at once.
+
+ExportScript.export_selected_to_database exports one group at a time in the artist's Maya. Here the list of
+groups is split between N worker processes, each opens the scene itself, exports its share into its own
+scratch database and reports each asset on stdout as it goes. Once they have all finished the scratch
+databases are merged into the target database in the order of the original list, so the ids come out the
+same as a serial export. mayapy has no viewport so the workers store no screenshots, after the merge the
+missing views of the new rows are rendered from their meshes by renderViews.py. Like clutter_export this
+module doesn't import maya so the scheduler runs anywhere, the worker is any executable that speaks the
+protocol below, normally "mayapy ExportScript.py" and export_stub_worker.py for running the farm on a
+machine without Maya.
+
+A worker is run as
+    <worker> --farm-worker --scene <scene> --children <json> --database <db> --batch-size <n> --width <w> --height <h>
+where the json file holds [[index, dag path], ...], it writes the assets into the Meshes table of <db> in
+the order given and prints one JSON object per line
+    {"event": "exported", "index": index}
+    {"event": "failed", "index": index, "error": message}
+and for listing the groups of a scene
+    <worker> --farm-worker --scene <scene> --list-children <group>
+prints {"event": "child", "path": dag path} for each child group.
+
+Run as a script to export from the shell, for example
+    mayapy export_farm.py --scene set.ma --group "|set_dressing" --database props.db --workers 8
+"""
+
+import argparse
+import json
+import os
+import queue
+import shlex
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from clutter_export import DatabaseExporter, ExportBackend, capture_asset, insert_item
+from clutter_schema import connect_read_only, create_schema
+
+SCRIPTS = Path(__file__).resolve().parent
+EXPORT_SCRIPT = SCRIPTS.parent / "ExportScript.py"
+RENDER_SCRIPT = SCRIPTS.parent / "renderViews.py"
+
+# the columns of clutter_export.insert_item
+select_row = "SELECT name, mesh_data, mesh_type, top_image, side_image, front_image, persp_image FROM Meshes WHERE id=?"
+
+
+def default_worker() -> List[str]:
+    """
+    The command for a real worker, mayapy from $MAYA_LOCATION (or the PATH) running ExportScript.py.
+
+    Returns:
+        List[str]: The command line.
+    """
+    mayapy = "mayapy"
+    if "MAYA_LOCATION" in os.environ:
+        mayapy = str(Path(os.environ["MAYA_LOCATION"]) / "bin" / ("mayapy.exe" if os.name == "nt" else "mayapy"))
+    return [mayapy, str(EXPORT_SCRIPT)]
+
+
+def split_work(children: Sequence[str], workers: int) -> List[List[Tuple[int, str]]]:
+    """
+    Deal the groups out to the workers in turn, so neighbouring groups (often similar props) are spread out.
+
+    Args:
+        children (Sequence[str]): Full DAG paths of the groups.
+        workers (int): Number of workers, no more shares than groups are made.
+
+    Returns:
+        List[List[Tuple[int, str]]]: The (index, path) pairs for each worker.
+    """
+    count = max(1, min(workers, len(children)))
+    return [list(enumerate(children))[start::count] for start in range(count)]
+
+
+@dataclass
+class FarmReport:
+    """What an export farm run did"""
+
+    total: int
+    exported: int = 0
+    # (index, dag path, error) of each group that wasn't exported
+    failed: List[Tuple[int, str, str]] = field(default_factory=list)
+    seconds: float = 0.0
+    # the first and last id of the rows added
+    ids: Optional[Tuple[int, int]] = None
+    # why the screenshots of the new rows weren't rendered, empty if they were
+    unrendered: str = ""
+
+    def __str__(self) -> str:
+        text = f"exported {self.exported} of {self.total} groups in {self.seconds:.1f}s"
+        for index, child, error in self.failed:
+            text += f"\n  failed {child}: {error}"
+        if self.unrendered and self.ids:
+            text += f"\n  screenshots of ids {self.ids[0]}-{self.ids[1]} not rendered: {self.unrendered}"
+        return text
+
+
+def _worker_env() -> Dict[str, str]:
+    # the workers import clutter_export (and NCCA) from this folder, mayapy doesn't load the module file
+    # until maya.standalone.initialize so add it to the path here
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(SCRIPTS), env.get("PYTHONPATH")]))
+    env["PYTHONUNBUFFERED"] = "1"
+    return env
+
+
+def _read_events(worker: int, process: subprocess.Popen, events: queue.Queue) -> None:
+    """Thread reading a worker's stdout, anything that isn't an event is passed on as output"""
+    for line in process.stdout:
+        try:
+            event = json.loads(line)
+        except ValueError:
+            event = None
+        events.put((worker, event if isinstance(event, dict) else {"event": "output", "text": line.rstrip()}))
+    events.put((worker, None))
+
+
+def render_screenshots(database: str, first_id: int, last_id: int, size: int = 250) -> str:
+    """
+    Render the missing screenshots of a range of rows with renderViews.py, run with this interpreter.
+
+    Args:
+        database (str): The database the rows were added to.
+        first_id (int): The first id to render.
+        last_id (int): The last id to render.
+        size (int): Image width and height.
+
+    Returns:
+        str: Why the screenshots weren't rendered, empty if they were.
+    """
+    command = [sys.executable, str(RENDER_SCRIPT), "--database", database, "--size", str(size)]
+    command += ["--min-id", str(first_id), "--max-id", str(last_id)]
+    result = subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    if result.returncode == 0:
+        return ""
+    lines = result.stderr.strip().splitlines()
+    reason = f"renderViews.py exited with code {result.returncode}" + (f": {lines[-1]}" if lines else "")
+    return f"{reason}, run {' '.join(command[1:])} to retry"
+
+
+def list_children(scene: str, group: str, worker: Optional[Sequence[str]] = None) -> List[str]:
+    """
+    Ask a worker for the child groups of a group in a scene, the same list NCCA.get_child_groups gives.
+
+    Args:
+        scene (str): The scene file.
+        group (str): Full DAG path of the group.
+        worker (Sequence[str]): The worker command, default_worker if not given.
+
+    Returns:
+        List[str]: Full DAG paths of the child groups.
+    """
+    command = [*(worker or default_worker()), "--farm-worker", "--scene", scene, "--list-children", group]
+    result = subprocess.run(command, stdout=subprocess.PIPE, text=True, env=_worker_env(), check=True)
+    children = []
+    for line in result.stdout.splitlines():
+        try:
+            event = json.loads(line)
+        except ValueError:
+            continue
+        if isinstance(event, dict) and event.get("event") == "child":
+            children.append(event["path"])
+    return children
+
+
+def run_farm(
+    scene: str,
+    children: Sequence[str],
+    database: str,
+    workers: int = 4,
+    worker: Optional[Sequence[str]] = None,
+    batch_size: int = 16,
+    width: int = 250,
+    height: int = 250,
+    progress: Optional[Callable[[int, int, str], None]] = None,
+    render: bool = True,
+) -> FarmReport:
+    """
+    Export groups of a scene into a database with several worker processes.
+
+    Args:
+        scene (str): The scene file each worker opens.
+        children (Sequence[str]): Full DAG paths of the groups to export.
+        database (str): The database to add the meshes to, created if it doesn't exist.
+        workers (int): Number of worker processes.
+        worker (Sequence[str]): The worker command, default_worker if not given.
+        batch_size (int): Number of assets each worker writes per transaction.
+        width (int): Screenshot width.
+        height (int): Screenshot height.
+        progress (Callable[[int, int, str], None]): Called with the number done, the total and a message
+            as each group is exported or fails.
+        render (bool): Render the screenshots the workers couldn't take with render_screenshots.
+
+    Returns:
+        FarmReport: The number exported and the groups that failed.
+    """
+    start = time.perf_counter()
+    report = FarmReport(len(children))
+    shares = split_work(children, workers)
+    command = list(worker or default_worker())
+    events: queue.Queue = queue.Queue()
+    # indexes each worker has reported exported, in the order it wrote them
+    written: List[List[int]] = [[] for _ in shares]
+    failed: Dict[int, str] = {}
+
+    with tempfile.TemporaryDirectory(prefix="clutter_farm_") as scratch:
+        processes, logs = [], []
+        for number, share in enumerate(shares):
+            if not share:
+                continue
+            share_file = Path(scratch) / f"share{number}.json"
+            share_file.write_text(json.dumps(share))
+            arguments = ["--farm-worker", "--scene", scene, "--children", str(share_file)]
+            arguments += ["--database", str(Path(scratch) / f"share{number}.db"), "--batch-size", str(batch_size)]
+            arguments += ["--width", str(width), "--height", str(height)]
+            log = open(Path(scratch) / f"share{number}.log", "w+")
+            logs.append(log)
+            process = subprocess.Popen(
+                command + arguments, stdout=subprocess.PIPE, stderr=log, text=True, env=_worker_env()
+            )
+            processes.append((number, process))
+            threading.Thread(target=_read_events, args=(number, process, events), daemon=True).start()
+
+        running = len(processes)
+        while running:
+            number, event = events.get()
+            if event is None:
+                running -= 1
+                continue
+            kind = event.get("event")
+            if kind == "exported":
+                written[number].append(event["index"])
+                message = f"worker {number} exported {children[event['index']]}"
+            elif kind == "failed":
+                failed[event["index"]] = event.get("error", "unknown error")
+                message = f"worker {number} failed {children[event['index']]}: {failed[event['index']]}"
+            else:
+                message = f"worker {number}: {event.get('text', event)}"
+            if progress is not None:
+                progress(sum(map(len, written)) + len(failed), len(children), message)
+
+        for (number, process), log in zip(processes, logs):
+            code = process.wait()
+            if code != 0:
+                log.seek(0)
+                lines = log.read().strip().splitlines()
+                reason = f"worker exited with code {code}" + (f": {lines[-1]}" if lines else "")
+                reported = set(written[number]) | set(failed)
+                for index, _ in shares[number]:
+                    if index not in reported:
+                        failed[index] = reason
+            log.close()
+
+        # merge in the order of the original list, a worker that died may not have committed its last batch
+        parts: Dict[int, sqlite3.Connection] = {}
+        rows: List[Tuple[int, int, int]] = []
+        added: List[int] = []
+        for number, _ in processes:
+            part = Path(scratch) / f"share{number}.db"
+            ids = []
+            if part.is_file():
+                parts[number] = connect_read_only(str(part))
+                ids = [row[0] for row in parts[number].execute("SELECT id FROM Meshes ORDER BY id")]
+            for index in written[number][len(ids) :]:
+                failed[index] = "exported but not written before the worker stopped"
+            rows += [(index, number, mesh_id) for index, mesh_id in zip(written[number], ids)]
+        try:
+            with sqlite3.connect(database) as connection:
+                create_schema(connection)
+                for index, number, mesh_id in sorted(rows):
+                    row = parts[number].execute(select_row, (mesh_id,)).fetchone()
+                    added.append(connection.execute(insert_item, row).lastrowid)
+            connection.close()
+        finally:
+            for part in parts.values():
+                part.close()
+
+    report.exported = len(rows)
+    if added:
+        # one transaction, so the new rows have consecutive ids
+        report.ids = (added[0], added[-1])
+        if render:
+            report.unrendered = render_screenshots(database, added[0], added[-1], width)
+    report.failed = sorted((index, children[index], error) for index, error in failed.items())
+    report.seconds = time.perf_counter() - start
+    return report
+
+
+def emit(event: str, **values) -> None:
+    """
+    Print a worker event for the scheduler.
+
+    Args:
+        event (str): exported, failed or child.
+        values: The rest of the event, e.g. index=3.
+    """
+    print(json.dumps({"event": event, **values}), flush=True)
+
+
+def worker_main(
+    backend: Callable[[], ExportBackend],
+    open_scene: Callable[[str], None],
+    child_groups: Callable[[str], List[str]],
+    argv: Optional[Sequence[str]] = None,
+) -> int:
+    """
+    The worker side of the protocol, ExportScript.farm_worker and export_stub_worker.py call this with
+    their own way of opening a scene and exporting.
+
+    Args:
+        backend (Callable[[], ExportBackend]): Makes the backend once the scene is open.
+        open_scene (Callable[[str], None]): Opens the scene file.
+        child_groups (Callable[[str], List[str]]): Lists the child groups of a group, like NCCA.get_child_groups.
+        argv (Sequence[str]): The arguments, sys.argv[1:] if not given.
+
+    Returns:
+        int: The exit code.
+    """
+    parser = argparse.ArgumentParser(description="export farm worker")
+    parser.add_argument("--farm-worker", action="store_true")
+    parser.add_argument("--scene", required=True)
+    parser.add_argument("--list-children")
+    parser.add_argument("--children")
+    parser.add_argument("--database")
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--width", type=int, default=250)
+    parser.add_argument("--height", type=int, default=250)
+    args = parser.parse_args(argv)
+
+    open_scene(args.scene)
+    if args.list_children:
+        for path in child_groups(args.list_children):
+            emit("child", path=path)
+        return 0
+    if not args.children or not args.database:
+        parser.error("--children and --database are needed to export")
+    share = json.loads(Path(args.children).read_text())
+    exporter_backend = backend()
+    with DatabaseExporter(args.database, args.batch_size, args.width, args.height) as exporter:
+        with tempfile.TemporaryDirectory(prefix="clutter_export_") as scratch:
+            for index, child in share:
+                try:
+                    row = capture_asset(exporter_backend, child, Path(scratch), args.width, args.height)
+                except Exception as e:
+                    emit("failed", index=index, error=str(e))
+                    continue
+                exporter.add(row)
+                emit("exported", index=index)
+    return 0
+
+
+def _print_progress(done: int, total: int, message: str) -> None:
+    print(f"[{done}/{total}] {message}", flush=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="export the child groups of a scene with several mayapy workers")
+    parser.add_argument("--scene", "-s", help="The scene to export from", required=True)
+    parser.add_argument("--database", "-db", help="The database to add the meshes to", required=True)
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--group", "-g", help="Export the child groups of this group")
+    source.add_argument("--children", "-c", help="JSON file with the list of groups to export")
+    parser.add_argument("--workers", "-w", help="Number of worker processes", type=int, default=os.cpu_count())
+    parser.add_argument("--worker", help="Worker command, defaults to mayapy ExportScript.py")
+    parser.add_argument("--batch-size", "-b", help="Assets per transaction", type=int, default=16)
+    parser.add_argument("--width", help="Screenshot width", type=int, default=250)
+    parser.add_argument("--height", help="Screenshot height", type=int, default=250)
+    parser.add_argument("--no-render", help="Don't render the screenshots of the new rows", action="store_true")
+    args = parser.parse_args()
+
+    worker = shlex.split(args.worker) if args.worker else None
+    if args.group:
+        children = list_children(args.scene, args.group, worker)
+    else:
+        children = json.loads(Path(args.children).read_text())
+    report = run_farm(
+        args.scene,
+        children,
+        args.database,
+        args.workers,
+        worker,
+        args.batch_size,
+        args.width,
+        args.height,
+        _print_progress,
+        not args.no_render,
+    )
+    print(report)
+    if report.failed:
+        # re-run just these with --children
+        retry = Path(f"{args.database}.failed.json")
+        retry.write_text(json.dumps([child for _, child, _ in report.failed], indent=1))
+        print(f"failed groups written to {retry}")
+    sys.exit(1 if report.failed else 0)
@@ -0,0 +1,96 @@
+"""
+A stand in for "mayapy ExportScript.py" so the export farm can be run and tested without Maya, e.g.
+
+    printf '|set|chair\\n|set|table\\n|set|lamp\\n' > scene.txt
+    python export_farm.py --scene scene.txt --group "|set" --database out.db --workers 2 \\
+        --worker "python export_stub_worker.py"
+
+The "scene" is a text file with one DAG path per line, the child groups of a group are the lines one level
+below it. Each group is exported as a cube obj named after the group, with no screenshots (like mayapy)
+unless the backend is made with screenshots=True, check_export.py uses it that way to check clutter_export.
+These environment variables make the stub misbehave to exercise the scheduler
+    CLUTTER_STUB_DELAY   seconds to spend on each group
+    CLUTTER_STUB_FAIL    groups whose path contains this text fail to export
+    CLUTTER_STUB_CRASH   the worker exits without cleaning up after exporting this many groups
+"""
+
+import os
+import sys
+import time
+from pathlib import Path
+from typing import List, Optional
+
+from export_farm import worker_main
+
+CUBE = """v -0.5 -0.5 0.5
+v 0.5 -0.5 0.5
+v -0.5 0.5 0.5
+v 0.5 0.5 0.5
+v -0.5 0.5 -0.5
+v 0.5 0.5 -0.5
+v -0.5 -0.5 -0.5
+v 0.5 -0.5 -0.5
+f 1 2 4 3
+f 3 4 6 5
+f 5 6 8 7
+f 7 8 2 1
+f 2 8 6 4
+f 7 1 3 5
+"""
+
+# a 1x1 grey PNG written for each view when screenshots are asked for
+PIXEL_PNG = (
+    b"\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR\x00\x00\x00\x01\x00\x00\x00\x01\x08\x02\x00\x00\x00\x90wS\xde"
+    b"\x00\x00\x00\x0cIDATx\x9cchhh\x00\x00\x03\x04\x01\x81K\xd3\xd2\x10\x00\x00\x00\x00IEND\xaeB`\x82"
+)
+
+
+class StubBackend:
+    """An ExportBackend that writes a cube for every group"""
+
+    def __init__(self, screenshots: bool = False, fail: Optional[str] = None) -> None:
+        self.child = ""
+        self.exported = 0
+        self.screenshots = screenshots
+        self.delay = float(os.environ.get("CLUTTER_STUB_DELAY", "0"))
+        self.fail = fail or os.environ.get("CLUTTER_STUB_FAIL")
+        self.crash = int(os.environ.get("CLUTTER_STUB_CRASH", "-1"))
+
+    def prepare(self, child: str) -> None:
+        if self.exported == self.crash:
+            os._exit(3)
+        self.child = child
+        time.sleep(self.delay)
+
+    def save_screenshots(self, path: Path, width: int, height: int, base_name: str) -> None:
+        if self.screenshots:
+            for view in ("Front", "Side", "Top", "Persp"):
+                (path / f"{base_name}{view}.png").write_bytes(PIXEL_PNG)
+
+    def export_obj(self, path: Path) -> None:
+        if self.fail and self.fail in self.child:
+            raise RuntimeError(f"stub failure for {self.child}")
+        path.write_text(f"# {self.child}\n{CUBE}")
+        self.exported += 1
+
+    def cleanup(self) -> None:
+        self.child = ""
+
+    def interrupted(self) -> bool:
+        return False
+
+
+scene: List[str] = []
+
+
+def open_scene(path: str) -> None:
+    scene[:] = [line.strip() for line in Path(path).read_text().splitlines() if line.strip()]
+
+
+def child_groups(group: str) -> List[str]:
+    depth = group.count("|") + 1
+    return [path for path in scene if path.startswith(f"{group}|") and path.count("|") == depth]
+
+
+if __name__ == "__main__":
+    sys.exit(worker_main(StubBackend, open_scene, child_groups))
@@ -0,0 +1,277 @@
+#!/usr/bin/env -S uv run --script
+
+import argparse
+import io
+import logging
+import sqlite3
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from scripts.clutter_schema import IMAGE_COLUMNS
+
+"""
+The screenshots saved by NCCA.save_screenshots are lossless PNGs and for small props the four of them
+are usually bigger than the mesh. This module transcodes them to WebP, JPEG or a palettized PNG, either
+at ingest (see addToDB.py --image-format) or in bulk for an existing database, and records the original
+format of every image in the ImageFormats table so they can be converted back.
+
+Pillow is only needed when transcoding, it is an optional dependency (uv pip install ".[images]") imported
+on first use.
+"""
+
+# the screenshot files picked up at ingest, save_screenshots can write png or (smaller) jpg
+SCREENSHOT_SUFFIXES = (".png", ".jpg", ".jpeg")
+
+# png8 is a palettized PNG, the rest are the usual formats
+FORMATS = ("webp", "jpeg", "png8", "png")
+
+create_formats_table = """CREATE TABLE IF NOT EXISTS ImageFormats (
+mesh_id INTEGER NOT NULL,
+image_column TEXT NOT NULL,
+original_format TEXT NOT NULL,
+stored_format TEXT NOT NULL,
+original_size INTEGER NOT NULL,
+stored_size INTEGER NOT NULL,
+quality INTEGER,
+PRIMARY KEY (mesh_id, image_column)
+);"""
+
+# the GUI deletes rows without foreign keys enabled so clean up with a trigger instead
+create_formats_trigger = """CREATE TRIGGER IF NOT EXISTS ImageFormats_delete AFTER DELETE ON Meshes
+BEGIN
+DELETE FROM ImageFormats WHERE mesh_id = OLD.id;
+END;"""
+
+record_format = """INSERT INTO ImageFormats (mesh_id, image_column, original_format, stored_format, original_size, stored_size, quality)
+VALUES (?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT(mesh_id, image_column) DO UPDATE SET stored_format=excluded.stored_format,
+stored_size=excluded.stored_size, quality=excluded.quality"""
+
+
+@dataclass
+class TranscodeSettings:
+    """How images should be stored"""
+
+    image_format: str = "webp"
+    quality: int = 80
+    colours: int = 256
+
+
+def _pillow():
+    try:
+        from PIL import Image
+    except ImportError as e:
+        raise RuntimeError("Pillow is required to transcode images, install the images extra (pillow)") from e
+    return Image
+
+
+def detect_format(data: bytes) -> str:
+    """Work out the format of an encoded image from its signature
+    Parameters :
+        data : bytes
+            The encoded image
+    """
+    if data.startswith(b"\x89PNG\r\n\x1a\n"):
+        # colour type 3 is a palette image
+        return "png8" if len(data) > 25 and data[25] == 3 else "png"
+    if data.startswith(b"\xff\xd8\xff"):
+        return "jpeg"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "webp"
+    return "unknown"
+
+
+def transcode(data: bytes, settings: TranscodeSettings) -> bytes:
+    """Re-encode an image in the format given by settings
+    Parameters :
+        data : bytes
+            The encoded image
+        settings : TranscodeSettings
+            The format and quality to use
+    """
+    Image = _pillow()
+    image = Image.open(io.BytesIO(data))
+    output = io.BytesIO()
+    if settings.image_format == "webp":
+        image.save(output, "WEBP", quality=settings.quality, method=6)
+    elif settings.image_format == "jpeg":
+        # JPEG has no alpha, Maya's screenshots are opaque anyway
+        image.convert("RGB").save(output, "JPEG", quality=settings.quality, optimize=True)
+    elif settings.image_format == "png8":
+        image.convert("RGB").quantize(colors=settings.colours).save(output, "PNG", optimize=True)
+    elif settings.image_format == "png":
+        image.save(output, "PNG", optimize=True)
+    else:
+        raise ValueError(f"unknown image format {settings.image_format}")
+    return output.getvalue()
+
+
+def ensure_formats_table(connection: sqlite3.Connection) -> None:
+    """Create the ImageFormats table and its delete trigger if needed
+    Parameters :
+        connection : sqlite3.Connection
+            The open database
+    """
+    connection.execute(create_formats_table)
+    connection.execute(create_formats_trigger)
+
+
+def store_image(
+    connection: sqlite3.Connection, mesh_id: int, column: str, data: bytes, settings: TranscodeSettings
+) -> Optional[bytes]:
+    """Transcode an image and record its original format, returns the bytes to store.
+    If the transcoded image is not smaller the original is kept, and an image already in the wanted format is
+    left alone so running again doesn't lose more quality each time.
+    Parameters :
+        connection : sqlite3.Connection
+            The open database, the caller is responsible for committing
+        mesh_id : int
+            The id of the row the image belongs to
+        column : str
+            The image column
+        data : bytes
+            The encoded image
+        settings : TranscodeSettings
+            The format and quality to use
+    """
+    if not data:
+        return data
+    original_format = detect_format(data)
+    if original_format == settings.image_format:
+        return data
+    # keep the original format from the first time the image was transcoded
+    row = connection.execute(
+        "SELECT original_format, original_size FROM ImageFormats WHERE mesh_id=? AND image_column=?", (mesh_id, column)
+    ).fetchone()
+    original_size = len(data)
+    if row is not None:
+        original_format, original_size = row
+    encoded = transcode(data, settings)
+    if len(encoded) >= len(data):
+        encoded = data
+    connection.execute(
+        record_format,
+        (mesh_id, column, original_format, detect_format(encoded), original_size, len(encoded), settings.quality),
+    )
+    return encoded
+
+
+def recompress_database(database: str, settings: TranscodeSettings, batch_size: int = 64) -> Tuple[int, int]:
+    """Transcode every image in an existing database, committing in batches so other users are not
+    locked out for long. Returns the total image bytes before and after.
+    Parameters :
+        database : str
+            name of database to recompress
+        settings : TranscodeSettings
+            The format and quality to use
+        batch_size : int
+            rows per transaction
+    """
+    before = after = 0
+    with sqlite3.connect(database) as connection:
+        ensure_formats_table(connection)
+        ids = [row[0] for row in connection.execute("SELECT id FROM Meshes ORDER BY id")]
+        for start in range(0, len(ids), batch_size):
+            batch = ids[start : start + batch_size]
+            for mesh_id in batch:
+                images = connection.execute(
+                    f"SELECT {', '.join(IMAGE_COLUMNS)} FROM Meshes WHERE id=?", (mesh_id,)
+                ).fetchone()
+                updates: Dict[str, bytes] = {}
+                for column, data in zip(IMAGE_COLUMNS, images):
+                    if not data:
+                        continue
+                    encoded = store_image(connection, mesh_id, column, data, settings)
+                    before += len(data)
+                    after += len(encoded)
+                    if encoded is not data:
+                        updates[column] = encoded
+                if updates:
+                    assignments = ", ".join(f"{column}=?" for column in updates)
+                    connection.execute(f"UPDATE Meshes SET {assignments} WHERE id=?", (*updates.values(), mesh_id))
+            connection.commit()
+            logging.info(f"recompressed {min(start + batch_size, len(ids))}/{len(ids)} rows")
+    return before, after
+
+
+def restore_database(database: str, batch_size: int = 64) -> int:
+    """Convert transcoded images back to their original format using the ImageFormats records.
+    Lossy formats can't give back the original pixels, but PNG images are restored as PNG.
+    Returns the number of images restored.
+    Parameters :
+        database : str
+            name of database to restore
+        batch_size : int
+            rows per transaction
+    """
+    restored = 0
+    with sqlite3.connect(database) as connection:
+        ensure_formats_table(connection)
+        records = connection.execute(
+            "SELECT mesh_id, image_column, original_format FROM ImageFormats WHERE original_format != stored_format"
+        ).fetchall()
+        for start in range(0, len(records), batch_size):
+            for mesh_id, column, original_format in records[start : start + batch_size]:
+                if column not in IMAGE_COLUMNS or original_format not in FORMATS:
+                    continue
+                (data,) = connection.execute(f"SELECT {column} FROM Meshes WHERE id=?", (mesh_id,)).fetchone()
+                encoded = transcode(data, TranscodeSettings(original_format))
+                connection.execute(f"UPDATE Meshes SET {column}=? WHERE id=?", (encoded, mesh_id))
+                connection.execute("DELETE FROM ImageFormats WHERE mesh_id=? AND image_column=?", (mesh_id, column))
+                restored += 1
+            connection.commit()
+    return restored
+
+
+def size_report(database: str, sample: int = 200) -> List[Tuple[str, int, int, float]]:
+    """Report the size reduction of each stored format against the time taken to decode it.
+    Returns a list of (format, original bytes, stored bytes, mean decode ms) tuples, decode time
+    is measured with Pillow over up to sample images of each format.
+    Parameters :
+        database : str
+            name of database to report on
+        sample : int
+            number of images of each format to decode for timing
+    """
+    Image = _pillow()
+    report = []
+    with sqlite3.connect(database) as connection:
+        ensure_formats_table(connection)
+        totals = connection.execute(
+            "SELECT stored_format, SUM(original_size), SUM(stored_size) FROM ImageFormats GROUP BY stored_format"
+        ).fetchall()
+        for stored_format, original_size, stored_size in totals:
+            rows = connection.execute(
+                "SELECT mesh_id, image_column FROM ImageFormats WHERE stored_format=? LIMIT ?", (stored_format, sample)
+            ).fetchall()
+            elapsed = 0.0
+            for mesh_id, column in rows:
+                (data,) = connection.execute(f"SELECT {column} FROM Meshes WHERE id=?", (mesh_id,)).fetchone()
+                start = time.perf_counter()
+                Image.open(io.BytesIO(data)).load()
+                elapsed += time.perf_counter() - start
+            report.append((stored_format, original_size, stored_size, 1000.0 * elapsed / max(1, len(rows))))
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="transcode the screenshots stored in a clutter database")
+    parser.add_argument("--database", "-db", help="Which DB to connect too", required=True)
+    parser.add_argument("--format", "-f", help="Format to store images as", choices=FORMATS, default="webp")
+    parser.add_argument("--quality", "-q", help="Quality for lossy formats (0-100)", type=int, default=80)
+    parser.add_argument("--colours", "-c", help="Palette size for png8", type=int, default=256)
+    parser.add_argument("--restore", help="Convert images back to their original format", action="store_true")
+    parser.add_argument("--report", help="Only report sizes against decode time", action="store_true")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    if args.restore:
+        print(f"restored {restore_database(args.database)} images")
+    elif not args.report:
+        before, after = recompress_database(args.database, TranscodeSettings(args.format, args.quality, args.colours))
+        print(f"images {before} bytes -> {after} bytes ({100.0 * (1 - after / max(1, before)):.1f}% smaller)")
+
+    for stored_format, original_size, stored_size, decode_ms in size_report(args.database):
+        ratio = original_size / max(1, stored_size)
+        print(f"{stored_format:6} {original_size:>12} -> {stored_size:>12} bytes  x{ratio:.2f}  decode {decode_ms:.2f} ms")